@@ -2,23 +2,45 @@
 
 import os
 import time
-import random
-import pandas as pd
 from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
-import openpyxl
 import logging
 import base64
 import undetected_chromedriver as uc
+from escritor_planilha import EscritorPlanilha
+from leitor_planilha import com_status, ler_cabecalho, ler_registros
+from estado_tarefas import ArmazemTarefas
+from validade_certidao import extrair_validade
+from pool_navegadores import PoolNavegadores
+from pool_drivers import PoolDrivers
+from esperas import Ritmo, aguardar, aguardar_pagina, elemento_presente, elemento_visivel, texto_na_pagina
+from limitador_taxa import limitador_portal
+from preenchimento import preencher_campo
+from disjuntor import STATUS_INDISPONIVEL, PortalIndisponivel, disjuntor_portal
+from politica_retentativa import (CaptchaRecusado, FalhaPermanente, FalhaTransitoria, TentativasEsgotadas,
+                                  politica_portal)
+from perfil_navegador import COMPLETO, bloquear_recursos, configurar_perfil, metricas
+from navegacao import CacheNavegacao
+from servico_captcha import criar_servico_captcha
 
 
 class ConfiguracaoCEF:
     DOWNLOAD_DIR = r"path/to/downloads"  # Diretório de download dos arquivos
     FINAL_DIR = r"path/to/final_directory"  # Final
     PLANILHA_PATH = r'path/to/excel_file.xlsx'  # Caminho da Planilha de consulta e salvamento
+    URL_CONSULTA = "https://consulta-crf.caixa.gov.br/consultacrf/pages/consultaEmpregador.jsf"  # Link direto do formulário
+    NOVA_RODADA = False  # True para reprocessar todos os CNPJs, ignorando o progresso salvo
+    APENAS_ERROS = False  # True para reprocessar somente os CNPJs que falharam
+    DIAS_ANTECEDENCIA_VALIDADE = 7  # Reconsulta CRFs que vencem dentro deste prazo (None desativa)
+    WORKERS_NAVEGADOR = 1  # Sessões de navegador em paralelo (limitadas por LIMITES_PORTAL['CEF'])
+    PERFIL_CHROME = COMPLETO  # ENXUTO: headless, sem fontes/analytics/banners (captcha e PDF continuam liberados)
+    RITMO = Ritmo(0.5, 1.5)  # Pausa mínima entre ações, além das esperas por condição (Ritmo(0) desativa)
+    RITMO_DIGITACAO = Ritmo(0.1, 0.3)  # Pausa entre as teclas, quando a digitação é tecla por tecla
+    RESERVA_DRIVERS = 1  # Navegadores pré-iniciados por worker para trocar na hora (0 reinicia como antes)
+    API_KEY_CAPTCHA = None  # Chave do 2Captcha; sem ela (e sem OCR), o captcha vai para o stub determinístico
+    CAPTCHA_POR_OCR = False  # Tenta o OCR local antes da API (ou no lugar dela)
 
     @staticmethod
     def configurar_logging():
@@ -26,54 +48,71 @@ class ConfiguracaoCEF:
 
 
 class PlanilhaCEF:
-    def __init__(self, caminho):
+    def __init__(self, caminho, escritor=None):
         self.caminho = caminho
-        self.df = self.carregar_dados()
-        self.wb = openpyxl.load_workbook(caminho)
-        self.sheet = self.wb.active
+        # Com um escritor compartilhado (orquestrador), quem o criou é responsável por fechá-lo
+        self._escritor_proprio = escritor is None
+        self.escritor = escritor or EscritorPlanilha(caminho)
         self._obter_indices_colunas()
 
-    def carregar_dados(self):
-        logging.info("Carregando dados da planilha")
-        df = pd.read_excel(self.caminho, dtype=str)  # Carrega tudo como string
-        df['CNPJ'] = df['CNPJ'].apply(self._formatar_cnpj)
-        return df
-
-    def _formatar_cnpj(self, cnpj):
-        """Remove espaços, hífens e outros caracteres não numéricos, e garante 14 dígitos."""
-        cnpj = ''.join(filter(str.isdigit, cnpj))  # Remove tudo que não for número
-        return cnpj.zfill(14)  # Garante que tenha 14 dígitos
-
     def _obter_indices_colunas(self):
-        headers = next(self.sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-        self.cnpj_index = headers.index("CNPJ")
-        self.status_index = headers.index("CEF")
-
-    def obter_cnpjs(self, apenas_erros=False):
-        cnpjs = []
-        for idx, row in enumerate(self.sheet.iter_rows(min_row=2, values_only=True)):
-            cnpj = self._formatar_cnpj(str(row[self.cnpj_index]))  # Formata o CNPJ novamente para garantir
-            status = row[self.status_index] if self.status_index < len(row) else ""
+        headers = ler_cabecalho(self.caminho)
+        self.cnpj_index = headers["CNPJ"] - 1
+        self.status_index = headers["CEF"] - 1
+
+    def obter_cnpjs(self, apenas_erros=False, registros=None):
+        logging.info("Carregando dados da planilha")
+        if registros is None:
+            registros = ler_registros(self.caminho, coluna_status="CEF")
+        else:
+            registros = com_status(registros, "CEF")
+        for registro in registros:
+            status = str(registro.status or "")
             if not apenas_erros or "Erro" in status:
-                cnpjs.append((cnpj, idx + 2))
-        return cnpjs
+                yield registro.cnpj, registro.linha
 
     def atualizar_status(self, row_index, status):
-        self.sheet.cell(row=row_index, column=self.status_index + 1, value=status)
-        self.wb.save(self.caminho)
+        self.escritor.atualizar(row_index, self.status_index + 1, status)
         logging.info(f"Atualizado status na linha {row_index}: {status}")
 
+    def exportar(self, armazem):
+        armazem.exportar(self.escritor, self.status_index + 1)
+
+    def salvar(self):
+        if self._escritor_proprio:
+            self.escritor.fechar()
+        else:
+            self.escritor.descarregar()
+
 
 class NavegadorCEF:
-    def __init__(self):
+    def __init__(self, diretorio_downloads=None, reserva=0):
         self.driver = None
+        self.diretorio_downloads = diretorio_downloads or ConfiguracaoCEF.DOWNLOAD_DIR
+        self.reserva = reserva
+        self.drivers = None
+        self.limitador = limitador_portal("CEF")  # Taxa de consultas comum a todos os workers
 
     def iniciar_navegador(self):
         logging.info("Iniciando navegador")
+        if self.reserva and self.drivers is None:
+            self.drivers = PoolDrivers(self.criar_driver, self.reserva)
+        self.driver = self.drivers.obter() if self.drivers else self.criar_driver()
+
+    def reiniciar(self):
+        """Troca o navegador atual por um novo; com reserva, a troca é imediata."""
+        if self.drivers is None:
+            self.finalizar()
+            time.sleep(30)
+            self.iniciar_navegador()
+            return
+        self.driver = self.drivers.substituir(self.driver)
+
+    def criar_driver(self):
         options = uc.ChromeOptions()
         prefs = {
             "profile.default_content_settings.popups": 0,
-            "download.default_directory": ConfiguracaoCEF.DOWNLOAD_DIR,
+            "download.default_directory": self.diretorio_downloads,
             "safebrowsing.enabled": "false",
             "profile.default_content_setting_values.automatic_downloads": 1,
             "download.prompt_for_download": False,
@@ -84,24 +123,28 @@ class NavegadorCEF:
         options.add_argument('--disable-dev-shm-usage')
         options.add_argument('--disable-gpu')
         options.add_argument('--no-sandbox')
-        self.driver = uc.Chrome(options=options)
+        configurar_perfil(options, ConfiguracaoCEF.PERFIL_CHROME)
+        driver = uc.Chrome(options=options)
+        bloquear_recursos(driver, ConfiguracaoCEF.PERFIL_CHROME)
+        return driver
 
     def acessar_site(self, url):
         logging.info(f"Acessando site: {url}")
+        self.limitador.adquirir()
         self.driver.get(url)
-        time.sleep(random.uniform(2, 5))  # Espera aleatória para simular comportamento humano
+        aguardar_pagina(self.driver)
 
     def pesquisar_no_google(self, query):
         logging.info(f"Pesquisando no Google: {query}")
         self.driver.get("https://www.google.com")
-        self.encontrar_elemento(By.NAME, "q").send_keys(query + "\n")
-        time.sleep(random.uniform(2, 5))
+        self.encontrar_elemento(By.NAME, "q").send_keys(query + "\n")  # O link do resultado é esperado em clicar_primeiro_link
 
     def clicar_primeiro_link(self):
         logging.info("Clicando no primeiro link relevante")
         link = self.encontrar_elemento(By.XPATH, "//a[contains(@href, 'consulta-crf.caixa.gov.br')]")
+        self.limitador.adquirir()
         link.click()
-        time.sleep(random.uniform(2, 5))
+        aguardar_pagina(self.driver)
 
     def encontrar_elemento(self, by, value, timeout=20):
         logging.info(f"Procurando elemento: {value}")
@@ -114,19 +157,14 @@ class NavegadorCEF:
     def preencher_campo(self, by, value, texto, timeout=20):
         logging.info(f"Preenchendo campo: {value} com {texto}")
         campo = self.encontrar_elemento(by, value, timeout)
-        campo.clear()  # Limpa o campo
-        campo.send_keys(Keys.HOME)  # Garante que o cursor esteja no início
-        time.sleep(1)  # Pequena pausa antes de preencher
+        # Estratégia de ESTRATEGIAS_PORTAL['CEF'], conferida pela leitura do campo
+        preencher_campo(self.driver, campo, texto, "CEF", ritmo_tecla=ConfiguracaoCEF.RITMO_DIGITACAO)
 
-        # Digita o texto caractere por caractere com uma pausa entre cada um
-        for char in texto:
-            campo.send_keys(char)
-            time.sleep(random.uniform(0.1, 0.3))  # Pausa aleatória entre as teclas
-
-    def salvar_imagem_captcha(self, xpath, save_path):
-        logging.info(f"Salvando imagem do captcha: {xpath}")
+    def imagem_captcha(self, xpath):
+        """PNG do captcha em memória, sem passar por arquivo."""
+        logging.info(f"Capturando imagem do captcha: {xpath}")
         captcha_img = self.encontrar_elemento(By.XPATH, xpath)
-        captcha_img.screenshot(save_path)
+        return captcha_img.screenshot_as_png
 
     def verificar_pendente_sem_pdf(self):
         try:
@@ -152,103 +190,114 @@ class NavegadorCEF:
                 logging.error(f"Erro ao finalizar navegador: {e}")
             finally:
                 self.driver = None
-
-
-class SolucionadorCaptchaImg:
-    def __init__(self, api_key):
-        # self.solver = TwoCaptcha(api_key)  # Comentado: Implementar resolução de CAPTCHA conforme necessário
-        pass
-
-    def resolver_captcha(self, image_path):
-        logging.info("Resolvendo captcha")
-        # Implementar resolução de CAPTCHA aqui, por exemplo, usando uma API de terceiros
-        # Exemplo:
-        # try:
-        #     result = self.solver.normal(image_path, regsense=1)
-        #     return result['code']
-        # except Exception as e:
-        #     logging.error(f"Erro ao resolver CAPTCHA: {e}")
-        #     return None
-        return "CAPTCHA_RESOLVED"  # Placeholder
+        if self.drivers:
+            self.drivers.encerrar()
+            self.drivers = None
 
 
 class ProcessoCNPJCEF:
-    def __init__(self, planilha, solucionador_captcha, navegador):
+    def __init__(self, planilha, solucionador_captcha, navegador, armazem):
         self.planilha = planilha
         self.solucionador_captcha = solucionador_captcha
         self.navegador = navegador
+        self.armazem = armazem
+        self.politica = politica_portal("CEF")  # Tentativas, espera entre elas e orçamento por CNPJ
+        # Vai direto ao formulário; a busca no Google só é refeita se o link direto falhar
+        self.navegacao = CacheNavegacao("CEF", (By.ID, "mainForm:txtInscricao1"), self._percorrer_busca,
+                                        ConfiguracaoCEF.URL_CONSULTA)
+
+    def _percorrer_busca(self, driver):
+        self.navegador.pesquisar_no_google("cnd cef")
+        self.navegador.clicar_primeiro_link()
+
+    def _registrar_status(self, cnpj, row_index, status, caminho_pdf=None, validade=None):
+        self.armazem.concluir(cnpj, status, caminho_pdf, validade)
+        self.planilha.atualizar_status(row_index, status)
 
     def processar_cnpj(self, cnpj, row_index):
-        tentativa = 0
-        sucesso = False
-        while tentativa < 4 and not sucesso:  # Tentar até 4 vezes
-            try:
-                tentativa += 1
-                logging.info(f"Processando CNPJ {cnpj} - Tentativa {tentativa}")
-
-                # Pesquisar no Google e acessar o site da CEF
-                self.navegador.pesquisar_no_google("cnd cef")
-                self.navegador.clicar_primeiro_link()
-
-                # Processo no site da CEF
-                self.navegador.driver.execute_script("window.scrollTo(0, 500);")
-                time.sleep(random.uniform(2, 5))
-
-                self.navegador.preencher_campo(By.ID, "mainForm:txtInscricao1", cnpj)
-                captcha_image_path = os.path.join(ConfiguracaoCEF.DOWNLOAD_DIR, "captcha.png")
-                self.navegador.salvar_imagem_captcha("//img[@id='captchaImg_N2']", captcha_image_path)
-                logging.info("Resolvendo captcha")
-                captcha_code = self.solucionador_captcha.resolver_captcha(captcha_image_path)
-                if not captcha_code:
-                    raise Exception("Falha ao resolver o CAPTCHA")
-
-                # Se o CAPTCHA contiver a palavra "Código", reinicie o navegador
-                if "Código" in captcha_code:
-                    logging.warning("CAPTCHA contém a palavra 'Código'. Reiniciando navegador...")
-                    self.navegador.finalizar()
-                    time.sleep(30)
-                    self.navegador.iniciar_navegador()
-                    self.navegador.limpar_cache_e_cookies()
-                    continue  # Reinicia a tentativa
-
-                logging.info(f"Captcha resolvido: {captcha_code}")
-                self.navegador.preencher_campo(By.ID, "mainForm:txtCaptcha", captcha_code)
-                self.navegador.clicar_elemento(By.ID, "mainForm:btnConsultar")
-                time.sleep(10)
-
-                # Verifica se o feedback é "Empregador não cadastrado."
-                feedback = self.navegador.driver.find_element(By.XPATH,
-                                                              "//div[@class='feedback feedback-info']/span[@class='feedback-text']")
-                if "Empregador não cadastrado" in feedback.text:
-                    logging.warning(f"CNPJ {cnpj} não está cadastrado.")
-                    self.planilha.atualizar_status(row_index, "Empregador não cadastrado")
-                    sucesso = True  # Considera como sucesso, pois não é erro
-                    return
-
-                # Verifica se o status é "pendente" sem PDF
-                if self.navegador.verificar_pendente_sem_pdf():
-                    logging.warning(f"Informações insuficientes para o CNPJ {cnpj}.")
-                    self.planilha.atualizar_status(row_index, "Ausência")
-                    sucesso = True  # Considera como sucesso mesmo que não haja PDF
-                    return
-
-                self._baixar_pdf(cnpj, row_index)
-                sucesso = True  # Se chegou até aqui, o processamento foi bem-sucedido
-            except Exception as e:
-                logging.error(f"Tentativa {tentativa} falhou para o CNPJ {cnpj}: {e}")
-                if tentativa >= 4:  # Atualiza o status se falhar 4 vezes
-                    logging.error(f"Falha ao processar CNPJ {cnpj} após {tentativa} tentativas")
-                    self.planilha.atualizar_status(row_index, f"Erro após {tentativa} tentativas")
-                else:
-                    logging.info(f"Tentando novamente CNPJ {cnpj} (tentativa {tentativa + 1})")
-                    time.sleep(random.uniform(5, 10))  # Pausa entre tentativas
+        self.armazem.iniciar(cnpj)
+        try:
+            # Só falhas transitórias são repetidas, com espera crescente e dentro do orçamento do CNPJ
+            self.politica.executar(lambda tentativa: self._tentativa(cnpj, row_index, tentativa), f"CNPJ {cnpj}")
+        except TentativasEsgotadas as e:
+            logging.error(f"Falha ao processar CNPJ {cnpj} após {e.tentativas} tentativas: {e.erro}")
+            self._registrar_status(cnpj, row_index, f"Erro após {e.tentativas} tentativas")
+        except FalhaPermanente as e:
+            logging.error(f"Falha definitiva para o CNPJ {cnpj}: {e}")
+            self._registrar_status(cnpj, row_index, f"Erro: {e}")
+        except PortalIndisponivel as e:
+            # Registrado como falha: o CNPJ volta à fila na próxima execução
+            logging.error(f"CNPJ {cnpj} não consultado: {e}")
+            self._registrar_status(cnpj, row_index, STATUS_INDISPONIVEL)
+
+    def _tentativa(self, cnpj, row_index, tentativa):
+        """Uma consulta completa; retorna o status registrado ou levanta a falha."""
+        logging.info(f"Processando CNPJ {cnpj} - Tentativa {tentativa}")
+
+        # Acessar o formulário da CEF (reaproveitado, link direto ou busca no Google)
+        self.navegacao.ir_para_formulario(self.navegador.driver)
+
+        # Processo no site da CEF
+        self.navegador.driver.execute_script("window.scrollTo(0, 500);")
+        aguardar(self.navegador.driver, elemento_visivel((By.ID, "captchaImg_N2")), timeout=20)
+        ConfiguracaoCEF.RITMO.pausar()
+
+        # O captcha é resolvido em segundo plano enquanto o CNPJ é digitado
+        futuro = self.solucionador_captcha.enviar_imagem(self.navegador.imagem_captcha("//img[@id='captchaImg_N2']"))
+        self.navegador.preencher_campo(By.ID, "mainForm:txtInscricao1", cnpj)
+        logging.info("Resolvendo captcha")
+        solucao = futuro.result(120)
+        captcha_code = solucao.texto
+
+        # Se o CAPTCHA contiver a palavra "Código", reinicie o navegador
+        if "Código" in captcha_code:
+            logging.warning("CAPTCHA contém a palavra 'Código'. Reiniciando navegador...")
+            self.solucionador_captcha.reportar(solucao, False)
+            self.navegador.limitador.estrangulado("captcha 'Código'")
+            self.navegador.reiniciar()
+            self.navegador.limpar_cache_e_cookies()
+            raise FalhaTransitoria("captcha 'Código'")  # Repete com o navegador novo
+
+        logging.info(f"Captcha resolvido: {captcha_code}")
+        self.navegador.preencher_campo(By.ID, "mainForm:txtCaptcha", captcha_code)
+        self.navegador.limitador.adquirir()
+        self.navegador.clicar_elemento(By.ID, "mainForm:btnConsultar")
+
+        # Segue assim que a resposta da consulta aparece, em vez de esperar sempre 10 segundos
+        aguardar_pagina(self.navegador.driver)
+        try:
+            feedback = aguardar(self.navegador.driver, elemento_presente(
+                (By.XPATH, "//div[@class='feedback feedback-info']/span[@class='feedback-text']")), timeout=30)
+        except TimeoutException as e:
+            self.solucionador_captcha.reportar(solucao, False)  # Sem resposta da consulta: captcha recusado
+            raise CaptchaRecusado("consulta sem resposta após o captcha") from e
+        self.solucionador_captcha.reportar(solucao, True)
+        self.navegador.limitador.sucesso()
+
+        # Verifica se o feedback é "Empregador não cadastrado."
+        if "Empregador não cadastrado" in feedback.text:
+            logging.warning(f"CNPJ {cnpj} não está cadastrado.")
+            self._registrar_status(cnpj, row_index, "Empregador não cadastrado")
+            return "Empregador não cadastrado"  # Resposta definitiva, não é erro
+
+        # Verifica se o status é "pendente" sem PDF
+        if self.navegador.verificar_pendente_sem_pdf():
+            logging.warning(f"Informações insuficientes para o CNPJ {cnpj}.")
+            self._registrar_status(cnpj, row_index, "Ausência")
+            return "Ausência"  # Resposta definitiva mesmo sem PDF
+
+        return self._baixar_pdf(cnpj, row_index)
 
     def _baixar_pdf(self, cnpj, row_index):
         try:
             self.navegador.clicar_elemento(By.ID, "mainForm:j_id51")
             self.navegador.clicar_elemento(By.ID, "mainForm:btnVisualizar")
-            time.sleep(5)
-            self._save_pdf_via_devtools(cnpj, row_index)
+            try:
+                # O CRF está pronto quando a validade aparece na página
+                aguardar(self.navegador.driver, texto_na_pagina("Validade"), timeout=30)
+            except TimeoutException:
+                logging.warning(f"Validade não apareceu na página do CRF do CNPJ {cnpj}; salvando assim mesmo")
+            return self._save_pdf_via_devtools(cnpj, row_index)
         except (NoSuchElementException, TimeoutException, WebDriverException) as e:
             logging.error(f"Erro ao processar resultado para o CNPJ {cnpj}: {e}")
             raise  # Levanta a exceção para tentar novamente
@@ -257,6 +306,8 @@ class ProcessoCNPJCEF:
         driver = self.navegador.driver
         logging.info("Salvando PDF via DevTools Protocol")
         try:
+            # A validade aparece na própria página do CRF ("Validade: dd/mm/aaaa a dd/mm/aaaa")
+            validade = extrair_validade(driver.find_element(By.TAG_NAME, "body").text)
             pdf_data = driver.execute_cdp_cmd("Page.printToPDF", {
                 "landscape": False,
                 "displayHeaderFooter": False,
@@ -268,33 +319,61 @@ class ProcessoCNPJCEF:
             with open(pdf_path, 'wb') as f:
                 f.write(pdf_bytes)
             logging.info(f"PDF salvo em {pdf_path}")
-            self.planilha.atualizar_status(row_index, "Processado com PDF")
+            self._registrar_status(cnpj, row_index, "Processado com PDF", pdf_path, validade)
+            return "Processado com PDF"
         except Exception as e:
             logging.error(f"Erro ao salvar PDF para o CNPJ {cnpj}: {e}")
-            self.planilha.atualizar_status(row_index, "Erro ao salvar PDF")
-
-
-def main():
-    ConfiguracaoCEF.configurar_logging()
-    planilha = PlanilhaCEF(ConfiguracaoCEF.PLANILHA_PATH)
-    solucionador_captcha = SolucionadorCaptchaImg(api_key=None)  # Substitua com a chave de API se implementado
-    navegador = NavegadorCEF()
+            self._registrar_status(cnpj, row_index, "Erro ao salvar PDF")
+            return "Erro ao salvar PDF"
+
+
+def executar(caminho_planilha=None, escritor=None, registros=None):
+    """Consulta os CNPJs pendentes; `escritor` e `registros` permitem compartilhar a planilha já carregada."""
+    planilha = PlanilhaCEF(caminho_planilha or ConfiguracaoCEF.PLANILHA_PATH, escritor)
+    solucionador_captcha = criar_servico_captcha(ConfiguracaoCEF.API_KEY_CAPTCHA, ocr=ConfiguracaoCEF.CAPTCHA_POR_OCR,
+                                                 max_workers=ConfiguracaoCEF.WORKERS_NAVEGADOR)
+
+    # Registra os CNPJs da planilha e retoma do último ponto salvo
+    armazem = ArmazemTarefas("CEF")
+    armazem.registrar(planilha.obter_cnpjs(registros=registros))
+    if ConfiguracaoCEF.NOVA_RODADA:
+        armazem.reiniciar()
+    cnpjs = armazem.pendentes(apenas_erros=ConfiguracaoCEF.APENAS_ERROS,
+                              dias_antecedencia=ConfiguracaoCEF.DIAS_ANTECEDENCIA_VALIDADE,
+                              rodada_completa=ConfiguracaoCEF.NOVA_RODADA)
+    logging.info(f"{len(cnpjs)} CNPJ(s) a processar")
+
+    # Cada worker tem seu navegador e sua pasta de downloads; o serviço de captcha é compartilhado
+    def iniciar_worker(worker):
+        navegador = NavegadorCEF(worker.diretorio, ConfiguracaoCEF.RESERVA_DRIVERS)
+        navegador.iniciar_navegador()
+        return ProcessoCNPJCEF(planilha, solucionador_captcha, navegador, armazem)
+
+    def processar(processador, tarefa):
+        cnpj, row_index = tarefa
+        processador.processar_cnpj(cnpj, row_index)
 
-    # Inicia o navegador
-    navegador.iniciar_navegador()
+    def finalizar_worker(processador):
+        processador.navegador.finalizar()
 
-    # Cria o processador de CNPJ
-    processador = ProcessoCNPJCEF(planilha, solucionador_captcha, navegador)
+    # Processa os CNPJs distribuídos entre os workers
+    pool = PoolNavegadores("CEF", iniciar_worker, processar, finalizar_worker,
+                           max_workers=ConfiguracaoCEF.WORKERS_NAVEGADOR)
+    try:
+        pool.executar(cnpjs)
+    finally:
+        # Exporta o estado das tarefas para a planilha
+        planilha.exportar(armazem)
+        planilha.salvar()
+        armazem.fechar()
+        metricas.resumo("CEF", ConfiguracaoCEF.PERFIL_CHROME)
+        disjuntor_portal("CEF").resumo()
+        solucionador_captcha.encerrar()
 
-    # Obtém todos os CNPJs (não filtra por erros)
-    cnpjs = planilha.obter_cnpjs()
 
-    # Processa cada CNPJ
-    for cnpj, row_index in cnpjs:
-        processador.processar_cnpj(cnpj, row_index)
-
-    # Finaliza o navegador
-    navegador.finalizar()
+def main():
+    ConfiguracaoCEF.configurar_logging()
+    executar()
 
 
 if __name__ == "__main__":
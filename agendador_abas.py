@@ -0,0 +1,150 @@
+# agendador_abas.py
+
+import time
+import logging
+from selenium.common.exceptions import TimeoutException
+
+PRONTA = 'pronta'
+EXPIRADA = 'expirada'
+
+
+class Espera:
+    """Pausa pedida por uma rotina: `segundos` fixos e/ou até `condicao(driver)` ser verdadeira.
+
+    Enquanto uma aba espera, o AgendadorAbas usa o navegador em outra aba.
+    """
+
+    def __init__(self, segundos=0, condicao=None, timeout=60):
+        self.segundos = segundos
+        self.condicao = condicao
+        self.timeout = timeout
+
+
+class _Aba:
+    def __init__(self, handle, tarefa, rotina):
+        self.handle = handle
+        self.tarefa = tarefa
+        self.rotina = rotina
+        self.espera = None
+        self.pronta_em = 0
+        self.limite = None
+
+    def aguardar(self, espera):
+        self.espera = espera
+        self.pronta_em = time.monotonic() + espera.segundos
+        self.limite = self.pronta_em + espera.timeout
+
+    def estado(self, driver):
+        """PRONTA, EXPIRADA (condição não atendida no tempo limite) ou None se ainda deve esperar."""
+        agora = time.monotonic()
+        if agora < self.pronta_em:
+            return None
+        if self.espera is None or self.espera.condicao is None:
+            return PRONTA
+        try:
+            if self.espera.condicao(driver):
+                return PRONTA
+        except Exception:
+            pass
+        return EXPIRADA if agora >= self.limite else None
+
+    def avancar(self, expirada=False):
+        """Conduz a rotina até a próxima Espera (StopIteration quando termina)."""
+        if expirada:
+            espera = self.rotina.throw(TimeoutException("Condição não atendida no tempo limite"))
+        else:
+            espera = next(self.rotina)
+        self.aguardar(espera)
+
+
+def executar_rotina(driver, rotina, intervalo=0.5):
+    """Roda uma rotina (gerador que produz Esperas) de forma sequencial, na aba atual."""
+    aba = _Aba(None, None, rotina)
+    try:
+        aba.avancar()
+        while True:
+            estado = aba.estado(driver)
+            if estado is None:
+                restante = aba.pronta_em - time.monotonic()
+                time.sleep(restante if restante > 0 else intervalo)
+                continue
+            aba.avancar(expirada=estado == EXPIRADA)
+    except StopIteration as fim:
+        return fim.value
+
+
+class AgendadorAbas:
+    """Conduz várias rotinas ao mesmo tempo num único Chrome, uma por aba.
+
+    Cada rotina é um gerador `criar_rotina(driver, tarefa)` que produz Esperas
+    nos pontos em que o portal fica processando. O agendador troca para a aba
+    cuja espera terminou e a conduz até a próxima Espera; uma condição que não
+    se cumpre no tempo limite vira TimeoutException dentro da rotina. O
+    WebDriver atende uma aba por vez, então o ganho vem de sobrepor as esperas
+    dos portais sem abrir N processos do Chrome.
+    """
+
+    def __init__(self, driver, max_abas=3, intervalo=0.5):
+        self.driver = driver
+        self.max_abas = max_abas
+        self.intervalo = intervalo
+
+    def _abrir(self, tarefa, criar_rotina):
+        self.driver.switch_to.new_window('tab')
+        return _Aba(self.driver.current_window_handle, tarefa, criar_rotina(self.driver, tarefa))
+
+    def _fechar(self, aba):
+        try:
+            self.driver.switch_to.window(aba.handle)
+            self.driver.close()
+        except Exception as e:
+            logging.warning(f"Erro ao fechar a aba da tarefa {aba.tarefa}: {e}")
+
+    def _estado(self, aba):
+        if aba.espera is not None and aba.espera.condicao is not None and time.monotonic() >= aba.pronta_em:
+            self.driver.switch_to.window(aba.handle)  # A condição é avaliada na aba dela
+        return aba.estado(self.driver)
+
+    def executar(self, tarefas, criar_rotina, ao_concluir=None):
+        """Processa `tarefas` com até `max_abas` abas simultâneas.
+
+        `ao_concluir(tarefa, retorno, erro)` é chamado quando a rotina da tarefa termina.
+        """
+        principal = self.driver.current_window_handle
+        pendentes = iter(tarefas)
+        abas = []
+        esgotadas = False
+        try:
+            while abas or not esgotadas:
+                while not esgotadas and len(abas) < self.max_abas:
+                    try:
+                        abas.append(self._abrir(next(pendentes), criar_rotina))
+                    except StopIteration:
+                        esgotadas = True
+
+                avancou = False
+                for aba in list(abas):
+                    estado = self._estado(aba)
+                    if estado is None:
+                        continue
+                    avancou = True
+                    self.driver.switch_to.window(aba.handle)
+                    try:
+                        aba.avancar(expirada=estado == EXPIRADA)
+                        continue
+                    except StopIteration as fim:
+                        retorno, erro = fim.value, None
+                    except Exception as e:
+                        retorno, erro = None, e
+                        logging.error(f"Erro na tarefa {aba.tarefa}: {e}")
+                    if ao_concluir:
+                        ao_concluir(aba.tarefa, retorno, erro)
+                    self._fechar(aba)
+                    abas.remove(aba)
+                if not avancou:
+                    time.sleep(self.intervalo)
+        finally:
+            for aba in abas:
+                aba.rotina.close()
+                self._fechar(aba)
+            self.driver.switch_to.window(principal)
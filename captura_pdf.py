@@ -0,0 +1,127 @@
+# captura_pdf.py
+
+import os
+import json
+import time
+import base64
+import shutil
+import logging
+
+
+def habilitar_log_rede(options):
+    """Liga o log de desempenho do ChromeDriver, por onde chegam os eventos Network.* do CDP."""
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    return options
+
+
+def gravar_pdf(origem, destino):
+    """Leva o PDF ao destino final: bytes capturados são gravados uma única vez e
+    arquivos baixados são movidos."""
+    if os.path.exists(destino):
+        os.remove(destino)
+    if isinstance(origem, (bytes, bytearray)):
+        with open(destino, 'wb') as arquivo:
+            arquivo.write(origem)
+    else:
+        shutil.move(origem, destino)
+    return destino
+
+
+class CapturaPDF:
+    """Captura em memória o corpo da resposta application/pdf recebida pela aba,
+    sem passar pelo gerenciador de downloads do Chrome.
+
+    Os eventos de rede vêm do log de desempenho do ChromeDriver (o driver precisa
+    ser criado com `habilitar_log_rede`) e o corpo é lido com
+    Network.getResponseBody. Se o portal entregar o PDF como anexo, o Chrome o
+    trata como download e `aguardar` retorna None; nesse caso o chamador recorre
+    ao GerenciadorDownloads.
+    """
+
+    def __init__(self, timeout=60, intervalo=0.2, buffer_mb=50):
+        self.timeout = timeout
+        self.intervalo = intervalo
+        self.buffer_mb = buffer_mb
+
+    def preparar(self, driver):
+        """Ativa o domínio Network e descarta os eventos anteriores à ação que gera o PDF."""
+        tamanho = self.buffer_mb * 1024 * 1024
+        driver.execute_cdp_cmd('Network.enable', {'maxResourceBufferSize': tamanho,
+                                                  'maxTotalBufferSize': 2 * tamanho})
+        driver.get_log('performance')
+
+    def _eventos(self, driver):
+        for entrada in driver.get_log('performance'):
+            mensagem = json.loads(entrada['message'])['message']
+            yield mensagem.get('method'), mensagem.get('params', {})
+
+    @staticmethod
+    def _eh_pdf(resposta):
+        tipo = resposta.get('mimeType', '').lower()
+        return 'pdf' in tipo or resposta.get('url', '').lower().split('?')[0].endswith('.pdf')
+
+    def verificar(self, driver, pendentes):
+        """Lê os eventos recebidos até agora, sem esperar; retorna (terminou, bytes do PDF ou None).
+
+        `pendentes` guarda as respostas PDF ainda carregando entre uma leitura e outra.
+        """
+        for metodo, params in self._eventos(driver):
+            request_id = params.get('requestId')
+            if metodo == 'Network.responseReceived' and self._eh_pdf(params.get('response', {})):
+                pendentes.add(request_id)
+            elif metodo == 'Network.loadingFinished' and request_id in pendentes:
+                corpo = self._corpo(driver, request_id)
+                if corpo:
+                    return True, corpo
+                pendentes.discard(request_id)
+            elif metodo == 'Network.loadingFailed' and request_id in pendentes:
+                # Resposta desviada para o gerenciador de downloads (anexo) ou cancelada
+                logging.info(f"Resposta PDF não capturada em memória: {params.get('errorText')}")
+                return True, None
+        return False, None
+
+    def aguardar(self, driver, timeout=None):
+        """Retorna os bytes do PDF recebido após `preparar`, ou None."""
+        limite = time.monotonic() + (timeout or self.timeout)
+        pendentes = set()
+        while time.monotonic() < limite:
+            terminou, corpo = self.verificar(driver, pendentes)
+            if terminou:
+                return corpo
+            time.sleep(self.intervalo)
+        logging.warning("Nenhuma resposta PDF capturada dentro do tempo limite")
+        return None
+
+    def acompanhar(self):
+        """Condição para uma Espera do AgendadorAbas, no lugar de `aguardar`: fica verdadeira
+        quando a captura termina, com o PDF (ou None) em `.pdf`."""
+        return AcompanhamentoCaptura(self)
+
+    def _corpo(self, driver, request_id):
+        try:
+            resposta = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception as e:
+            logging.warning(f"Não foi possível ler o corpo da resposta PDF: {e}")
+            return None
+        corpo = resposta.get('body', '')
+        corpo = base64.b64decode(corpo) if resposta.get('base64Encoded') else corpo.encode('latin-1')
+        if not corpo.startswith(b'%PDF'):
+            logging.warning("Resposta capturada não é um PDF válido")
+            return None
+        logging.info(f"PDF capturado em memória ({len(corpo)} bytes)")
+        return corpo
+
+
+class AcompanhamentoCaptura:
+    """Captura em andamento, verificada a cada chamada sem bloquear o navegador."""
+
+    def __init__(self, captura):
+        self.captura = captura
+        self.pendentes = set()
+        self.terminou = False
+        self.pdf = None
+
+    def __call__(self, driver):
+        if not self.terminou:
+            self.terminou, self.pdf = self.captura.verificar(driver, self.pendentes)
+        return self.terminou
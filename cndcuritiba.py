@@ -5,88 +5,210 @@ import time
 import json
 import pytesseract
 import shutil
-import fitz
-from PIL import Image
-import openpyxl
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 import undetected_chromedriver as uc
 import re
 import logging
-import pandas as pd
+import requests
+from escritor_planilha import EscritorPlanilha
+from leitor_planilha import ler_cabecalho, ler_registros, normalizar_cnpj
+from estado_tarefas import ArmazemTarefas, ResultadoConsulta
+from extracao_pdf import CacheExtracao, ExtratorTextoPDF
+from pipeline_ocr import PipelineProcessamento
+from motor_ocr import configurar_motor_ocr
+from gerenciador_downloads import GerenciadorDownloads
+from captura_pdf import CapturaPDF, gravar_pdf, habilitar_log_rede
+from sessao_http import SessaoHTTP, analisar_html
+from pool_navegadores import PoolNavegadores
+from agendador_abas import AgendadorAbas, Espera, executar_rotina
+from esperas import Ritmo, download_concluido, elemento_clicavel, elemento_presente
+from navegacao import CacheNavegacao
+from limitador_taxa import limitador_portal
+from preenchimento import preencher_campo
+from politica_retentativa import CaptchaRecusado, politica_portal
+from disjuntor import MEIO_ABERTO, STATUS_INDISPONIVEL, PortalIndisponivel, disjuntor_portal
+from perfil_navegador import COMPLETO, bloquear_recursos, configurar_perfil, metricas
+from servico_captcha import criar_servico_captcha
 
 # Configuração do Tesseract
 pytesseract.pytesseract.tesseract_cmd = r'path/to/tesseract.exe' # Tesseract para OCR
 os.environ['TESSDATA_PREFIX'] = r'path/to/tessdata'  # Tessdata
+# Instâncias do Tesseract mantidas carregadas por processo (tesserocr); sem ele, volta ao pytesseract
+configurar_motor_ocr(tamanho_pool=1)
 
 logging.basicConfig(level=logging.INFO, filename='process.log', filemode='a',
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 
+PADRAO_EFEITO_NEGATIVA = re.compile(r"POSITIVA\s*COM\s*EFEITO\s*DE\s*NEGATIVA")
+URL_PORTAL = 'https://cnd-cidadao.curitiba.pr.gov.br/'
+URL_SOLICITAR_CNPJ = URL_PORTAL + 'Certidao/SolicitarCnpj'
+
 
 class ProcessadorPDFCuritiba:
-    @staticmethod
-    def pixmap_para_pil(pix):
-        mode = "RGBA" if pix.alpha else "RGB"
-        size = (pix.width, pix.height)
-        return Image.frombytes(mode, size, pix.samples)
+    def __init__(self, caminho_cache=None, faixa_titulo=0.35):
+        # Lê primeiro só a faixa do título da 1ª página e para assim que status, CNPJ e validade aparecem
+        self.cache = CacheExtracao('Curitiba', self.status_do_texto, caminho_disco=caminho_cache,
+                                   extrator=ExtratorTextoPDF(faixa_titulo=faixa_titulo))
+
+    def analisar(self, caminho_pdf):
+        return self.cache.analisar(caminho_pdf)
 
     def extrair_texto_de_pdf(self, caminho_pdf):
-        texto = ""
-        with fitz.open(caminho_pdf) as doc:
-            for page_number, page in enumerate(doc):
-                pix = page.get_pixmap()
-                img = self.pixmap_para_pil(pix)
-                texto += pytesseract.image_to_string(img, lang='por')
-        return texto
+        return self.analisar(caminho_pdf).texto
+
+    @staticmethod
+    def status_do_texto(texto):
+        """Status da certidão, ou None se o texto lido até agora não permite decidir."""
+        texto = texto.upper()
+        if "NEGATIVA" in texto and "POSITIVA COM EFEITO DE NEGATIVA" not in texto:
+            return 'OK, Negativa'
+        if "POSITIVA" in texto:
+            if PADRAO_EFEITO_NEGATIVA.search(texto):
+                return 'OK, Positiva com Efeitos de Negativa'
+            return 'OK, Positiva'
+        return None
 
 
 class GerenciadorPlanilhaCuritiba:
-    def __init__(self, caminho_planilha):
+    def __init__(self, caminho_planilha, armazem=None, escritor=None, registros=None):
         self.caminho_planilha = caminho_planilha
+        self.armazem = armazem
+        self.escritor = escritor  # Compartilhado quando o orquestrador roda os portais juntos
+        self.registros = registros
         self.carregar_planilha()
 
     def carregar_planilha(self):
         logging.info("Carregando a planilha...")
-        self.wb = openpyxl.load_workbook(self.caminho_planilha)
-        self.sheet = self.wb.active
-        self.indice_coluna_cnpj, self.indice_coluna_cnd_municipal = None, None
-        for cell in self.sheet[1]:
-            if cell.value == "CNPJ":
-                self.indice_coluna_cnpj = cell.column
-            elif cell.value == "CND_MUNICIPAL":
-                self.indice_coluna_cnd_municipal = cell.column
+        self.escritor = self.escritor or EscritorPlanilha(self.caminho_planilha)
+        cabecalho = ler_cabecalho(self.caminho_planilha)
+        self.indice_coluna_cnpj = cabecalho.get("CNPJ")
+        self.indice_coluna_cnd_municipal = cabecalho.get("CND_MUNICIPAL")
         if not self.indice_coluna_cnpj or not self.indice_coluna_cnd_municipal:
             logging.error("Colunas 'CNPJ' ou 'CND_MUNICIPAL' não encontradas.")
             exit()
+        self._indexar_linhas()
+
+    def _indexar_linhas(self):
+        # Índice CNPJ normalizado -> linha e lista de CNPJs de Curitiba, numa única leitura da planilha
+        self.indice_linhas = {}
+        self.cnpjs_curitiba = []
+        registros = self.registros
+        if registros is None:
+            registros = ler_registros(self.caminho_planilha, colunas_extras=("NOME_CIDADE",))
+        for registro in registros:
+            self.indice_linhas.setdefault(registro.cnpj, registro.linha)
+            if _eh_curitiba(registro):
+                self.cnpjs_curitiba.append(registro.cnpj)
 
     def salvar_planilha(self):
         logging.info("Salvando a planilha...")
-        self.wb.save(self.caminho_planilha)
+        self.escritor.descarregar()
         logging.info("Planilha salva com sucesso.")
 
-    def atualizar_planilha(self, cnpj, status):
+    def exportar(self):
+        self.armazem.exportar(self.escritor, self.indice_coluna_cnd_municipal)
+
+    def atualizar_planilha(self, cnpj, status, caminho_pdf=None, validade=None):
+        if self.armazem:
+            self.armazem.concluir(cnpj, status, caminho_pdf, validade)
         row_index = self._obter_indice_linha(cnpj)
         if row_index:
-            self.sheet.cell(row=row_index, column=self.indice_coluna_cnd_municipal, value=status)
-            self.salvar_planilha()
+            self.escritor.atualizar(row_index, self.indice_coluna_cnd_municipal, status)
+        else:
+            logging.warning(f"CNPJ {cnpj} não encontrado na planilha; status '{status}' não registrado.")
 
     def _obter_indice_linha(self, cnpj):
-        for row in self.sheet.iter_rows(min_row=2):
-            if row[self.indice_coluna_cnpj - 1].value == cnpj:
-                return row[0].row
+        return self.indice_linhas.get(normalizar_cnpj(cnpj))
+
+
+class ConsultaHTTPCuritiba:
+    """Emite a certidão por HTTP a partir da página de solicitação aberta no navegador.
+
+    O navegador só carrega /Certidao/SolicitarCnpj uma vez (cookies, sitekey do
+    reCAPTCHA e tokens do formulário); para cada CNPJ, o formulário é reenviado
+    com o token do captcha, seguido de "Gerar nova certidão" e do download do PDF.
+    """
+
+    def __init__(self, driver, sessao, solucionador):
+        self.sessao = sessao
+        self.solucionador = solucionador
+        self.referencia = driver.current_url
+        self.site_key = driver.find_element(By.CLASS_NAME, 'g-recaptcha').get_attribute('data-sitekey')
+        self.campo_cnpj = driver.find_element(By.ID, 'DocumentoCnpj').get_attribute('name')
+        self.formulario = sessao.ler_formulario(driver, 'DocumentoCnpj')
+        sessao.importar_navegador(driver)
+
+    def consultar(self, cnpj):
+        """Retorna os bytes do PDF, ou None para que o CNPJ siga pelo navegador."""
+        try:
+            solucao = self.solucionador.resolver_recaptcha(self.site_key, self.referencia)
+        except Exception as e:
+            logging.error(f"reCAPTCHA do CNPJ {cnpj} não resolvido: {e}")
+            return None
+        try:
+            resposta = self.sessao.enviar_formulario(
+                self.formulario, {self.campo_cnpj: cnpj, 'g-recaptcha-response': solucao.texto}, self.referencia)
+            formulario_gerar = self._formulario_com_botao(analisar_html(resposta.text), 'btnGerarNovaCertidao')
+            self.solucionador.reportar(solucao, formulario_gerar is not None)  # Token recusado não chega a gerar
+            if formulario_gerar is not None:
+                resposta = self.sessao.enviar_formulario(formulario_gerar, referencia=resposta.url)
+            return self._baixar_pdf(resposta)
+        except requests.RequestException as e:
+            logging.error(f"Falha na consulta HTTP do CNPJ {cnpj}: {e}")
+            return None
+
+    @staticmethod
+    def _formulario_com_botao(pagina, trecho):
+        for formulario in pagina.formularios:
+            if any(trecho in botao or trecho in texto for botao, texto in formulario.botoes.items()):
+                return formulario
+        return None
+
+    def _baixar_pdf(self, resposta):
+        if resposta.content.startswith(b'%PDF'):
+            return resposta.content
+        pagina = analisar_html(resposta.text)
+        for href, texto in pagina.links:
+            if 'Baixar' in texto:
+                return self.sessao.obter_pdf(href, resposta.url)
+        formulario_baixar = self._formulario_com_botao(pagina, 'Baixar')
+        if formulario_baixar is not None:
+            resposta = self.sessao.enviar_formulario(formulario_baixar, referencia=resposta.url)
+            if resposta.content.startswith(b'%PDF'):
+                return resposta.content
+        logging.warning(f"Resposta de {resposta.url} sem PDF; seguindo pelo navegador")
         return None
 
 
 class NavegadorWebCuritiba:
-    def __init__(self, lista_cnpjs, dirs, solucionador, processador_pdf, gerenciador_planilha):
+    def __init__(self, lista_cnpjs, dirs, solucionador, processador_pdf, gerenciador_planilha, pipeline=None,
+                 captura_em_memoria=True, sessao_http=None, porta_depuracao=9222, perfil=COMPLETO, ritmo=None):
         self.lista_cnpjs = lista_cnpjs
+        self.ritmo = ritmo or Ritmo(1, 2)  # Pausa mínima entre ações, além das esperas por condição
+        self.limitador = limitador_portal('Curitiba')  # Taxa de consultas comum a todos os workers e abas
+        self.politica = politica_portal('Curitiba')  # Tentativas, espera entre elas e orçamento por CNPJ
+        self.perfil = perfil  # Perfil do Chrome (COMPLETO ou ENXUTO)
         self.dirs = dirs
+        # Cada CNPJ baixa numa subpasta própria de Downloads
+        self.downloads = GerenciadorDownloads(os.path.join(dirs['downloads'], 'cndcuritiba'), timeout=60)
+        # PDF lido da resposta via CDP; se vier como anexo, espera o download
+        self.captura = CapturaPDF(timeout=60) if captura_em_memoria else None
+        self._aba_baixando = None  # CNPJ da aba com captura/download em curso (destino e log de rede são do navegador)
+        # Com sessao_http, formulário e PDF seguem por HTTP e o navegador fica como alternativa
+        self.sessao_http = sessao_http
+        self.consulta_http = None
+        self.porta_depuracao = porta_depuracao  # Uma porta por navegador quando há vários workers
+        # Abre direto a página de solicitação; a página inicial e o menu só são refeitos se a sessão expirar
+        self.navegacao = CacheNavegacao('Curitiba', (By.ID, 'DocumentoCnpj'), self._percorrer_menu,
+                                        URL_SOLICITAR_CNPJ)
         self.solucionador = solucionador
         self.processador_pdf = processador_pdf
         self.gerenciador_planilha = gerenciador_planilha
+        self.pipeline = pipeline
 
     def configurar_chrome(self):
         chrome_options = uc.ChromeOptions()
@@ -94,7 +216,7 @@ class NavegadorWebCuritiba:
         chrome_options.add_argument("--no-sandbox")
         chrome_options.add_argument("--disable-dev-shm-usage")
         chrome_options.add_argument("--window-size=1920x1080")
-        chrome_options.add_argument("--remote-debugging-port=9222")
+        chrome_options.add_argument(f"--remote-debugging-port={self.porta_depuracao}")
         chrome_options.add_argument("--log-level=3")
         chrome_options.add_argument("--disable-infobars")
         chrome_options.add_argument("--disable-extensions")
@@ -106,25 +228,91 @@ class NavegadorWebCuritiba:
             "safebrowsing.enabled": True
         }
         chrome_options.add_experimental_option("prefs", prefs)
-        return chrome_options
+        if self.captura is not None:
+            habilitar_log_rede(chrome_options)
+        return configurar_perfil(chrome_options, self.perfil)
+
+    def _percorrer_menu(self, driver, increase_times=False):
+        driver.get(URL_PORTAL)
+        self._selecionar_certidao(driver, increase_times)
+        self._solicitar_certidao(driver, increase_times)
 
-    def acessar_site(self, driver, cnpj, increase_times=False):
+    def consultar_via_http(self, driver, cnpj):
+        """Tenta o CNPJ pelo modo HTTP; retorna True se o PDF foi obtido."""
         try:
-            driver.get('https://cnd-cidadao.curitiba.pr.gov.br/')
-            logging.info(f"Acessando o site para o CNPJ: {cnpj}")
-            self._selecionar_certidao(driver, increase_times)
-            self._solicitar_certidao(driver, increase_times)
-            self._preencher_cnpj(driver, cnpj, increase_times)
-            self._resolver_recaptcha(driver, increase_times)
-            self._baixar_certidao(driver, cnpj, increase_times)
+            if self.consulta_http is None:
+                self.navegacao.ir_para_formulario(driver)
+                self.consulta_http = ConsultaHTTPCuritiba(driver, self.sessao_http, self.solucionador)
         except Exception as e:
-            if not increase_times:
-                logging.warning(
-                    f"Primeira tentativa falhou para CNPJ {cnpj}, tentando novamente com tempos aumentados.")
-                self.acessar_site(driver, cnpj, increase_times=True)
-            else:
-                logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj} com tempos aumentados: {e}")
-                self.gerenciador_planilha.atualizar_planilha(cnpj, f"Erro: {e}")
+            logging.error(f"Não foi possível preparar o modo HTTP: {e}")
+            return False
+        self.limitador.adquirir()
+        pdf = self.consulta_http.consultar(cnpj)
+        if pdf:
+            self.limitador.sucesso()
+            self._processar_pdf_baixado(cnpj, pdf)
+        else:
+            self.limitador.estrangulado("consulta HTTP sem PDF")
+        return bool(pdf)
+
+    def _etapas(self, driver, cnpj, increase_times):
+        # Fluxo de um CNPJ; cada Espera é um ponto em que o portal fica processando
+        logging.info(f"Acessando o site para o CNPJ: {cnpj}")
+        self.navegacao.ir_para_formulario(driver, timeout=30 if increase_times else 15)
+        # O reCAPTCHA começa a ser resolvido já com o formulário aberto, enquanto o CNPJ é digitado
+        futuro = self._enviar_recaptcha(driver)
+        yield from self._preencher_cnpj(driver, cnpj, increase_times)
+        yield from self._resolver_recaptcha(driver, futuro, increase_times)
+        yield from self._baixar_certidao(driver, cnpj, increase_times)
+        self.limitador.sucesso()
+
+    def rotina_aba(self, driver, cnpj):
+        """Fluxo de um CNPJ com a política de retentativa, como rotina do AgendadorAbas.
+
+        Nas esperas do portal e entre as tentativas, outra aba usa o navegador.
+        """
+        bloquear_recursos(driver, self.perfil)  # Cada aba nova precisa do seu bloqueio
+        disjuntor = self.politica.disjuntor
+        inicio = time.monotonic()
+        tentativa = 1
+        while True:
+            # Portal fora do ar: o navegador inteiro para até a sonda de saúde responder. No
+            # meio-aberto a consulta de teste pode estar em outra aba deste navegador: só esta aba espera
+            estacionado = time.monotonic()
+            try:
+                while not disjuntor.liberar():
+                    if disjuntor.estado == MEIO_ABERTO:
+                        yield Espera(1)
+                        continue
+                    disjuntor.aguardar_liberacao()
+                    break
+            except PortalIndisponivel as e:
+                logging.error(f"CNPJ {cnpj} não consultado: {e}")
+                self.gerenciador_planilha.atualizar_planilha(cnpj, STATUS_INDISPONIVEL)  # Volta à fila depois
+                return
+            inicio += time.monotonic() - estacionado  # O tempo estacionado não conta no orçamento
+            try:
+                # A partir da segunda tentativa, com tempos aumentados
+                yield from self._etapas(driver, cnpj, tentativa > 1)
+                disjuntor.registrar(None)
+                return
+            except Exception as e:
+                disjuntor.registrar(e)
+                atraso = self.politica.proximo_atraso(tentativa, inicio, e)
+                if atraso is None:
+                    logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj} após {tentativa} tentativa(s): {e}")
+                    self.gerenciador_planilha.atualizar_planilha(cnpj, f"Erro: {e}")
+                    return
+                logging.warning(f"Tentativa {tentativa} falhou para CNPJ {cnpj} ({e}); "
+                                f"tentando novamente em {atraso:.1f}s com tempos aumentados.")
+                self.limitador.estrangulado("falha na consulta")
+                tentativa += 1
+            yield Espera(atraso)
+
+    def acessar_site(self, driver, cnpj):
+        if self.sessao_http is not None and self.consultar_via_http(driver, cnpj):
+            return
+        executar_rotina(driver, self.rotina_aba(driver, cnpj))
 
     def _selecionar_certidao(self, driver, increase_times):
         wait_time = 30 if increase_times else 15
@@ -143,27 +331,40 @@ class NavegadorWebCuritiba:
     def _preencher_cnpj(self, driver, cnpj, increase_times):
         wait_time = 30 if increase_times else 15
         logging.info(f"Preenchendo CNPJ: {cnpj}")
-        cnpj_field = WebDriverWait(driver, wait_time).until(EC.presence_of_element_located((By.ID, 'DocumentoCnpj')))
-        time.sleep(5)
-        cnpj_field.send_keys(Keys.HOME)
-        for char in cnpj:
-            cnpj_field.send_keys(char)
-            time.sleep(0.2 if increase_times else 0.1)
-        time.sleep(5)
-
-    def _resolver_recaptcha(self, driver, increase_times):
+        # Aguarda a vez na taxa do portal sem prender o navegador (outras abas seguem)
+        yield Espera(0, lambda driver: self.limitador.tentar(), timeout=600)
+        yield Espera(self.ritmo.segundos(), elemento_clicavel((By.ID, 'DocumentoCnpj')), wait_time)
+        cnpj_field = driver.find_element(By.ID, 'DocumentoCnpj')
+        # Tecla por tecla por padrão (ESTRATEGIAS_PORTAL['Curitiba']); o valor é conferido depois
+        preencher_campo(driver, cnpj_field, cnpj, 'Curitiba', ritmo_tecla=Ritmo(0.2 if increase_times else 0.1))
+        yield Espera(self.ritmo.segundos(), elemento_presente((By.CLASS_NAME, 'g-recaptcha')), wait_time)
+
+    def _enviar_recaptcha(self, driver):
+        """Future do token do reCAPTCHA, ou None se o widget ainda não estiver na página."""
+        elementos = driver.find_elements(By.CLASS_NAME, 'g-recaptcha')
+        if not elementos:
+            return None
+        return self.solucionador.enviar_recaptcha(elementos[0].get_attribute('data-sitekey'), driver.current_url)
+
+    def _resolver_recaptcha(self, driver, futuro, increase_times):
         wait_time = 60  # Pode ajustar conforme necessário
         logging.info("Resolvendo reCAPTCHA...")
-        site_key = driver.find_element(By.CLASS_NAME, 'g-recaptcha').get_attribute('data-sitekey')
-        url = driver.current_url
-        # captcha_response = self.solucionador.resolver_recaptcha(site_key, url)  # Comentado: Implementar solução de CAPTCHA
-        captcha_response = "CAPTCHA_RESOLVED"  # Placeholder
+        futuro = futuro or self._enviar_recaptcha(driver)
+        # Aguarda o token sem prender o navegador (outras abas seguem)
+        yield Espera(0, lambda driver: futuro.done(), timeout=300)
+        solucao = futuro.result()
         driver.execute_script("document.getElementById('g-recaptcha-response').style.display = 'block';")
         driver.execute_script(
-            f"document.getElementById('g-recaptcha-response').value = '{captcha_response}';")
+            f"document.getElementById('g-recaptcha-response').value = '{solucao.texto}';")
         generate_button = driver.find_element(By.ID, 'btnSolicitar')
         generate_button.click()
-        time.sleep(wait_time)
+        # Segue assim que a certidão é gerada, em vez de esperar sempre o tempo máximo
+        try:
+            yield Espera(self.ritmo.segundos(), elemento_clicavel((By.ID, 'btnGerarNovaCertidao')), wait_time)
+        except TimeoutException as e:
+            self.solucionador.reportar(solucao, False)  # Token recusado: a certidão não foi gerada
+            raise CaptchaRecusado("certidão não gerada após o reCAPTCHA") from e
+        self.solucionador.reportar(solucao, True)
 
     def _baixar_certidao(self, driver, cnpj, increase_times):
         wait_time = 60  # Pode ajustar conforme necessário
@@ -171,66 +372,112 @@ class NavegadorWebCuritiba:
         generate_new_button = WebDriverWait(driver, wait_time).until(
             EC.element_to_be_clickable((By.ID, 'btnGerarNovaCertidao')))
         generate_new_button.click()
-        time.sleep(wait_time)
-        download_button = WebDriverWait(driver, wait_time).until(EC.presence_of_element_located(
-            (By.XPATH, "//button[contains(., 'Baixar') and contains(@class, 'btn-primary')]")))
+        localizador_baixar = (By.XPATH, "//button[contains(., 'Baixar') and contains(@class, 'btn-primary')]")
+        yield Espera(self.ritmo.segundos(), elemento_presente(localizador_baixar), wait_time)
+        download_button = driver.find_element(*localizador_baixar)
         driver.execute_script("arguments[0].scrollIntoView(true);", download_button)
-        time.sleep(5)
-        if download_button.is_displayed() and download_button.is_enabled():
-            download_button.click()
-        else:
-            driver.execute_script("arguments[0].click();", download_button)
-        time.sleep(wait_time)
-        self._processar_pdf_baixado(cnpj)
-
-    def _processar_pdf_baixado(self, cnpj):
+        yield Espera(self.ritmo.segundos())
+        # O destino dos downloads e o log de rede valem para todas as abas: uma aba baixa por vez,
+        # mas enquanto ela espera o PDF as outras seguem preenchendo e gerando certidões
+        yield Espera(0, lambda driver: self._aba_baixando is None, timeout=2 * wait_time)
+        self._aba_baixando = cnpj
+        try:
+            download_button = driver.find_element(*localizador_baixar)
+            self.downloads.preparar(driver, cnpj)
+            if self.captura is not None:
+                self.captura.preparar(driver)
+            if download_button.is_displayed() and download_button.is_enabled():
+                download_button.click()
+            else:
+                driver.execute_script("arguments[0].click();", download_button)
+            pdf = None
+            if self.captura is not None:
+                captura = self.captura.acompanhar()
+                try:
+                    yield Espera(0, captura, wait_time)
+                except TimeoutException:
+                    logging.warning("Nenhuma resposta PDF capturada dentro do tempo limite")
+                pdf = captura.pdf
+            if not pdf:
+                try:
+                    yield Espera(0, download_concluido(self.downloads, cnpj), wait_time)
+                except TimeoutException:
+                    pass
+                pdf = self.downloads.concluido(cnpj)
+        finally:
+            self._aba_baixando = None
+        self._processar_pdf_baixado(cnpj, pdf)
+
+    def _processar_pdf_baixado(self, cnpj, pdf_file):
         logging.info(f"Processando PDF baixado para o CNPJ: {cnpj}")
-        pdf_files = [f for f in os.listdir(self.dirs['downloads']) if f.endswith('.pdf')]
-        if not pdf_files:
+        if not pdf_file:
             logging.error(f"Erro ao baixar PDF para o CNPJ {cnpj}: Nenhum PDF encontrado")
             self.gerenciador_planilha.atualizar_planilha(cnpj, 'Erro: PDF não encontrado')
             return
+        if isinstance(pdf_file, bytes):
+            # Capturado em memória: vai direto para a classificação e é gravado uma única vez
+            self._mover_pdf_e_atualizar_planilha(cnpj, pdf_file)
+            return
 
-        pdf_file = max([os.path.join(self.dirs['downloads'], f) for f in pdf_files], key=os.path.getctime)
         novo_caminho_pdf = os.path.join(self.dirs['pdfs'], f"{cnpj}.pdf")
         if os.path.exists(novo_caminho_pdf):
             os.remove(novo_caminho_pdf)
         shutil.move(pdf_file, novo_caminho_pdf)
 
-        texto = self.processador_pdf.extrair_texto_de_pdf(novo_caminho_pdf)
-        self._mover_pdf_e_atualizar_planilha(cnpj, texto, novo_caminho_pdf)
-
-    def _mover_pdf_e_atualizar_planilha(self, cnpj, texto, caminho_pdf):
-        logging.info(f"Movendo PDF e atualizando planilha para o CNPJ: {cnpj}")
-        if "NEGATIVA" in texto.upper() and "POSITIVA COM EFEITO DE NEGATIVA" not in texto.upper():
-            novo_dir = self.dirs['negativos']
-            status = 'OK, Negativa'
-        elif "POSITIVA" in texto.upper():
-            if re.search(r"POSITIVA\s*COM\s*EFEITO\s*DE\s*NEGATIVA", texto.upper()):
-                novo_dir = self.dirs['positivas_efeito_negativas']
-                status = 'OK, Positiva com Efeitos de Negativa'
-            else:
-                novo_dir = self.dirs['positivos']
-                status = 'OK, Positiva'
-        else:
-            novo_dir = self.dirs['positivos']
-            status = 'Texto não reconhecido'
+        self._mover_pdf_e_atualizar_planilha(cnpj, novo_caminho_pdf)
 
-        novo_caminho = os.path.join(novo_dir, f"{cnpj}.pdf")
-        shutil.move(caminho_pdf, novo_caminho)
-        self.gerenciador_planilha.atualizar_planilha(cnpj, status)
-        logging.info(f"PDF movido e planilha atualizada para o CNPJ: {cnpj} com status: {status}")
+    def _mover_pdf_e_atualizar_planilha(self, cnpj, caminho_pdf):
+        if self.pipeline is not None:
+            # Classificação e movimentação seguem nos processos do pipeline; o navegador segue para o próximo CNPJ
+            self.pipeline.enviar(cnpj, classificar_e_mover_pdf, cnpj, caminho_pdf, self.dirs)
+            return
+        resultado = classificar_e_mover_pdf(cnpj, caminho_pdf, self.dirs, self.processador_pdf)
+        self.gerenciador_planilha.atualizar_planilha(cnpj, *resultado)
 
 
-def carregar_cnpjs(caminho_planilha):
-    df = pd.read_excel(caminho_planilha)
+_processador_worker = None
 
-    df['CNPJ'] = df['CNPJ'].apply(lambda x: re.sub(r'\D', '', str(x)).zfill(14))
-    return df[df['NOME_CIDADE'].str.strip().str.lower() == 'curitiba']['CNPJ'].tolist()
 
+def iniciar_worker(caminho_cache=None):
+    global _processador_worker
+    _processador_worker = ProcessadorPDFCuritiba(caminho_cache)
 
-def main():
-    caminho_planilha = r'path/to/excel_file.xlsx'  # Caminho da planilha de consulta e salvamento
+
+def classificar_e_mover_pdf(cnpj, caminho_pdf, dirs, processador_pdf=None):
+    """Analisa o PDF (caminho ou bytes capturados) e o grava na pasta do status. Roda nos processos do pipeline."""
+    logging.info(f"Movendo PDF e atualizando planilha para o CNPJ: {cnpj}")
+    analise = (processador_pdf or _processador_worker).analisar(caminho_pdf)
+    status = analise.status or 'Texto não reconhecido'
+    if status == 'OK, Negativa':
+        novo_dir = dirs['negativos']
+    elif status == 'OK, Positiva com Efeitos de Negativa':
+        novo_dir = dirs['positivas_efeito_negativas']
+    else:
+        novo_dir = dirs['positivos']
+
+    novo_caminho = gravar_pdf(caminho_pdf, os.path.join(novo_dir, f"{cnpj}.pdf"))
+    logging.info(f"PDF movido para o CNPJ: {cnpj} com status: {status}")
+    return ResultadoConsulta(status, novo_caminho, analise.validade)
+
+
+def _eh_curitiba(registro):
+    return str(registro.extras.get("NOME_CIDADE") or "").strip().lower() == 'curitiba'
+
+
+def carregar_cnpjs(caminho_planilha):
+    for registro in ler_registros(caminho_planilha, colunas_extras=("NOME_CIDADE",)):
+        if _eh_curitiba(registro):
+            yield registro.cnpj
+
+
+def main(nova_rodada=False, dias_antecedencia_validade=7, processos_ocr=None, captura_em_memoria=True,
+         modo_http=False, url_base_http=None, workers_navegador=1, caminho_planilha=r'path/to/excel_file.xlsx',
+         escritor=None, registros=None, abas_por_navegador=1, perfil_chrome=COMPLETO, ritmo=None,
+         api_key_captcha=None):
+    # ritmo: pausa mínima entre ações e entre CNPJs (Ritmo(0) desativa); as esperas seguem as condições da página
+    ritmo = ritmo or Ritmo(1, 2)
+    # escritor e registros permitem compartilhar a planilha já carregada (orquestrador)
+    caminho_cache = 'cache_extracao.db'  # Cache em disco das análises de PDF
     dirs = {
         'downloads': os.path.join(os.path.expanduser('~'), 'Downloads'),
         'pdfs': r'path/to/cndcuritiba/pdfs',
@@ -241,26 +488,82 @@ def main():
     for dir_path in dirs.values():
         os.makedirs(dir_path, exist_ok=True)
 
-    cnpjs = carregar_cnpjs(caminho_planilha)
-
-    solucionador = None
-    processador_pdf = ProcessadorPDFCuritiba()
-    gerenciador_planilha = GerenciadorPlanilhaCuritiba(caminho_planilha)
-    navegador_web = NavegadorWebCuritiba(cnpjs, dirs, solucionador, processador_pdf, gerenciador_planilha)
-
-    chrome_options = navegador_web.configurar_chrome()
-    driver = uc.Chrome(options=chrome_options)
-
-    for cnpj in cnpjs:
+    armazem = ArmazemTarefas("Curitiba")
+    gerenciador_planilha = GerenciadorPlanilhaCuritiba(caminho_planilha, armazem, escritor, registros)
+
+    # Registra os CNPJs de Curitiba e retoma do último ponto salvo
+    armazem.registrar((cnpj, gerenciador_planilha.indice_linhas[cnpj]) for cnpj in gerenciador_planilha.cnpjs_curitiba)
+    if nova_rodada:
+        armazem.reiniciar()
+    cnpjs = [cnpj for cnpj, _ in armazem.pendentes(dias_antecedencia=dias_antecedencia_validade,
+                                                   rodada_completa=nova_rodada)]
+    logging.info(f"{len(cnpjs)} CNPJ(s) a processar")
+
+    def registrar_resultado(cnpj, resultado, erro):
+        if erro:
+            logging.error(f"Erro ao classificar o PDF do CNPJ {cnpj}: {erro}")
+            resultado = ResultadoConsulta(f"Erro ao classificar PDF: {erro}")
+        gerenciador_planilha.atualizar_planilha(cnpj, *resultado)
+
+    # 2Captcha com `api_key_captcha`; sem chave, o stub determinístico (o reCAPTCHA não tem OCR)
+    solucionador = criar_servico_captcha(api_key_captcha, max_workers=workers_navegador * abas_por_navegador)
+    processador_pdf = ProcessadorPDFCuritiba(caminho_cache)
+    pipeline = PipelineProcessamento(registrar_resultado, max_processos=processos_ocr,
+                                     inicializador=iniciar_worker, args_inicializador=(caminho_cache,))
+
+    def iniciar_navegador(worker):
+        # Cada worker tem seu Chrome, sua pasta de downloads e, no modo HTTP, sua sessão;
+        # url_base_http aponta o fluxo HTTP a um servidor que imite o portal
+        dirs_worker = dict(dirs, downloads=worker.diretorio)
+        sessao_http = SessaoHTTP(url_base_http) if modo_http else None
+        navegador_web = NavegadorWebCuritiba(cnpjs, dirs_worker, solucionador, processador_pdf, gerenciador_planilha,
+                                             pipeline, captura_em_memoria, sessao_http, 9222 + worker.indice,
+                                             perfil_chrome, ritmo)
+        driver = uc.Chrome(options=navegador_web.configurar_chrome())
+        bloquear_recursos(driver, perfil_chrome)
+        return navegador_web, driver
+
+    def processar(estado, cnpj):
+        navegador_web, driver = estado
+        armazem.iniciar(cnpj)
         try:
             navegador_web.acessar_site(driver, cnpj)
         except Exception as e:
-            logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj} após tentativa com tempos aumentados: {e}")
+            logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj}: {e}")
             gerenciador_planilha.atualizar_planilha(cnpj, f"Erro: {e}")
-        time.sleep(30)
-
-    driver.quit()
-    gerenciador_planilha.salvar_planilha()
+        ritmo.pausar()
+
+    def processar_em_abas(estado, cnpjs_worker):
+        # Várias abas no mesmo Chrome: enquanto uma espera o portal gerar a certidão, outra preenche o próximo CNPJ
+        navegador_web, driver = estado
+
+        def criar_rotina(driver, cnpj):
+            armazem.iniciar(cnpj)
+            return navegador_web.rotina_aba(driver, cnpj)
+
+        AgendadorAbas(driver, max_abas=abas_por_navegador).executar(cnpjs_worker, criar_rotina)
+
+    def finalizar_navegador(estado):
+        navegador_web, driver = estado
+        driver.quit()
+        if navegador_web.sessao_http:
+            navegador_web.sessao_http.fechar()
+        navegador_web.downloads.limpar()
+
+    em_abas = abas_por_navegador > 1 and not modo_http
+    pool = PoolNavegadores("Curitiba", iniciar_navegador, processar_em_abas if em_abas else processar,
+                           finalizar_navegador, max_workers=workers_navegador, em_lote=em_abas)
+    try:
+        pool.executar(cnpjs)
+    finally:
+        # Aguarda os PDFs em processamento e exporta o estado das tarefas
+        pipeline.encerrar()
+        gerenciador_planilha.exportar()
+        gerenciador_planilha.salvar_planilha()
+        armazem.fechar()
+        metricas.resumo("Curitiba", perfil_chrome)
+        disjuntor_portal('Curitiba').resumo()
+        solucionador.encerrar()
 
 
 if __name__ == "__main__":
@@ -1,46 +1,84 @@
 # cndestadual.py
 
 import os
-import time
-import pandas as pd
 import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
 import logging
 import pytesseract
-import fitz
-import shutil
-from PIL import Image
 import re
-import random
+import requests
+from escritor_planilha import EscritorPlanilha
+from leitor_planilha import com_status, ler_cabecalho, ler_registros
+from estado_tarefas import ArmazemTarefas, ResultadoConsulta
+from extracao_pdf import CacheExtracao, ExtratorTextoPDF
+from pipeline_ocr import PipelineProcessamento
+from motor_ocr import configurar_motor_ocr
+from gerenciador_downloads import GerenciadorDownloads
+from captura_pdf import CapturaPDF, gravar_pdf, habilitar_log_rede
+from sessao_http import SessaoHTTP, analisar_html
+from pool_navegadores import PoolNavegadores
+from navegacao import CacheNavegacao
+from esperas import aguardar, aguardar_pagina, elemento_clicavel, elemento_presente, elementos_substituidos, qualquer
+from limitador_taxa import limitador_portal
+from preenchimento import preencher_campo
+from disjuntor import STATUS_INDISPONIVEL, PortalIndisponivel, disjuntor_portal
+from politica_retentativa import FalhaTransitoria, TentativasEsgotadas, politica_portal
+from perfil_navegador import COMPLETO, bloquear_recursos, configurar_perfil, metricas
 
 # Configuração do Tesseract
 pytesseract.pytesseract.tesseract_cmd = r'path/to/tesseract.exe' # Tesseract para OCR
 os.environ['TESSDATA_PREFIX'] = r'path/to/tessdata'  # Tessdata
+# Instâncias do Tesseract mantidas carregadas por processo (tesserocr); sem ele, volta ao pytesseract
+configurar_motor_ocr(tamanho_pool=1)
 
 download_directory = os.path.join(os.path.expanduser("~"), "Downloads")
+captura_pdf_em_memoria = True  # Lê o PDF da resposta via CDP; se vier como anexo, espera o download
+captura = CapturaPDF(timeout=30) if captura_pdf_em_memoria else None
+politica = politica_portal("SEFA-PR")  # Repete só falhas transitórias, com espera crescente e orçamento por CNPJ
+limitador = limitador_portal("SEFA-PR")  # Taxa de consultas comum a todos os workers, ajustada pelas respostas
+modo_http = False  # True: o navegador só abre a sessão; formulário e PDF seguem por HTTP
+url_base_http = None  # Ex.: 'http://localhost:8000' para apontar o modo HTTP a um servidor que imite o portal
+workers_navegador = 1  # Sessões de navegador em paralelo (limitadas por LIMITES_PORTAL['SEFA-PR'])
+perfil_chrome = COMPLETO  # ENXUTO: headless, sem fontes/analytics/banners (captcha e PDF continuam liberados)
 
 negativas_dir = r'path/to/cndestadual/pr_negativas'
 positivas_efeito_negativas_dir = r'path/to/cndestadual/pr_positivas_efeito_negativas'
+nova_rodada = False  # True para reprocessar todos os CNPJs, ignorando o progresso salvo
+dias_antecedencia_validade = 7  # Reconsulta certidões que vencem dentro deste prazo (None desativa)
+cache_extracao_db = 'cache_extracao.db'  # Cache em disco das análises de PDF (None mantém só em memória)
+processos_ocr = None  # Processos que classificam os PDFs em paralelo ao navegador (None: cota dos núcleos - 1)
+faixa_titulo_ocr = 0.35  # Fração superior da 1ª página lida primeiro (título e CNPJ); None lê a página inteira
+
+PADRAO_COM_EFEITOS = re.compile(r"COM\s*(?:E|F|E?T?F?E?I?T?O?S?)?\s*DE\s*NEGATIVA")
+PADRAO_CNPJ_CERTIDAO = re.compile(r'CNPJMF[:\s]*([0-9./-]+)')
+MENSAGEM_SEM_CERTIDAO = "As informações disponíveis não permitem a emissão de Certidão Automática para o requerente."
 
 def configurar_logging():
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def carregar_dados(planilha):
-    df = pd.read_excel(planilha, dtype={'CNPJ': str})  # Garantir que os CNPJs sejam lidos como strings
-    if 'CND_ESTADUAL' not in df.columns:
-        df['CND_ESTADUAL'] = ''
-    else:
-        df['CND_ESTADUAL'] = df['CND_ESTADUAL'].astype(str)
-    return df
-
-def iniciar_navegador():
+def carregar_dados(planilha, registros=None):
+    # Lê apenas CNPJ e CND_ESTADUAL, linha a linha, ou reaproveita os registros já carregados
+    if registros is not None:
+        return com_status(registros, 'CND_ESTADUAL')
+    return ler_registros(planilha, coluna_status='CND_ESTADUAL')
+
+def obter_coluna_status(planilha, escritor):
+    cabecalho = ler_cabecalho(planilha)
+    if 'CND_ESTADUAL' in cabecalho:
+        return cabecalho['CND_ESTADUAL']
+    # Coluna ainda não existe: cria o cabeçalho ao final da planilha
+    coluna = max(cabecalho.values(), default=0) + 1
+    escritor.atualizar(1, coluna, 'CND_ESTADUAL')
+    return coluna
+
+def iniciar_navegador(diretorio_downloads=None):
     options = uc.ChromeOptions()
     prefs = {
         "profile.default_content_settings.popups": 0,
-        "download.default_directory": download_directory,
+        "download.default_directory": diretorio_downloads or download_directory,
         "safebrowsing.enabled": "false",
         "profile.default_content_setting_values.automatic_downloads": 1,
         "download.prompt_for_download": False,
@@ -48,40 +86,48 @@ def iniciar_navegador():
         "safebrowsing.disable_download_protection": True
     }
     options.add_experimental_option("prefs", prefs)
+    if captura is not None:
+        habilitar_log_rede(options)
+    configurar_perfil(options, perfil_chrome)
     driver = uc.Chrome(options=options)
+    bloquear_recursos(driver, perfil_chrome)
     return driver
 
 class ProcessadorPDF:
-    @staticmethod
-    def pixmap_para_pil(pix):
-        mode = "RGBA" if pix.alpha else "RGB"
-        size = (pix.width, pix.height)
-        return Image.frombytes(mode, size, pix.samples)
+    cache = None  # CacheExtracao do processo, compartilhado pelas instâncias e aberto por iniciar_processo_pdf
+
+    def analisar(self, caminho_pdf):
+        return ProcessadorPDF.cache.analisar(caminho_pdf)
 
     def extrair_texto_de_pdf(self, caminho_pdf):
-        texto = ""
-        with fitz.open(caminho_pdf) as doc:
-            for page_number, page in enumerate(doc):
-                pix = page.get_pixmap()
-                img = self.pixmap_para_pil(pix)
-                texto += pytesseract.image_to_string(img, lang='por')
-        return texto
+        return self.analisar(caminho_pdf).texto
 
     def verificar_status_pdf(self, caminho_pdf):
-        texto = self.extrair_texto_de_pdf(caminho_pdf).upper()
-        match_com_efeitos = re.search(r"COM\s*(?:E|F|E?T?F?E?I?T?O?S?)?\s*DE\s*NEGATIVA", texto)
+        return self.analisar(caminho_pdf).status or "Texto não reconhecido"
 
-        if "POSITIVA" in texto:
-            if match_com_efeitos:
-                status = "Positiva com Efeitos de Negativa"
-            else:
-                status = "Positiva"
-        elif "NEGATIVA" in texto:
-            status = "Negativa"
-        else:
-            status = "Texto não reconhecido"
+    def classificar_pdf(self, caminho_pdf):
+        """Retorna (status, data de validade)."""
+        analise = self.analisar(caminho_pdf)
+        return analise.status or "Texto não reconhecido", analise.validade
 
-        return status
+    @staticmethod
+    def status_do_texto(texto):
+        """Status da certidão, ou None se o texto lido até agora não permite decidir."""
+        texto = texto.upper()
+        if "POSITIVA" in texto:
+            if PADRAO_COM_EFEITOS.search(texto):
+                return "Positiva com Efeitos de Negativa"
+            return "Positiva"
+        if "NEGATIVA" in texto:
+            return "Negativa"
+        return None
+
+def iniciar_processo_pdf(caminho_cache=None):
+    # Inicializador dos processos do pipeline: cada processo abre a própria conexão com o cache.
+    # A análise para de ler páginas assim que status, CNPJ e validade forem encontrados
+    ProcessadorPDF.cache = CacheExtracao('SEFA-PR', ProcessadorPDF.status_do_texto, padrao_cnpj=PADRAO_CNPJ_CERTIDAO,
+                                         extrator=ExtratorTextoPDF(faixa_titulo=faixa_titulo_ocr),
+                                         caminho_disco=caminho_cache)
 
 # Função para acessar o site e clicar em "Emitir"
 def acessar_site(driver):
@@ -103,8 +149,8 @@ def acessar_site(driver):
                 break
             except (TimeoutException, NoSuchElementException) as e:
                 logging.error(f"Falha ao clicar no botão 'Emitir'. Tentando novamente... - {e}")
-                time.sleep(5)
                 driver.refresh()  # Recarregar a página e tentar novamente
+                aguardar_pagina(driver)
                 continue
 
         driver.switch_to.window(driver.window_handles[-1])
@@ -120,139 +166,248 @@ def preencher_formulario(driver, cnpj):
     try:
         logging.info(f"Preenchendo formulário para o CNPJ: {cnpj}")
 
-        time.sleep(random.uniform(2, 5))  # Aguardar um pouco mais para garantir que todos os scripts do site sejam carregados
-        cnpj_input = driver.find_element(By.ID, "EmissaoCnpj")
-        cnpj_input.clear()
-        cnpj_input.send_keys(cnpj)
-        time.sleep(random.uniform(1, 3))  # Aguardar um pouco antes de clicar no botão
+        aguardar_pagina(driver)  # Garantir que todos os scripts do site foram carregados
+        cnpj_input = aguardar(driver, elemento_clicavel((By.ID, "EmissaoCnpj")), timeout=20)
+        preencher_campo(driver, cnpj_input, cnpj, "SEFA-PR")
+        limitador.adquirir()  # Respeitar a taxa de consultas do portal antes de enviar
 
-        submit_button = driver.find_element(By.ID, "submitBtn")
+        # Com o formulário reaproveitado, o alerta do CNPJ anterior ainda está na página: a resposta só é lida
+        # depois que ele for substituído, para não atribuir o status ou o PDF anterior a este CNPJ
+        alertas_anteriores = driver.find_elements(By.CSS_SELECTOR, ".alert-success, .alert-danger")
+        submit_button = aguardar(driver, elemento_clicavel((By.ID, "submitBtn")), timeout=10)
         submit_button.click()
+        if alertas_anteriores:
+            aguardar(driver, elementos_substituidos(alertas_anteriores), timeout=20,
+                     mensagem="alerta do CNPJ anterior continua na página")
 
     except Exception as e:
         logging.error(f"Erro ao preencher o formulário para o CNPJ: {cnpj} - {e}")
         raise
 
-# Função para processar o resultado
-def processar_resultado(driver, cnpj, row_index):
-    processador_pdf = ProcessadorPDF()
-    tentativas = 0
-    while tentativas < 3:
+class ConsultaHTTPSefa:
+    """Reenvia o formulário de emissão por HTTP, na sessão aberta pelo navegador, e baixa o PDF."""
+
+    def __init__(self, driver, sessao):
+        self.sessao = sessao
+        self.referencia = driver.current_url
+        self.campo_cnpj = driver.find_element(By.ID, "EmissaoCnpj").get_attribute("name")
+        self.formulario = sessao.ler_formulario(driver, "EmissaoCnpj")
+        sessao.importar_navegador(driver)
+
+    def consultar(self, cnpj):
+        """Retorna os bytes do PDF, um ResultadoConsulta sem PDF, ou None se a resposta não for reconhecida."""
+        limitador.adquirir()
         try:
-            success_alert = WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CLASS_NAME, "alert-success")))
-            pdf_link = success_alert.find_element(By.LINK_TEXT, "CLIQUE AQUI")
-            pdf_link.click()
-            time.sleep(random.uniform(15, 20))  # Tempo aumentado para garantir o download
-
-            pdf_filename = encontrar_arquivo_pdf(download_directory)
-            if pdf_filename:
-                status = processador_pdf.verificar_status_pdf(pdf_filename)
-                cnpj_extraido = extrair_cnpj_do_texto(pdf_filename)
-
-                if cnpj_extraido and cnpj_extraido != cnpj:
-                    logging.warning(
-                        f"CNPJ extraído ({cnpj_extraido}) é diferente do esperado ({cnpj}). Usando CNPJ extraído.")
-
-                cnpj_usado_para_nome = cnpj_extraido if cnpj_extraido else cnpj
-
-                if status == 'Negativa':
-                    novo_nome = os.path.join(negativas_dir, f"{cnpj_usado_para_nome}_negativa.pdf")
-                    resultado = "OK, Negativa"
-                elif status == 'Positiva com Efeitos de Negativa':
-                    novo_nome = os.path.join(positivas_efeito_negativas_dir,
-                                             f"{cnpj_usado_para_nome}_positiva_efeito_negativa.pdf")
-                    resultado = "OK, Positivas efeito negativas"
-                else:
-                    novo_nome = os.path.join(download_directory, f"{cnpj_usado_para_nome}_texto_nao_reconhecido.pdf")
-                    resultado = "Texto não reconhecido"
-
-                if os.path.exists(novo_nome):
-                    os.remove(novo_nome)
-                shutil.move(pdf_filename, novo_nome)
-                logging.info(f"Arquivo movido e renomeado para: {novo_nome}")
-                return resultado
-            else:
-                logging.error(f"Erro ao localizar o PDF para o CNPJ: {cnpj}")
-                return "Erro no download do PDF"
-        except (NoSuchElementException, TimeoutException, WebDriverException) as e:
-            tentativas += 1
-            logging.error(f"Tentativa {tentativas} falhou para o CNPJ: {cnpj} - {e}. Recarregando a página.")
-            driver.refresh()
-            time.sleep(random.uniform(3, 5))  # Aguarde alguns segundos antes de tentar novamente
+            resposta = self.sessao.enviar_formulario(self.formulario, {self.campo_cnpj: cnpj}, self.referencia)
+            pagina = analisar_html(resposta.text)
+            self._atualizar_tokens(pagina)
+            if "alert-success" in pagina.textos_por_classe:
+                for href, texto in pagina.links:
+                    if texto.strip().upper() == "CLIQUE AQUI":
+                        limitador.sucesso()
+                        return self.sessao.obter_pdf(href, resposta.url)
+            mensagem_erro = " ".join(pagina.textos_por_classe.get("alert-danger", "").split())
+            if MENSAGEM_SEM_CERTIDAO in mensagem_erro:
+                logging.warning(f"Erro na emissão para o CNPJ: {cnpj} - {mensagem_erro}")
+                limitador.sucesso()
+                return ResultadoConsulta("S/CND")
+        except requests.RequestException as e:
+            logging.error(f"Falha na consulta HTTP do CNPJ {cnpj}: {e}")
+        limitador.estrangulado("resposta HTTP não reconhecida")
+        return None
+
+    def _atualizar_tokens(self, pagina):
+        # Tokens antifalsificação renovados na resposta substituem os anteriores
+        for formulario in pagina.formularios:
+            if self.campo_cnpj in formulario.campos:
+                for nome, valor in formulario.campos.items():
+                    if nome != self.campo_cnpj:
+                        self.formulario.campos[nome] = valor
+
+# Extrai, classifica e grava o PDF (caminho baixado ou bytes capturados); roda nos processos do pipeline
+def classificar_e_mover_pdf(cnpj, pdf_filename):
+    processador_pdf = ProcessadorPDF()
+    status, validade = processador_pdf.classificar_pdf(pdf_filename)
+    cnpj_extraido = extrair_cnpj_do_texto(pdf_filename)
+
+    if cnpj_extraido and cnpj_extraido != cnpj:
+        logging.warning(
+            f"CNPJ extraído ({cnpj_extraido}) é diferente do esperado ({cnpj}). Usando CNPJ extraído.")
+
+    cnpj_usado_para_nome = cnpj_extraido if cnpj_extraido else cnpj
+
+    if status == 'Negativa':
+        novo_nome = os.path.join(negativas_dir, f"{cnpj_usado_para_nome}_negativa.pdf")
+        resultado = "OK, Negativa"
+    elif status == 'Positiva com Efeitos de Negativa':
+        novo_nome = os.path.join(positivas_efeito_negativas_dir,
+                                 f"{cnpj_usado_para_nome}_positiva_efeito_negativa.pdf")
+        resultado = "OK, Positivas efeito negativas"
+    else:
+        novo_nome = os.path.join(download_directory, f"{cnpj_usado_para_nome}_texto_nao_reconhecido.pdf")
+        resultado = "Texto não reconhecido"
+
+    gravar_pdf(pdf_filename, novo_nome)
+    logging.info(f"Arquivo gravado em: {novo_nome}")
+    return ResultadoConsulta(resultado, novo_nome, validade)
+
+# Classifica o PDF na hora ou o entrega ao pipeline (retornando None)
+def encaminhar_pdf(cnpj, pdf, pipeline=None):
+    if pipeline is None:
+        return classificar_e_mover_pdf(cnpj, pdf)
+    pipeline.enviar(cnpj, classificar_e_mover_pdf, cnpj, pdf)
+    return None
 
-    try:
-        error_alert = driver.find_element(By.CLASS_NAME, "alert-danger")
-        mensagem_erro = error_alert.text.strip()
-        if "As informações disponíveis não permitem a emissão de Certidão Automática para o requerente." in mensagem_erro:
+# Uma leitura da resposta: PDF, S/CND (definitivo) ou FalhaTransitoria para repetir
+def _obter_certidao(driver, cnpj, pipeline, gerenciador_downloads):
+    alerta = aguardar(driver, qualquer(elemento_presente((By.CLASS_NAME, "alert-success")),
+                                       elemento_presente((By.CLASS_NAME, "alert-danger"))), timeout=10)
+    if "alert-danger" in (alerta.get_attribute("class") or ""):
+        mensagem_erro = alerta.text.strip()
+        if MENSAGEM_SEM_CERTIDAO in " ".join(mensagem_erro.split()):
             logging.warning(f"Erro na emissão para o CNPJ: {cnpj} - {mensagem_erro}")
-            return "S/CND"
-    except NoSuchElementException:
-        logging.error(f"Erro desconhecido para o CNPJ: {cnpj} após várias tentativas")
-
-    return "Erro desconhecido após várias tentativas"
-
-# Função para encontrar o arquivo PDF recém-baixado
-def encontrar_arquivo_pdf(diretorio):
-    # Definir um tempo limite total para a busca
-    tempo_limite = 30
-    tempo_passado = 0
-    while tempo_passado < tempo_limite:
-        arquivos = os.listdir(diretorio)
-        arquivos_pdf = [os.path.join(diretorio, arquivo) for arquivo in arquivos if arquivo.endswith(".pdf")]
-        if arquivos_pdf:
-            # Encontrar o arquivo PDF mais recente na pasta
-            pdf_mais_recente = max(arquivos_pdf, key=os.path.getctime)
-            return pdf_mais_recente
-        time.sleep(1)
-        tempo_passado += 1
-    return None
+            limitador.sucesso()  # Resposta válida do portal
+            return ResultadoConsulta("S/CND")
+        limitador.estrangulado("alerta de erro")
+        raise FalhaTransitoria(f"alerta de erro: {mensagem_erro}")
+    pdf_link = alerta.find_element(By.LINK_TEXT, "CLIQUE AQUI")
+    limitador.sucesso()
+    gerenciador_downloads.preparar(driver, cnpj)
+    if captura is not None:
+        captura.preparar(driver)
+    pdf_link.click()
+
+    # PDF capturado em memória ou, se o portal o entregar como anexo, baixado
+    pdf_filename = captura.aguardar(driver) if captura is not None else None
+    if not pdf_filename:
+        pdf_filename = gerenciador_downloads.aguardar(cnpj)
+    if not pdf_filename:
+        logging.error(f"Erro ao localizar o PDF para o CNPJ: {cnpj}")
+        return ResultadoConsulta("Erro no download do PDF")  # Transitório: a política repete
+    return encaminhar_pdf(cnpj, pdf_filename, pipeline)
+
+# Função para processar o resultado; retorna um ResultadoConsulta, ou None se o PDF foi entregue ao pipeline
+def processar_resultado(driver, cnpj, row_index, pipeline=None, gerenciador_downloads=None):
+    # Sem o gerenciador do worker, cada CNPJ baixa numa subpasta de Downloads/cndestadual
+    gerenciador_downloads = gerenciador_downloads or GerenciadorDownloads(
+        os.path.join(download_directory, "cndestadual"), timeout=30)
+
+    def tentativa(numero):
+        if numero > 1:
+            driver.refresh()  # Recarregar a página e tentar novamente
+            aguardar_pagina(driver)
+        return _obter_certidao(driver, cnpj, pipeline, gerenciador_downloads)
+
+    try:
+        return politica.executar(tentativa, f"CNPJ {cnpj}")
+    except TentativasEsgotadas as e:
+        logging.error(f"Erro para o CNPJ: {cnpj} após várias tentativas - {e}")
+        return ResultadoConsulta("Erro desconhecido após várias tentativas")
 
 # Função para extrair o CNPJ do texto extraído do PDF
 def extrair_cnpj_do_texto(caminho_pdf):
-    processador = ProcessadorPDF()
-    texto = processador.extrair_texto_de_pdf(caminho_pdf).upper()
-    match = re.search(r'CNPJMF[:\s]*([0-9./-]+)', texto)
-    if match:
-        cnpj = re.sub(r'\D', '', match.group(1))
-        return cnpj if len(cnpj) == 14 else None
-    return None
+    # Reaproveita a análise já feita na verificação de status
+    return ProcessadorPDF().analisar(caminho_pdf).cnpj
 
-# Função principal
-def main():
-    configurar_logging()
-    planilha = r'path/to/excel_file.xlsx'  # Caminho da planilha de consulta e salvamento
-    dirs = {
-        'downloads': os.path.join(os.path.expanduser('~'), 'Downloads'),
-        'pdfs': r'path/to/cndcuritiba/pdfs',
-        'negativos': r'path/to/cndcuritiba/negativos',
-        'positivos': r'path/to/cndcuritiba/positivos',
-        'positivas_efeito_negativas': r'path/to/cndcuritiba/positivas_efeito_negativas'
-    }
-    for dir_path in dirs.values():
+# Consulta os CNPJs pendentes; `escritor` e `registros` permitem compartilhar a planilha já carregada
+def executar(planilha=r'path/to/excel_file.xlsx', escritor=None, registros=None):  # Planilha de consulta e salvamento
+    for dir_path in (download_directory, negativas_dir, positivas_efeito_negativas_dir):
         os.makedirs(dir_path, exist_ok=True)
-
-    cnpjs = carregar_cnpjs(planilha)
-
-    # solucionador = SolucionadorRecaptcha('your_captcha_api_key')  # Comentado: Integre uma solução de CAPTCHA
-    solucionador = None  # Placeholder
-    processador_pdf = ProcessadorPDFCuritiba()
-    gerenciador_planilha = GerenciadorPlanilhaCuritiba(planilha)
-    navegador_web = NavegadorWebCuritiba(cnpjs, dirs, solucionador, processador_pdf, gerenciador_planilha)
-
-    chrome_options = navegador_web.configurar_chrome()
-    driver = uc.Chrome(options=chrome_options)
-
-    for cnpj in cnpjs:
+    iniciar_processo_pdf(cache_extracao_db)  # Cache do processo principal, aberto só ao executar
+
+    escritor_proprio = escritor is None
+    escritor = escritor or EscritorPlanilha(planilha)
+    coluna_status = obter_coluna_status(planilha, escritor)
+
+    # Registra os CNPJs e retoma do último ponto salvo
+    armazem = ArmazemTarefas("SEFA-PR")
+    armazem.registrar((registro.cnpj, registro.linha) for registro in carregar_dados(planilha, registros))
+    if nova_rodada:
+        armazem.reiniciar()
+    cnpjs = armazem.pendentes(dias_antecedencia=dias_antecedencia_validade, rodada_completa=nova_rodada)
+    logging.info(f"{len(cnpjs)} CNPJ(s) a processar")
+
+    linhas = dict(cnpjs)
+
+    def registrar_resultado(cnpj, resultado, erro):
+        if erro:
+            logging.error(f"Erro ao classificar o PDF do CNPJ {cnpj}: {erro}")
+            resultado = ResultadoConsulta(f"Erro ao classificar PDF: {erro}")
+        armazem.concluir(cnpj, *resultado)
+        escritor.atualizar(linhas[cnpj], coluna_status, resultado.status)
+
+    def iniciar_worker(worker):
+        # Cada worker tem seu navegador, sua pasta de downloads e, no modo HTTP, sua sessão
+        # O formulário carregado é reaproveitado entre CNPJs; a página inicial só é refeita se a sessão expirar
+        estado = {'driver': iniciar_navegador(worker.diretorio),
+                  'downloads': GerenciadorDownloads(worker.diretorio, timeout=30),
+                  'navegacao': CacheNavegacao("SEFA-PR", (By.ID, "EmissaoCnpj"), acessar_site, exigir_vazio=False),
+                  'consulta_http': None}
+        try:
+            estado['navegacao'].ir_para_formulario(estado['driver'])
+            if modo_http:
+                estado['consulta_http'] = ConsultaHTTPSefa(estado['driver'], SessaoHTTP(url_base_http))
+        except Exception:
+            finalizar_worker(estado)
+            raise
+        return estado
+
+    def processar(estado, tarefa):
+        cnpj, row_index = tarefa
+        armazem.iniciar(cnpj)
+        try:
+            disjuntor.aguardar_liberacao()  # Com o portal fora do ar, a tarefa espera a sonda de saúde
+        except PortalIndisponivel as e:
+            logging.error(f"CNPJ {cnpj} não consultado: {e}")
+            pipeline.registrar(cnpj, ResultadoConsulta(STATUS_INDISPONIVEL))  # Volta à fila na próxima execução
+            return
+        consulta_http = estado['consulta_http']
         try:
-            navegador_web.acessar_site(driver, cnpj)
+            # No modo HTTP, o navegador só é usado se a resposta não for reconhecida
+            retorno = consulta_http.consultar(cnpj) if consulta_http else None
+            if isinstance(retorno, bytes):
+                resultado = encaminhar_pdf(cnpj, retorno, pipeline)
+            elif retorno is not None:
+                resultado = retorno
+            else:
+                estado['navegacao'].ir_para_formulario(estado['driver'])
+                preencher_formulario(estado['driver'], cnpj)
+                resultado = processar_resultado(estado['driver'], cnpj, row_index, pipeline, estado['downloads'])
         except Exception as e:
-            logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj} após tentativa com tempos aumentados: {e}")
-            gerenciador_planilha.atualizar_planilha(cnpj, f"Erro: {e}")
-        time.sleep(30)
+            logging.error(f"Ocorreu um erro ao processar o CNPJ {cnpj}: {e}")
+            disjuntor.registrar(e)
+            resultado = ResultadoConsulta(f"Erro: {e}")
+        else:
+            disjuntor.registrar(resultado)  # Resposta do portal: fecha o disjuntor meio-aberto
+        if resultado is not None:
+            pipeline.registrar(cnpj, resultado)
+
+    def finalizar_worker(estado):
+        estado['driver'].quit()
+        if estado['consulta_http']:
+            estado['consulta_http'].sessao.fechar()
+        estado['downloads'].limpar()
+
+    disjuntor = disjuntor_portal("SEFA-PR")
+    pipeline = PipelineProcessamento(registrar_resultado, max_processos=processos_ocr,
+                                     inicializador=iniciar_processo_pdf, args_inicializador=(cache_extracao_db,))
+    pool = PoolNavegadores("SEFA-PR", iniciar_worker, processar, finalizar_worker, max_workers=workers_navegador)
+    try:
+        pool.executar(cnpjs)
+    finally:
+        # Aguarda os PDFs em processamento e exporta o estado das tarefas
+        pipeline.encerrar()
+        armazem.exportar(escritor, coluna_status)
+        if escritor_proprio:
+            escritor.fechar()
+        armazem.fechar()
+        metricas.resumo("SEFA-PR", perfil_chrome)
+        disjuntor.resumo()
 
-    driver.quit()
-    gerenciador_planilha.salvar_planilha()
+# Função principal
+def main():
+    configurar_logging()
+    executar()
 
 
 if __name__ == "__main__":
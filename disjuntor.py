@@ -0,0 +1,171 @@
+# disjuntor.py
+
+import time
+import logging
+import threading
+from collections import Counter
+import requests
+from selenium.common.exceptions import WebDriverException
+
+FECHADO = 'fechado'  # Portal respondendo; consultas liberadas
+ABERTO = 'aberto'  # Portal fora do ar; consultas estacionadas até a sonda responder
+MEIO_ABERTO = 'meio-aberto'  # Sonda respondeu; uma consulta de teste confirma (fecha) ou reabre
+
+# Páginas leves usadas na sonda de saúde de cada portal
+URLS_SAUDE = {
+    'CEF': 'https://consulta-crf.caixa.gov.br/consultacrf/pages/consultaEmpregador.jsf',
+    'TST': 'https://www.tst.jus.br/certidao1',
+    'SEFA-PR': 'https://www.fazenda.pr.gov.br/servicos/Mais-buscados/Certidoes/'
+               'Emitir-Certidao-Negativa-Receita-Estadual-kZrX5gol',
+    'Curitiba': 'https://cnd-cidadao.curitiba.pr.gov.br/',
+}
+
+# Status de quem trata a exceção internamente e só devolve o resultado (ex.: trabalhista)
+STATUS_INDISPONIVEL = "Falhou: portal indisponível"
+
+# Erros de rede do Chrome (net::ERR_*), tempo de carregamento da página esgotado e respostas de
+# gateway que indicam o portal fora do ar. Esperas por elementos (TimeoutException do WebDriverWait)
+# não entram: captcha recusado ou página lenta não devem abrir o disjuntor
+_MARCADORES_INFRA = ('net::ERR_', 'Timed out receiving message from renderer',
+                     '502 Bad Gateway', '503 Service', '504 Gateway')
+
+_disjuntores = {}
+_lock_disjuntores = threading.Lock()
+
+
+class PortalIndisponivel(Exception):
+    """O portal ficou fora do ar por mais tempo que a espera máxima do disjuntor."""
+
+
+def falha_de_infraestrutura(desfecho):
+    """Se o desfecho de uma consulta indica portal fora do ar (e não captcha errado, CNPJ sem certidão etc.)."""
+    if isinstance(desfecho, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(desfecho, requests.HTTPError) and desfecho.response is not None:
+        return desfecho.response.status_code >= 500
+    if isinstance(desfecho, (WebDriverException, requests.RequestException)):
+        return any(marcador in str(desfecho) for marcador in _MARCADORES_INFRA)
+    status = getattr(desfecho, 'status', desfecho)
+    return isinstance(status, str) and status.startswith(STATUS_INDISPONIVEL)
+
+
+class Disjuntor:
+    """Disjuntor de um portal, compartilhado por todos os workers do processo.
+
+    Após `limite_falhas` falhas de infraestrutura seguidas ele abre: os workers
+    param antes da próxima consulta (as tarefas ficam na fila) enquanto um deles
+    roda a sonda de saúde a cada `intervalo_sonda` segundos. Quando a sonda
+    responde, o disjuntor fica meio-aberto e só o worker que sondou passa, com
+    uma consulta de teste: a resposta do portal fecha o disjuntor e libera os
+    demais, e uma nova falha o reabre. Se o teste não informar o desfecho em
+    `espera_teste` segundos, a vez passa para outro worker. Depois de
+    `espera_maxima` segundos aberto, levanta PortalIndisponivel e as tarefas
+    ficam pendentes para a próxima execução.
+    """
+
+    def __init__(self, portal, url_saude=None, limite_falhas=5, intervalo_sonda=60, timeout_sonda=10,
+                 espera_maxima=2 * 60 * 60, espera_teste=5 * 60):
+        self.portal = portal
+        self.url_saude = url_saude or URLS_SAUDE.get(portal)
+        self.limite_falhas = limite_falhas
+        self.intervalo_sonda = intervalo_sonda
+        self.timeout_sonda = timeout_sonda
+        self.espera_maxima = espera_maxima
+        self.espera_teste = espera_teste
+        self.estado = FECHADO
+        self.falhas = 0
+        self.aberto_em = None
+        self.estatisticas = Counter()
+        self._condicao = threading.Condition()
+        self._sondando = False
+        self._teste_desde = None  # Início da consulta de teste do meio-aberto
+
+    def _mudar(self, estado, motivo):
+        anterior, self.estado = self.estado, estado
+        self._teste_desde = None
+        self.estatisticas[estado] += 1
+        if estado == ABERTO:
+            self.aberto_em = time.monotonic()
+        elif anterior == ABERTO and self.aberto_em is not None:
+            self.estatisticas['segundos_aberto'] += int(time.monotonic() - self.aberto_em)
+        nivel = logging.WARNING if estado == ABERTO else logging.INFO
+        logging.log(nivel, f"[{self.portal}] Disjuntor {anterior} -> {estado} ({motivo})")
+        self._condicao.notify_all()
+
+    def registrar(self, desfecho):
+        """Conta o desfecho de uma consulta: falha de infraestrutura ou resposta do portal."""
+        with self._condicao:
+            if falha_de_infraestrutura(desfecho):
+                self.falhas += 1
+                self.estatisticas['falhas_infra'] += 1
+                if self.estado == MEIO_ABERTO or (self.estado == FECHADO and self.falhas >= self.limite_falhas):
+                    self._mudar(ABERTO, f"{self.falhas} falha(s) de infraestrutura seguidas: {desfecho}")
+            else:
+                self.falhas = 0
+                if self.estado == MEIO_ABERTO:
+                    self._mudar(FECHADO, "portal voltou a responder")
+
+    def sondar(self):
+        """Requisição leve à página do portal; True se ele respondeu sem erro de servidor."""
+        self.estatisticas['sondas'] += 1
+        try:
+            resposta = requests.get(self.url_saude, timeout=self.timeout_sonda, stream=True)
+            resposta.close()
+            return resposta.status_code < 500
+        except requests.RequestException as e:
+            logging.info(f"[{self.portal}] Sonda de saúde sem resposta: {e}")
+            return False
+
+    def _liberar(self):
+        # Chamado com o lock: fechado libera todos; meio-aberto, só a consulta de teste
+        if self.estado == FECHADO:
+            return True
+        agora = time.monotonic()
+        if self.estado == MEIO_ABERTO and (self._teste_desde is None
+                                           or agora - self._teste_desde > self.espera_teste):
+            self._teste_desde = agora
+            return True
+        return False
+
+    def liberar(self):
+        """Sem bloquear: True se a consulta pode seguir (no meio-aberto, só a de teste)."""
+        with self._condicao:
+            return self._liberar()
+
+    def aguardar_liberacao(self):
+        """Bloqueia até a consulta poder seguir (ver `liberar`); retorna os segundos estacionados."""
+        inicio = time.monotonic()
+        with self._condicao:
+            while not self._liberar():
+                if self.estado == ABERTO and time.monotonic() - self.aberto_em > self.espera_maxima:
+                    raise PortalIndisponivel(f"[{self.portal}] Portal fora do ar há mais de {self.espera_maxima}s")
+                if self._sondando or self.estado == MEIO_ABERTO:
+                    # Outro worker roda a sonda ou a consulta de teste; _mudar acorda quando o estado mudar
+                    self._condicao.wait(self.intervalo_sonda)
+                    continue
+                # Este worker roda a sonda; os demais esperam o resultado
+                self._sondando = True
+                self._condicao.release()
+                try:
+                    time.sleep(self.intervalo_sonda)
+                    saudavel = self.url_saude is None or self.sondar()
+                finally:
+                    self._condicao.acquire()
+                    self._sondando = False
+                    self._condicao.notify_all()
+                if saudavel and self.estado == ABERTO:
+                    self._mudar(MEIO_ABERTO, "sonda de saúde respondeu")  # O próximo _liberar é deste worker
+        return time.monotonic() - inicio
+
+    def resumo(self):
+        with self._condicao:
+            if self.estatisticas:
+                logging.info(f"[{self.portal}] Disjuntor {self.estado}: {dict(self.estatisticas)}")
+
+
+def disjuntor_portal(portal):
+    """Disjuntor único do portal no processo."""
+    with _lock_disjuntores:
+        if portal not in _disjuntores:
+            _disjuntores[portal] = Disjuntor(portal)
+        return _disjuntores[portal]
@@ -0,0 +1,100 @@
+# escritor_planilha.py
+
+import os
+import atexit
+import signal
+import logging
+import threading
+import openpyxl
+
+
+class EscritorPlanilha:
+    """Acumula atualizações de células em memória e grava a planilha em lote.
+
+    A gravação acontece quando o número de atualizações pendentes atinge
+    `max_pendentes` ou quando a atualização mais antiga passa de `intervalo`
+    segundos. Ao encerrar o processo (normalmente, por exceção ou SIGTERM)
+    o que estiver pendente é gravado.
+    """
+
+    def __init__(self, caminho, wb=None, max_pendentes=50, intervalo=30.0):
+        self.caminho = caminho
+        self._wb = wb
+        self.max_pendentes = max_pendentes
+        self.intervalo = intervalo
+        self._pendentes = {}
+        self._lock = threading.RLock()
+        self._timer = None
+        atexit.register(self.descarregar)
+        self._instalar_handler_sigterm()
+
+    @property
+    def wb(self):
+        # A planilha completa só é carregada na primeira gravação
+        if self._wb is None:
+            self._wb = openpyxl.load_workbook(self.caminho)
+        return self._wb
+
+    @property
+    def sheet(self):
+        return self.wb.active
+
+    def atualizar(self, linha, coluna, valor):
+        with self._lock:
+            self._pendentes[(linha, coluna)] = valor
+            if len(self._pendentes) >= self.max_pendentes:
+                self.descarregar()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.intervalo, self.descarregar)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def atualizar_lote(self, atualizacoes):
+        """Enfileira várias atualizações (linha, coluna, valor) e grava uma única vez."""
+        with self._lock:
+            for linha, coluna, valor in atualizacoes:
+                self._pendentes[(linha, coluna)] = valor
+            self.descarregar()
+
+    def descarregar(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pendentes:
+                return
+            sheet = self.sheet
+            for (linha, coluna), valor in self._pendentes.items():
+                sheet.cell(row=linha, column=coluna, value=valor)
+            quantidade = len(self._pendentes)
+            self._salvar_atomico()
+            self._pendentes.clear()
+            logging.info(f"Planilha salva com {quantidade} atualização(ões) pendente(s)")
+
+    def fechar(self):
+        self.descarregar()
+        atexit.unregister(self.descarregar)
+
+    def _salvar_atomico(self):
+        # Grava em arquivo temporário e substitui, para não corromper a planilha se o processo cair no meio
+        temporario = f"{self.caminho}.tmp"
+        self.wb.save(temporario)
+        os.replace(temporario, self.caminho)
+
+    def _instalar_handler_sigterm(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        if signal.getsignal(signal.SIGTERM) not in (signal.SIG_DFL, None):
+            return
+
+        def _encerrar(signum, frame):
+            raise SystemExit(128 + signum)
+
+        signal.signal(signal.SIGTERM, _encerrar)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.fechar()
+        return False
@@ -0,0 +1,122 @@
+# esperas.py
+
+import time
+import random
+import logging
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# Recursos carregados pela página e requisições jQuery em andamento, para detectar a rede ociosa
+_ESTADO_REDE_JS = """
+return [document.readyState, performance.getEntriesByType('resource').length,
+        (window.jQuery && window.jQuery.active) || 0];
+"""
+
+
+class Ritmo:
+    """Pausa mínima entre ações, configurada à parte das esperas por condição.
+
+    As esperas seguem assim que a condição é atendida; o ritmo só impõe um
+    intervalo (aleatório entre `minimo` e `maximo`) para não martelar o portal.
+    Com Ritmo(0) não há pausa alguma.
+    """
+
+    def __init__(self, minimo=0.0, maximo=None):
+        self.minimo = minimo
+        self.maximo = minimo if maximo is None else maximo
+
+    def segundos(self):
+        return random.uniform(self.minimo, self.maximo) if self.maximo > self.minimo else self.minimo
+
+    def pausar(self):
+        segundos = self.segundos()
+        if segundos > 0:
+            time.sleep(segundos)
+
+
+def aguardar(driver, condicao, timeout=30, intervalo=0.25, mensagem=""):
+    """Espera `condicao(driver)` ser verdadeira e retorna o valor dela (TimeoutException ao esgotar)."""
+    return WebDriverWait(driver, timeout, poll_frequency=intervalo).until(condicao, mensagem)
+
+
+def elemento_presente(localizador):
+    return EC.presence_of_element_located(localizador)
+
+
+def elemento_visivel(localizador):
+    return EC.visibility_of_element_located(localizador)
+
+
+def elemento_clicavel(localizador):
+    return EC.element_to_be_clickable(localizador)
+
+
+def atributo_contem(localizador, atributo, trecho):
+    """Elemento cujo atributo contém `trecho` (ex.: src de captcha já em base64)."""
+    def condicao(driver):
+        for elemento in driver.find_elements(*localizador):
+            if trecho in (elemento.get_attribute(atributo) or ""):
+                return elemento
+        return False
+    return condicao
+
+
+def texto_na_pagina(trecho):
+    def condicao(driver):
+        return trecho in driver.execute_script("return document.body ? document.body.innerText : '';")
+    return condicao
+
+
+def elementos_substituidos(elementos):
+    """Todos os `elementos` saíram da página (ex.: o alerta da consulta anterior após um novo envio)."""
+    def condicao(driver):
+        return all(EC.staleness_of(elemento)(driver) for elemento in elementos)
+    return condicao
+
+
+def qualquer(*condicoes):
+    """Primeira condição atendida entre várias (ex.: resultado ou mensagem de erro)."""
+    return EC.any_of(*condicoes)
+
+
+def documento_pronto(driver):
+    return driver.execute_script("return document.readyState;") == "complete"
+
+
+class RedeOciosa:
+    """Condição de rede ociosa: documento carregado, sem AJAX do jQuery e sem
+    novos recursos carregados por `ociosidade` segundos."""
+
+    def __init__(self, ociosidade=0.5):
+        self.ociosidade = ociosidade
+        self._recursos = None
+        self._desde = None
+
+    def __call__(self, driver):
+        estado, recursos, ajax = driver.execute_script(_ESTADO_REDE_JS)
+        agora = time.monotonic()
+        if estado != "complete" or ajax or recursos != self._recursos:
+            self._recursos = recursos
+            self._desde = agora
+            return False
+        return agora - self._desde >= self.ociosidade
+
+
+def rede_ociosa(ociosidade=0.5):
+    return RedeOciosa(ociosidade)
+
+
+def download_concluido(gerenciador, chave, extensao='.pdf'):
+    """Arquivo já gravado por completo na pasta da tarefa (GerenciadorDownloads)."""
+    def condicao(driver):
+        return gerenciador.concluido(chave, extensao)
+    return condicao
+
+
+def aguardar_pagina(driver, timeout=30, ociosidade=0.5):
+    """Espera a página terminar de carregar e a rede ficar ociosa; segue mesmo se não ficar."""
+    try:
+        return aguardar(driver, rede_ociosa(ociosidade), timeout)
+    except Exception as e:
+        logging.debug(f"Rede não ficou ociosa em {timeout}s: {e}")
+        return False
@@ -0,0 +1,147 @@
+# estado_tarefas.py
+
+import sqlite3
+import logging
+import threading
+import time
+from collections import namedtuple
+from validade_certidao import limite_validade
+
+CAMINHO_BANCO = 'tarefas.db'  # Banco SQLite compartilhado pelos quatro scripts
+
+PENDENTE = 'pendente'
+EM_ANDAMENTO = 'em_andamento'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+# Status gravados na planilha que indicam que a consulta precisa ser refeita
+PREFIXOS_FALHA = ("Erro", "Falhou", "Texto não reconhecido")
+
+
+# Resultado de uma consulta: status para a planilha, PDF classificado e validade da certidão
+ResultadoConsulta = namedtuple('ResultadoConsulta', ['status', 'caminho_pdf', 'validade'], defaults=(None, None))
+
+
+def status_eh_falha(status):
+    return not status or str(status).startswith(PREFIXOS_FALHA)
+
+
+class ArmazemTarefas:
+    """Registro durável do andamento de cada CNPJ por portal.
+
+    Cada tarefa é identificada por (portal, cnpj) e guarda estado, número de
+    tentativas, horários, o caminho do PDF gerado e a validade da certidão.
+    Todo registro é gravado imediatamente, de modo que uma execução
+    interrompida pode ser retomada do ponto em que parou, e certidões ainda
+    válidas não precisam ser consultadas de novo.
+    """
+
+    def __init__(self, portal, caminho=CAMINHO_BANCO):
+        self.portal = portal
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self.conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self._criar_tabela()
+
+    def _criar_tabela(self):
+        self.conexao.execute("""
+            CREATE TABLE IF NOT EXISTS tarefas (
+                portal TEXT NOT NULL,
+                cnpj TEXT NOT NULL,
+                linha INTEGER,
+                estado TEXT NOT NULL DEFAULT 'pendente',
+                status TEXT,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                inicio REAL,
+                fim REAL,
+                duracao REAL,
+                caminho_pdf TEXT,
+                validade TEXT,
+                PRIMARY KEY (portal, cnpj)
+            )
+        """)
+        colunas = {linha[1] for linha in self.conexao.execute("PRAGMA table_info(tarefas)")}
+        if 'validade' not in colunas:
+            self.conexao.execute("ALTER TABLE tarefas ADD COLUMN validade TEXT")
+
+    def _executar(self, sql, parametros=()):
+        with self._lock:
+            return self.conexao.execute(sql, parametros)
+
+    def registrar(self, registros):
+        """Inclui como pendentes os (cnpj, linha) ainda não conhecidos; os já existentes mantêm o estado.
+
+        Só os CNPJs registrados nesta execução ficam com linha: os que saíram da planilha
+        deixam de ser processados e exportados, sem sobrescrever a linha de outro CNPJ.
+        """
+        with self._lock:
+            self.conexao.execute("BEGIN")
+            try:
+                self.conexao.execute("UPDATE tarefas SET linha = NULL WHERE portal = ?", (self.portal,))
+                for cnpj, linha in registros:
+                    self.conexao.execute(
+                        "INSERT INTO tarefas (portal, cnpj, linha) VALUES (?, ?, ?) "
+                        "ON CONFLICT (portal, cnpj) DO UPDATE SET linha = excluded.linha",
+                        (self.portal, cnpj, linha))
+                self.conexao.execute("COMMIT")
+            except Exception:
+                self.conexao.execute("ROLLBACK")
+                raise
+
+    def reiniciar(self):
+        """Marca todas as tarefas do portal como pendentes, para uma nova rodada completa."""
+        self._executar("UPDATE tarefas SET estado = ?, tentativas = 0 WHERE portal = ?", (PENDENTE, self.portal))
+
+    def pendentes(self, apenas_erros=False, dias_antecedencia=None, rodada_completa=False):
+        """Retorna [(cnpj, linha)] a processar: falhas e, se `apenas_erros` for falso, também
+        as pendentes e as que estavam em andamento quando a execução anterior parou.
+
+        Com `dias_antecedencia`, certidões que vencem depois de hoje + `dias_antecedencia`
+        são puladas; as concluídas que vencem antes disso ou sem certidão válida (sem
+        validade) voltam para a fila. Com
+        `rodada_completa` (nova rodada, após `reiniciar`), a validade não é considerada.
+        """
+        estados = (FALHOU,) if apenas_erros else (PENDENTE, EM_ANDAMENTO, FALHOU)
+        marcadores = ", ".join("?" * len(estados))
+        sql = f"SELECT cnpj, linha FROM tarefas WHERE portal = ? AND linha IS NOT NULL AND (estado IN ({marcadores})"
+        parametros = [self.portal, *estados]
+        if dias_antecedencia is not None and not rodada_completa:
+            limite = limite_validade(dias_antecedencia).isoformat()
+            if not apenas_erros:
+                sql += " OR (estado = ? AND (validade IS NULL OR validade <= ?))"
+                parametros += [CONCLUIDA, limite]
+            sql += ") AND (validade IS NULL OR validade <= ?"
+            parametros.append(limite)
+        cursor = self._executar(sql + ") ORDER BY linha", parametros)
+        return cursor.fetchall()
+
+    def iniciar(self, cnpj):
+        self._executar(
+            "UPDATE tarefas SET estado = ?, tentativas = tentativas + 1, inicio = ?, fim = NULL "
+            "WHERE portal = ? AND cnpj = ?",
+            (EM_ANDAMENTO, time.time(), self.portal, cnpj))
+
+    def concluir(self, cnpj, status, caminho_pdf=None, validade=None):
+        estado = FALHOU if status_eh_falha(status) else CONCLUIDA
+        agora = time.time()
+        validade = validade.isoformat() if validade else None
+        self._executar(
+            "UPDATE tarefas SET estado = ?, status = ?, fim = ?, duracao = ? - COALESCE(inicio, ?), "
+            "caminho_pdf = COALESCE(?, caminho_pdf), validade = ? "
+            "WHERE portal = ? AND cnpj = ?",
+            (estado, status, agora, agora, agora, caminho_pdf, validade, self.portal, cnpj))
+        logging.info(f"[{self.portal}] CNPJ {cnpj}: {estado} ({status})"
+                     + (f", válida até {validade}" if validade else ""))
+
+    def exportar(self, escritor, coluna):
+        """Copia o último status de cada tarefa para a `coluna` da planilha via EscritorPlanilha."""
+        cursor = self._executar(
+            "SELECT linha, status FROM tarefas WHERE portal = ? AND status IS NOT NULL AND linha IS NOT NULL",
+            (self.portal,))
+        escritor.atualizar_lote((linha, coluna, status) for linha, status in cursor.fetchall())
+
+    def fechar(self):
+        with self._lock:
+            self.conexao.close()
@@ -0,0 +1,227 @@
+# extracao_pdf.py
+
+import re
+import hashlib
+import logging
+import sqlite3
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import date
+import fitz  # PyMuPDF
+from PIL import Image
+from motor_ocr import obter_motor_ocr
+from validade_certidao import extrair_validade
+
+TEXTO = 'texto'
+OCR = 'ocr'
+
+PADRAO_CNPJ = r'(\d{2}\.?\d{3}\.?\d{3}\s*/?\s*\d{4}\s*-?\s*\d{2})'
+
+# Tudo o que os scripts precisam de um PDF, obtido com uma única extração de texto
+AnaliseDocumento = namedtuple('AnaliseDocumento', ['hash', 'texto', 'metodo', 'status', 'cnpj', 'validade'])
+
+
+def pixmap_para_pil(pix):
+    mode = "RGBA" if pix.alpha else "RGB"
+    size = (pix.width, pix.height)
+    return Image.frombytes(mode, size, pix.samples)
+
+
+def abrir_pdf(origem):
+    """Abre um PDF a partir do caminho ou dos bytes do arquivo."""
+    if isinstance(origem, (bytes, bytearray)):
+        return fitz.open(stream=bytes(origem), filetype="pdf")
+    return fitz.open(origem)
+
+
+class TextoExtraido:
+    def __init__(self, texto, metodos, total_paginas=None):
+        self.texto = texto
+        self.metodos = metodos  # Método usado em cada página lida: TEXTO ou OCR
+        self.total_paginas = len(metodos) if total_paginas is None else total_paginas
+
+    @property
+    def metodo(self):
+        usados = set(self.metodos)
+        if not usados:
+            return 'vazio'
+        return usados.pop() if len(usados) == 1 else 'misto'
+
+    @property
+    def paginas_lidas(self):
+        return len(self.metodos)
+
+    def __str__(self):
+        return self.texto
+
+
+class ExtratorTextoPDF:
+    """Extrai o texto de um PDF usando a camada de texto embutida e só recorre ao
+    OCR nas páginas em que ela está vazia ou insuficiente (PDF escaneado). O OCR
+    usa o motor compartilhado do processo (veja motor_ocr), salvo se `motor` for informado.
+
+    As páginas são lidas uma a uma. Se `extrair` receber um `verdito`, a leitura
+    para assim que `verdito(texto_lido_até_aqui)` for verdadeiro. Com
+    `faixa_titulo` (fração da altura da página), a primeira página é lida antes
+    só nessa faixa superior, onde ficam o título e o CNPJ das certidões.
+    """
+
+    def __init__(self, lang='por', min_caracteres=30, faixa_titulo=None, motor=None):
+        self.lang = lang
+        self.min_caracteres = min_caracteres
+        self.faixa_titulo = faixa_titulo
+        self.motor = motor
+
+    def _texto_utilizavel(self, texto):
+        return sum(c.isalnum() for c in texto) >= self.min_caracteres
+
+    def extrair_pagina(self, page, clip=None):
+        texto = page.get_text("text", clip=clip)
+        if self._texto_utilizavel(texto):
+            return texto, TEXTO
+        img = pixmap_para_pil(page.get_pixmap(clip=clip))
+        motor = self.motor or obter_motor_ocr(self.lang)
+        return motor.reconhecer(img), OCR
+
+    def _paginas(self, doc, verdito):
+        for indice, page in enumerate(doc):
+            if indice == 0 and verdito and self.faixa_titulo:
+                faixa = fitz.Rect(page.rect.x0, page.rect.y0, page.rect.x1,
+                                  page.rect.y0 + page.rect.height * self.faixa_titulo)
+                texto, metodo = self.extrair_pagina(page, clip=faixa)
+                if verdito(texto):
+                    yield texto, metodo
+                    return
+            yield self.extrair_pagina(page)
+
+    def extrair(self, origem, verdito=None, nome=None):
+        partes, metodos = [], []
+        with abrir_pdf(origem) as doc:
+            total_paginas = doc.page_count
+            for texto, metodo in self._paginas(doc, verdito):
+                partes.append(texto)
+                metodos.append(metodo)
+                if verdito and verdito("".join(partes)):
+                    break
+        resultado = TextoExtraido("".join(partes), metodos, total_paginas)
+        nome = nome or (origem if isinstance(origem, str) else "<memória>")
+        logging.info(f"Texto extraído de {nome} via {resultado.metodo} "
+                     f"({metodos.count(TEXTO)} página(s) com texto, {metodos.count(OCR)} com OCR, "
+                     f"{resultado.paginas_lidas} de {total_paginas} lida(s))")
+        return resultado
+
+
+def extrair_cnpj(texto, padrao=PADRAO_CNPJ):
+    match = re.search(padrao, texto.upper())
+    if match:
+        cnpj = re.sub(r'\D', '', match.group(1))
+        return cnpj if len(cnpj) == 14 else None
+    return None
+
+
+class CacheExtracao:
+    """Analisa PDFs (texto, status, CNPJ e validade) uma única vez por conteúdo.
+
+    A chave é o SHA-256 dos bytes do arquivo, então o mesmo documento movido ou
+    renomeado continua no cache. Os resultados ficam em memória com descarte LRU
+    e, se `caminho_disco` for informado, também num SQLite, para que novas
+    execuções sobre o mesmo acervo não repitam a extração.
+
+    `classificar(texto)` retorna o status ou None enquanto não o reconhece. A
+    leitura das páginas para assim que todos os `campos_verdito` tiverem sido
+    encontrados no texto lido até ali.
+    """
+
+    def __init__(self, portal, classificar, padrao_cnpj=PADRAO_CNPJ, extrator=None,
+                 capacidade=256, caminho_disco=None, campos_verdito=('status', 'cnpj', 'validade')):
+        self.portal = portal
+        self.classificar = classificar
+        self.padrao_cnpj = re.compile(padrao_cnpj)
+        self.campos_verdito = campos_verdito
+        self.extrator = extrator or ExtratorTextoPDF()
+        self.capacidade = capacidade
+        self._memoria = OrderedDict()
+        self._lock = threading.Lock()
+        self._disco = None
+        if caminho_disco:
+            self._disco = sqlite3.connect(caminho_disco, timeout=30, check_same_thread=False,
+                                          isolation_level=None)
+            self._disco.execute("PRAGMA journal_mode=WAL")
+            self._disco.execute("""
+                CREATE TABLE IF NOT EXISTS cache_extracao (
+                    portal TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    texto TEXT,
+                    metodo TEXT,
+                    status TEXT,
+                    cnpj TEXT,
+                    validade TEXT,
+                    PRIMARY KEY (portal, hash)
+                )
+            """)
+
+    def analisar(self, origem):
+        if isinstance(origem, (bytes, bytearray)):
+            conteudo = bytes(origem)
+        else:
+            with open(origem, 'rb') as arquivo:
+                conteudo = arquivo.read()
+        chave = hashlib.sha256(conteudo).hexdigest()
+
+        with self._lock:
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+
+        analise = self._ler_disco(chave)
+        if analise is None:
+            nome = origem if isinstance(origem, str) else None
+            extraido = self.extrator.extrair(conteudo, verdito=self._verdito, nome=nome)
+            analise = self._analisar_texto(chave, extraido.texto, extraido.metodo)
+            self._gravar_disco(analise)
+        else:
+            logging.info(f"Análise de {origem if isinstance(origem, str) else '<memória>'} reaproveitada do cache")
+
+        with self._lock:
+            self._memoria[chave] = analise
+            self._memoria.move_to_end(chave)
+            while len(self._memoria) > self.capacidade:
+                self._memoria.popitem(last=False)
+        return analise
+
+    def _analisar_texto(self, chave, texto, metodo=None):
+        return AnaliseDocumento(
+            hash=chave,
+            texto=texto,
+            metodo=metodo,
+            status=self.classificar(texto),
+            cnpj=extrair_cnpj(texto, self.padrao_cnpj),
+            validade=extrair_validade(texto),
+        )
+
+    def _verdito(self, texto):
+        analise = self._analisar_texto(None, texto)
+        return all(getattr(analise, campo) for campo in self.campos_verdito)
+
+    def _ler_disco(self, chave):
+        if self._disco is None:
+            return None
+        with self._lock:
+            linha = self._disco.execute(
+                "SELECT texto, metodo, status, cnpj, validade FROM cache_extracao WHERE portal = ? AND hash = ?",
+                (self.portal, chave)).fetchone()
+        if linha is None:
+            return None
+        texto, metodo, status, cnpj, validade = linha
+        return AnaliseDocumento(chave, texto, metodo, status, cnpj,
+                                date.fromisoformat(validade) if validade else None)
+
+    def _gravar_disco(self, analise):
+        if self._disco is None:
+            return
+        with self._lock:
+            self._disco.execute(
+                "INSERT OR REPLACE INTO cache_extracao (portal, hash, texto, metodo, status, cnpj, validade) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.portal, analise.hash, analise.texto, analise.metodo, analise.status, analise.cnpj,
+                 analise.validade.isoformat() if analise.validade else None))
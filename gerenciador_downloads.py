@@ -0,0 +1,118 @@
+# gerenciador_downloads.py
+
+import os
+import time
+import shutil
+import logging
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Sem watchdog, a pasta da tarefa é verificada em intervalos curtos
+    Observer = None
+    FileSystemEventHandler = object
+
+# Arquivos que o navegador ainda está escrevendo
+EXTENSOES_PARCIAIS = ('.crdownload', '.part', '.tmp')
+
+
+class _AvisoAlteracao(FileSystemEventHandler):
+    def __init__(self, evento):
+        self.evento = evento
+
+    def on_any_event(self, event):
+        self.evento.set()
+
+
+class GerenciadorDownloads:
+    """Dá a cada tarefa uma pasta de download própria e devolve o arquivo baixado
+    assim que o navegador termina de gravá-lo.
+
+    `preparar` aponta os downloads do navegador para `raiz/<chave>` via CDP
+    (Browser.setDownloadBehavior). `aguardar` acorda a cada alteração na pasta
+    (watchdog, quando instalado) e retorna o primeiro arquivo com a extensão
+    esperada enquanto não houver parciais (.crdownload) pendentes. Como a pasta é
+    exclusiva da tarefa, o arquivo devolvido é sempre o dela.
+    """
+
+    def __init__(self, raiz, timeout=60, intervalo=0.25):
+        self.raiz = raiz
+        self.timeout = timeout
+        self.intervalo = intervalo  # Verificação periódica, usada também como garantia com o watchdog
+        os.makedirs(raiz, exist_ok=True)
+
+    def diretorio(self, chave):
+        return os.path.join(self.raiz, str(chave))
+
+    def preparar(self, driver, chave):
+        """Cria a pasta vazia da tarefa e direciona para ela os downloads do navegador."""
+        diretorio = self.diretorio(chave)
+        if os.path.isdir(diretorio):
+            shutil.rmtree(diretorio, ignore_errors=True)  # Restos de uma tentativa anterior
+        os.makedirs(diretorio, exist_ok=True)
+        parametros = {'behavior': 'allow', 'downloadPath': os.path.abspath(diretorio)}
+        try:
+            driver.execute_cdp_cmd('Browser.setDownloadBehavior', dict(parametros, eventsEnabled=True))
+        except Exception as e:
+            # Versões antigas do Chrome só aceitam o comando no domínio Page
+            logging.debug(f"Browser.setDownloadBehavior indisponível ({e}); usando Page.setDownloadBehavior")
+            driver.execute_cdp_cmd('Page.setDownloadBehavior', parametros)
+        return diretorio
+
+    def _concluido(self, diretorio, extensao):
+        try:
+            arquivos = os.listdir(diretorio)
+        except FileNotFoundError:
+            return None
+        if any(arquivo.endswith(EXTENSOES_PARCIAIS) for arquivo in arquivos):
+            return None
+        for arquivo in arquivos:
+            if arquivo.lower().endswith(extensao):
+                return os.path.join(diretorio, arquivo)
+        return None
+
+    def concluido(self, chave, extensao='.pdf'):
+        """Caminho do arquivo da tarefa se já terminou de baixar, senão None (sem esperar)."""
+        return self._concluido(self.diretorio(chave), extensao)
+
+    def aguardar(self, chave, timeout=None, extensao='.pdf'):
+        """Retorna o caminho do arquivo baixado na pasta da tarefa, ou None se o tempo esgotar."""
+        diretorio = self.diretorio(chave)
+        limite = time.monotonic() + (timeout or self.timeout)
+        alterado = threading.Event()
+        observador = None
+        if Observer is not None:
+            observador = Observer()
+            observador.schedule(_AvisoAlteracao(alterado), diretorio, recursive=False)
+            observador.start()
+        try:
+            while True:
+                caminho = self._concluido(diretorio, extensao)
+                if caminho:
+                    logging.info(f"Download concluído: {caminho}")
+                    return caminho
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    logging.error(f"Nenhum download concluído em {diretorio} dentro do tempo limite")
+                    return None
+                alterado.wait(min(restante, self.intervalo if observador is None else 1.0))
+                alterado.clear()
+        finally:
+            if observador is not None:
+                observador.stop()
+                observador.join()
+
+    def descartar(self, chave):
+        """Remove a pasta da tarefa (e o que restou nela)."""
+        shutil.rmtree(self.diretorio(chave), ignore_errors=True)
+
+    def limpar(self):
+        """Remove as pastas de tarefas que ficaram vazias."""
+        for nome in os.listdir(self.raiz):
+            caminho = os.path.join(self.raiz, nome)
+            if os.path.isdir(caminho):
+                try:
+                    os.rmdir(caminho)
+                except OSError:
+                    pass
@@ -0,0 +1,75 @@
+# leitor_planilha.py
+
+import io
+import re
+from collections import namedtuple
+import openpyxl
+
+RegistroPlanilha = namedtuple('RegistroPlanilha', ['cnpj', 'linha', 'status', 'extras'])
+
+
+def normalizar_cnpj(valor):
+    """Converte o CNPJ da célula (texto formatado ou número) para 14 dígitos."""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return re.sub(r'\D', '', str(valor)).zfill(14)
+
+
+def ler_cabecalho(caminho):
+    """Retorna {nome_da_coluna: índice 1-based} lendo apenas a primeira linha."""
+    wb = openpyxl.load_workbook(caminho, read_only=True)
+    try:
+        linha = next(wb.active.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        return {str(nome).strip(): indice for indice, nome in enumerate(linha, start=1) if nome is not None}
+    finally:
+        wb.close()
+
+
+def com_status(registros, coluna_status):
+    """Reaproveita registros já lidos (com `coluna_status` entre os extras) como se
+    tivessem sido lidos com essa coluna de status."""
+    for registro in registros:
+        yield registro._replace(status=registro.extras.get(coluna_status))
+
+
+def ler_registros(caminho, coluna_status=None, colunas_extras=()):
+    """Percorre a planilha em modo somente leitura, uma única vez, devolvendo um
+    RegistroPlanilha por linha com CNPJ preenchido.
+
+    Só as colunas CNPJ, `coluna_status` e `colunas_extras` são lidas; colunas
+    ausentes resultam em None.
+    """
+    cabecalho = ler_cabecalho(caminho)
+    if "CNPJ" not in cabecalho:
+        raise ValueError(f"Coluna 'CNPJ' não encontrada em {caminho}")
+
+    nomes = ["CNPJ", coluna_status] + list(colunas_extras)
+    indices = {nome: cabecalho.get(nome) for nome in nomes if nome}
+    presentes = [indice for indice in indices.values() if indice]
+    min_col, max_col = min(presentes), max(presentes)
+
+    def _valor(row, nome):
+        indice = indices.get(nome)
+        if not indice or indice - min_col >= len(row):
+            return None
+        return row[indice - min_col]
+
+    # O arquivo (compactado) vai para a memória e o handle é liberado logo, para que o
+    # EscritorPlanilha possa substituir a planilha enquanto os registros são consumidos
+    with open(caminho, 'rb') as arquivo:
+        conteudo = io.BytesIO(arquivo.read())
+    wb = openpyxl.load_workbook(conteudo, read_only=True, data_only=True)
+    try:
+        linhas = wb.active.iter_rows(min_row=2, min_col=min_col, max_col=max_col, values_only=True)
+        for linha, row in enumerate(linhas, start=2):
+            cnpj = _valor(row, "CNPJ")
+            if cnpj is None or str(cnpj).strip() == "":
+                continue
+            yield RegistroPlanilha(
+                cnpj=normalizar_cnpj(cnpj),
+                linha=linha,
+                status=_valor(row, coluna_status) if coluna_status else None,
+                extras={nome: _valor(row, nome) for nome in colunas_extras},
+            )
+    finally:
+        wb.close()
@@ -0,0 +1,85 @@
+# limitador_taxa.py
+
+import time
+import logging
+import threading
+
+# Consultas por segundo iniciais de cada portal, somando todos os workers
+TAXAS_PORTAL = {
+    'CEF': 0.3,
+    'TST': 0.5,
+    'SEFA-PR': 0.5,
+    'Curitiba': 0.2,
+}
+
+_limitadores = {}
+_lock_limitadores = threading.Lock()
+
+
+class LimitadorTaxa:
+    """Token bucket de um portal, compartilhado por todos os workers do processo.
+
+    Cada consulta gasta uma ficha; as fichas voltam a `taxa` por segundo, até
+    `rajada`. A taxa se adapta (aumento aditivo, redução multiplicativa):
+    `sucesso` acelera um pouco enquanto o portal responde bem e `estrangulado`
+    (reCAPTCHA no lugar do captcha, captcha "Código", alerta de erro) corta a
+    taxa e esvazia o balde, para que todos os workers recuem juntos.
+    """
+
+    def __init__(self, portal, taxa=0.5, taxa_minima=0.02, taxa_maxima=2.0, rajada=2, aumento=0.02, reducao=0.5):
+        self.portal = portal
+        self.taxa = taxa
+        self.taxa_minima = taxa_minima
+        self.taxa_maxima = taxa_maxima
+        self.rajada = rajada
+        self.aumento = aumento
+        self.reducao = reducao
+        self._fichas = float(rajada)
+        self._atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self._fichas = min(self.rajada, self._fichas + (agora - self._atualizado) * self.taxa)
+        self._atualizado = agora
+
+    def tentar(self):
+        """Gasta uma ficha se houver; não bloqueia (para as Esperas do AgendadorAbas)."""
+        with self._lock:
+            self._repor()
+            if self._fichas >= 1:
+                self._fichas -= 1
+                return True
+            return False
+
+    def adquirir(self):
+        """Bloqueia até haver uma ficha para a próxima consulta."""
+        while True:
+            with self._lock:
+                self._repor()
+                if self._fichas >= 1:
+                    self._fichas -= 1
+                    return
+                espera = (1 - self._fichas) / self.taxa
+            time.sleep(espera)
+
+    def sucesso(self):
+        with self._lock:
+            self._repor()
+            self.taxa = min(self.taxa_maxima, self.taxa + self.aumento)
+
+    def estrangulado(self, motivo=""):
+        with self._lock:
+            self._repor()
+            self.taxa = max(self.taxa_minima, self.taxa * self.reducao)
+            self._fichas = 0
+            taxa = self.taxa
+        logging.warning(f"[{self.portal}] Sinal de limitação ({motivo}); taxa reduzida para {taxa:.3f} consulta(s)/s")
+
+
+def limitador_portal(portal):
+    """Limitador único do portal no processo, criado com a taxa de TAXAS_PORTAL."""
+    with _lock_limitadores:
+        if portal not in _limitadores:
+            _limitadores[portal] = LimitadorTaxa(portal, taxa=TAXAS_PORTAL.get(portal, 0.5))
+        return _limitadores[portal]
@@ -0,0 +1,116 @@
+# motor_ocr.py
+
+import os
+import queue
+import logging
+import threading
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:  # Sem a ligação nativa, o OCR volta a abrir um processo do tesseract por imagem
+    tesserocr = None
+
+TESSEROCR = 'tesserocr'
+PYTESSERACT = 'pytesseract'
+
+# Configuração compartilhada pelos scripts; alterada com configurar_motor_ocr
+_configuracao = {'backend': None, 'tamanho_pool': 1, 'caminho_tessdata': None}
+_motores = {}
+_lock = threading.Lock()
+
+
+class MotorPytesseract:
+    """Caminho original: `pytesseract.image_to_string`, um processo `tesseract` por imagem."""
+
+    nome = PYTESSERACT
+
+    def __init__(self, lang='por'):
+        self.lang = lang
+
+    def reconhecer(self, imagem):
+        return pytesseract.image_to_string(imagem, lang=self.lang)
+
+    def fechar(self):
+        pass
+
+
+class MotorTesserocr:
+    """Mantém `tamanho_pool` instâncias da API do Tesseract vivas, com o modelo do
+    idioma já carregado, e empresta uma a cada chamada de `reconhecer`. Chamadas
+    concorrentes além do tamanho do pool esperam uma instância ficar livre.
+    """
+
+    nome = TESSEROCR
+
+    def __init__(self, lang='por', tamanho_pool=1, caminho_tessdata=None):
+        self.lang = lang
+        self._livres = queue.LifoQueue()
+        self._apis = []
+        opcoes = {'lang': lang}
+        if caminho_tessdata:
+            opcoes['path'] = caminho_tessdata
+        try:
+            for _ in range(max(1, tamanho_pool)):
+                api = tesserocr.PyTessBaseAPI(**opcoes)
+                self._apis.append(api)
+                self._livres.put(api)
+        except Exception:
+            self.fechar()
+            raise
+
+    def reconhecer(self, imagem):
+        api = self._livres.get()
+        try:
+            api.SetImage(imagem)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+            self._livres.put(api)
+
+    def fechar(self):
+        for api in self._apis:
+            api.End()
+        self._apis = []
+
+
+def configurar_motor_ocr(backend=None, tamanho_pool=None, caminho_tessdata=None):
+    """Define o backend (TESSEROCR, PYTESSERACT ou None para escolher automaticamente),
+    o número de instâncias por processo e a pasta tessdata. Vale para os motores criados depois."""
+    with _lock:
+        _configuracao['backend'] = backend
+        if tamanho_pool:
+            _configuracao['tamanho_pool'] = tamanho_pool
+        if caminho_tessdata:
+            _configuracao['caminho_tessdata'] = caminho_tessdata
+
+
+def _criar_motor(lang):
+    backend = _configuracao['backend']
+    if backend != PYTESSERACT and tesserocr is not None:
+        try:
+            caminho_tessdata = _configuracao['caminho_tessdata'] or os.environ.get('TESSDATA_PREFIX')
+            motor = MotorTesserocr(lang, _configuracao['tamanho_pool'], caminho_tessdata)
+            logging.info(f"OCR via tesserocr com {len(motor._apis)} instância(s) para '{lang}'")
+            return motor
+        except Exception as e:
+            logging.warning(f"Não foi possível iniciar o tesserocr ({e}); usando pytesseract")
+    elif backend == TESSEROCR:
+        logging.warning("tesserocr não está instalado; usando pytesseract")
+    return MotorPytesseract(lang)
+
+
+def obter_motor_ocr(lang='por'):
+    """Motor de OCR do processo atual para `lang`, criado na primeira chamada e reaproveitado depois."""
+    with _lock:
+        motor = _motores.get(lang)
+        if motor is None:
+            motor = _motores[lang] = _criar_motor(lang)
+        return motor
+
+
+def encerrar_motores_ocr():
+    with _lock:
+        for motor in _motores.values():
+            motor.fechar()
+        _motores.clear()
@@ -0,0 +1,68 @@
+# navegacao.py
+
+import logging
+from collections import Counter
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from perfil_navegador import metricas
+
+REAPROVEITADA = 'reaproveitada'
+DIRETA = 'direta'
+COMPLETA = 'completa'
+
+
+class CacheNavegacao:
+    """Leva o navegador ao formulário de consulta de um portal pelo caminho mais curto.
+
+    1. Se o formulário já está carregado na aba (e vazio, com `exigir_vazio`), ele é reaproveitado.
+    2. Senão, abre direto a URL do formulário (`url_direta` ou a aprendida no
+       último percurso completo).
+    3. Se o formulário não aparece (sessão expirada, redirecionamento), refaz o
+       percurso completo com `percorrer(driver)` e memoriza a URL final.
+    """
+
+    def __init__(self, portal, localizador_formulario, percorrer, url_direta=None, timeout=15, exigir_vazio=True):
+        self.portal = portal
+        self.exigir_vazio = exigir_vazio
+        self.localizador = localizador_formulario
+        self.percorrer = percorrer
+        self.url_direta = url_direta
+        self.timeout = timeout
+        self.estatisticas = Counter()
+
+    def _formulario_pronto(self, driver):
+        campos = driver.find_elements(*self.localizador)
+        if not campos or not campos[0].is_displayed():
+            return False
+        return not self.exigir_vazio or not campos[0].get_attribute("value")
+
+    def _aguardar_formulario(self, driver, timeout):
+        try:
+            WebDriverWait(driver, timeout).until(EC.presence_of_element_located(self.localizador))
+            return True
+        except TimeoutException:
+            return False
+
+    def ir_para_formulario(self, driver, timeout=None):
+        """Garante o formulário carregado na aba atual; retorna como chegou até ele."""
+        timeout = timeout or self.timeout
+        if self._formulario_pronto(driver):
+            return self._registrar(REAPROVEITADA, driver)
+        if self.url_direta:
+            driver.get(self.url_direta)
+            if self._aguardar_formulario(driver, timeout):
+                return self._registrar(DIRETA, driver)
+            logging.info(f"[{self.portal}] Link direto não levou ao formulário; refazendo o percurso")
+        self.percorrer(driver)
+        if not self._aguardar_formulario(driver, timeout):
+            raise TimeoutException(f"[{self.portal}] Formulário de consulta não encontrado")
+        self.url_direta = driver.current_url
+        return self._registrar(COMPLETA, driver)
+
+    def _registrar(self, modo, driver):
+        self.estatisticas[modo] += 1
+        if modo != REAPROVEITADA:
+            metricas.registrar_pagina(self.portal, driver)
+        logging.info(f"[{self.portal}] Formulário via navegação {modo} ({dict(self.estatisticas)})")
+        return modo
@@ -0,0 +1,66 @@
+# orquestrador.py
+
+import logging
+import threading
+from escritor_planilha import EscritorPlanilha
+from leitor_planilha import ler_registros
+from pipeline_ocr import configurar_pipelines
+
+# Configuração de logging antes dos scripts, para que o nome da thread (portal) apareça em cada linha
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(threadName)s - %(levelname)s - %(message)s')
+
+import CEF
+import trabalhista
+import cndestadual
+import cndcuritiba
+
+caminho_planilha = r'path/to/excel_file.xlsx'  # Planilha única de consulta e salvamento dos quatro portais
+portais = ('CEF', 'TST', 'SEFA-PR', 'Curitiba')  # Portais a executar
+processar_todos_tst = False  # Equivale a responder "s" na pergunta do trabalhista.py
+
+# Colunas de status de cada portal e as usadas para filtrar os CNPJs, lidas uma única vez
+COLUNAS = ("CEF", "TJUS", "CND_ESTADUAL", "CND_MUNICIPAL", "NOME_CIDADE")
+
+
+def _executores():
+    return {
+        'CEF': lambda escritor, registros: CEF.executar(caminho_planilha, escritor, registros),
+        'TST': lambda escritor, registros: trabalhista.executar(processar_todos_tst, caminho_planilha, escritor,
+                                                                registros),
+        'SEFA-PR': lambda escritor, registros: cndestadual.executar(caminho_planilha, escritor, registros),
+        'Curitiba': lambda escritor, registros: cndcuritiba.main(caminho_planilha=caminho_planilha, escritor=escritor,
+                                                                 registros=registros),
+    }
+
+
+def executar_portais(portais=portais):
+    """Roda os portais ao mesmo tempo, um por thread, sobre a mesma lista de CNPJs.
+
+    A planilha é lida uma única vez e todos gravam pelo mesmo EscritorPlanilha,
+    cada um na sua coluna; um portal lento ou com falha não segura os demais.
+    """
+    registros = list(ler_registros(caminho_planilha, colunas_extras=COLUNAS))
+    logging.info(f"{len(registros)} CNPJ(s) carregados para {len(portais)} portal(is)")
+    escritor = EscritorPlanilha(caminho_planilha)
+    configurar_pipelines(len(portais))  # Os núcleos de OCR são divididos entre os portais
+    executores = _executores()
+
+    def rodar(portal):
+        try:
+            executores[portal](escritor, registros)
+            logging.info(f"[{portal}] Concluído")
+        except Exception as e:
+            logging.error(f"[{portal}] Interrompido: {e}")
+
+    threads = [threading.Thread(target=rodar, args=(portal,), name=portal) for portal in portais]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        escritor.fechar()
+
+
+if __name__ == "__main__":
+    executar_portais()
@@ -0,0 +1,143 @@
+# perfil_navegador.py
+
+import fnmatch
+import logging
+import threading
+from collections import defaultdict
+
+try:
+    import psutil
+except ImportError:  # Sem psutil, a memória da sessão é estimada pelo heap JS da página (CDP)
+    psutil = None
+
+COMPLETO = 'completo'  # Chrome com janela, carregando tudo (comportamento original)
+ENXUTO = 'enxuto'  # Headless, sem recursos dispensáveis e com bloqueio de URLs via CDP
+
+ARGUMENTOS_ENXUTO = [
+    '--headless=new',
+    '--window-size=1920,1080',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-notifications',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+    '--metrics-recording-only',
+    '--mute-audio',
+    '--no-first-run',
+]
+
+# Fontes, mídia, analytics e banners das páginas dos portais
+PADROES_BLOQUEADOS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ico',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*', '*googlesyndication.com*',
+    '*facebook.net*', '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*', '*youtube.com*', '*ytimg.com*',
+    '*vlibras.gov.br*', '*barra.sistema.gov.br*', '*fonts.googleapis.com*',
+]
+
+# Amostras do que nunca pode ser bloqueado: imagens de captcha, reCAPTCHA e os PDFs das certidões
+AMOSTRAS_ESSENCIAIS = [
+    'https://portal/captcha.png', 'https://portal/captcha.jpg', 'https://portal/captcha.gif',
+    'https://portal/captcha.jsf', 'https://portal/certidao.pdf', 'https://portal/certidao.faces',
+    'https://www.google.com/recaptcha/api.js', 'https://www.gstatic.com/recaptcha/releases/recaptcha.js',
+]
+
+
+def configurar_perfil(options, perfil=COMPLETO):
+    """Acrescenta às opções do Chrome os argumentos do perfil; o completo não muda nada."""
+    if perfil != ENXUTO:
+        return options
+    for argumento in ARGUMENTOS_ENXUTO:
+        if argumento not in options.arguments:
+            options.add_argument(argumento)
+    return options
+
+
+def padroes_permitidos(padroes):
+    """Descarta os padrões que bloqueariam captcha ou PDF."""
+    permitidos = []
+    for padrao in padroes:
+        if any(fnmatch.fnmatch(url, padrao) for url in AMOSTRAS_ESSENCIAIS):
+            logging.warning(f"Padrão {padrao} bloquearia captcha ou PDF; ignorado")
+            continue
+        permitidos.append(padrao)
+    return permitidos
+
+
+def bloquear_recursos(driver, perfil=COMPLETO, padroes_extras=()):
+    """Ativa o bloqueio de URLs do perfil enxuto na aba atual (o CDP vale por aba)."""
+    if perfil != ENXUTO:
+        return
+    padroes = padroes_permitidos(PADROES_BLOQUEADOS + list(padroes_extras))
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': padroes})
+    except Exception as e:
+        logging.warning(f"Não foi possível bloquear recursos via CDP: {e}")
+
+
+class MetricasNavegador:
+    """Tempo de carregamento por página e memória por sessão, por portal.
+
+    Rodando o mesmo lote com o perfil completo e com o enxuto, o resumo de cada
+    execução mostra o antes e o depois.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cargas = defaultdict(list)  # portal -> segundos por página
+        self._memoria = defaultdict(dict)  # portal -> {sessão: pico em MB}
+
+    @staticmethod
+    def _tempo_carga(driver):
+        duracao = driver.execute_script(
+            "const n = performance.getEntriesByType('navigation')[0]; return n ? n.duration : null;")
+        return duracao / 1000 if duracao else None
+
+    @staticmethod
+    def _memoria_mb(driver):
+        if psutil is not None:
+            try:
+                processo = psutil.Process(driver.service.process.pid)  # chromedriver e, abaixo dele, o Chrome
+                processos = [processo] + processo.children(recursive=True)
+                return sum(p.memory_info().rss for p in processos) / 2 ** 20
+            except Exception:
+                pass
+        driver.execute_cdp_cmd('Performance.enable', {})
+        metricas = driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']
+        heap = next((m['value'] for m in metricas if m['name'] == 'JSHeapUsedSize'), None)
+        return heap / 2 ** 20 if heap else None
+
+    def registrar_pagina(self, portal, driver):
+        """Registra a carga da página atual e uma amostra de memória da sessão."""
+        try:
+            carga = self._tempo_carga(driver)
+            memoria = self._memoria_mb(driver)
+        except Exception as e:
+            logging.debug(f"[{portal}] Métricas do navegador indisponíveis: {e}")
+            return
+        with self._lock:
+            if carga is not None:
+                self._cargas[portal].append(carga)
+            if memoria is not None:
+                sessoes = self._memoria[portal]
+                sessoes[id(driver)] = max(memoria, sessoes.get(id(driver), 0))
+
+    def resumo(self, portal, perfil=COMPLETO):
+        with self._lock:
+            cargas = self._cargas.pop(portal, [])
+            picos = list(self._memoria.pop(portal, {}).values())
+        if not cargas and not picos:
+            return
+        carga_media = sum(cargas) / len(cargas) if cargas else 0
+        memoria_media = sum(picos) / len(picos) if picos else 0
+        logging.info(f"[{portal}] Perfil {perfil}: {len(cargas)} página(s), carga média {carga_media:.2f} s; "
+                     f"{len(picos)} sessão(ões), pico médio de memória {memoria_media:.0f} MB")
+
+
+metricas = MetricasNavegador()
@@ -0,0 +1,118 @@
+# pipeline_ocr.py
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Processos de OCR do programa inteiro, divididos entre os pipelines que rodam ao mesmo tempo
+_orcamento = {'pipelines': 1, 'em_uso': 0}
+_lock_orcamento = threading.Lock()
+
+
+def processos_padrao():
+    # Deixa um núcleo livre para o navegador
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def configurar_pipelines(simultaneos):
+    """Informa quantos pipelines rodam juntos (um por portal no orquestrador), para dividir os núcleos."""
+    with _lock_orcamento:
+        _orcamento['pipelines'] = max(1, simultaneos)
+
+
+def _reservar_processos(pedidos=None):
+    # Sem pedido explícito, a cota do pipeline; nunca além do que ainda está livre (mínimo de um)
+    total = processos_padrao()
+    with _lock_orcamento:
+        cota = max(1, total // _orcamento['pipelines'])
+        concedidos = max(1, min(pedidos or cota, total - _orcamento['em_uso']))
+        _orcamento['em_uso'] += concedidos
+    return concedidos
+
+
+def _liberar_processos(quantidade):
+    with _lock_orcamento:
+        _orcamento['em_uso'] = max(0, _orcamento['em_uso'] - quantidade)
+
+
+class PipelineProcessamento:
+    """Tira extração, classificação e movimentação dos PDFs da thread do navegador.
+
+    O navegador chama `enviar` com o PDF baixado e segue para o próximo CNPJ; o
+    trabalho roda num ProcessPoolExecutor. A fila é limitada a `max_pendentes`
+    itens: quando está cheia, `enviar` bloqueia até um processo terminar. Os
+    resultados (inclusive os registrados direto com `registrar`) são entregues a
+    `ao_concluir(chave, resultado, erro)` na mesma ordem em que foram enviados.
+
+    Os processos são criados com 'spawn': não herdam conexões SQLite, locks nem
+    threads do processo principal, e `inicializador` abre em cada um o que ele
+    precisa (o cache de extração, por exemplo). Sem `max_processos`, o pipeline
+    usa a sua cota dos núcleos (ver `configurar_pipelines`).
+    """
+
+    def __init__(self, ao_concluir, max_processos=None, max_pendentes=None,
+                 inicializador=None, args_inicializador=()):
+        self.ao_concluir = ao_concluir
+        self.max_processos = _reservar_processos(max_processos)
+        self.max_pendentes = max_pendentes or 2 * self.max_processos
+        self.executor = ProcessPoolExecutor(max_workers=self.max_processos,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=inicializador, initargs=args_inicializador)
+        self._reservados = self.max_processos
+        self._vagas = threading.Semaphore(self.max_pendentes)
+        self._lock = threading.Lock()
+        self._proxima_sequencia = 0
+        self._proximo_a_entregar = 0
+        self._prontos = {}
+
+    def _reservar_sequencia(self):
+        with self._lock:
+            sequencia = self._proxima_sequencia
+            self._proxima_sequencia += 1
+            return sequencia
+
+    def enviar(self, chave, funcao, *args):
+        self._vagas.acquire()  # Contrapressão: o navegador espera se a fila estiver cheia
+        sequencia = self._reservar_sequencia()
+        try:
+            futuro = self.executor.submit(funcao, *args)
+        except Exception as e:
+            self._vagas.release()
+            self._entregar(sequencia, chave, None, e)
+            return
+        futuro.add_done_callback(lambda f: self._ao_terminar(sequencia, chave, f))
+
+    def registrar(self, chave, resultado):
+        """Entrega um resultado que não precisa de processamento, respeitando a ordem."""
+        self._entregar(self._reservar_sequencia(), chave, resultado, None)
+
+    def _ao_terminar(self, sequencia, chave, futuro):
+        self._vagas.release()
+        erro = futuro.exception()
+        self._entregar(sequencia, chave, None if erro else futuro.result(), erro)
+
+    def _entregar(self, sequencia, chave, resultado, erro):
+        with self._lock:
+            self._prontos[sequencia] = (chave, resultado, erro)
+            while self._proximo_a_entregar in self._prontos:
+                item = self._prontos.pop(self._proximo_a_entregar)
+                self._proximo_a_entregar += 1
+                try:
+                    self.ao_concluir(*item)
+                except Exception as e:
+                    logging.error(f"Erro ao registrar o resultado de {item[0]}: {e}")
+
+    def encerrar(self):
+        """Aguarda os PDFs em processamento e entrega os resultados restantes."""
+        self.executor.shutdown(wait=True)
+        _liberar_processos(self._reservados)
+        self._reservados = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.encerrar()
+        return False
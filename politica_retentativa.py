@@ -0,0 +1,125 @@
+# politica_retentativa.py
+
+import time
+import random
+import logging
+from estado_tarefas import ResultadoConsulta
+from disjuntor import disjuntor_portal
+
+CONCLUIDO = 'concluido'  # Resultado obtido; nada a repetir
+PERMANENTE = 'permanente'  # Resposta definitiva do portal; repetir não muda nada
+TRANSITORIO = 'transitorio'  # Falha que pode passar (portal lento, captcha errado, sessão perdida)
+
+# Respostas definitivas dos portais, nunca repetidas
+STATUS_PERMANENTES = ("Empregador não cadastrado", "S/CND", "Ausência")
+# Status que indicam falha transitória (as demais respostas contam como concluídas)
+PREFIXOS_TRANSITORIOS = ("Falhou", "Erro no download do PDF")
+
+# Tentativas e tempo total (segundos) por CNPJ em cada portal
+POLITICAS_PORTAL = {
+    'CEF': {'max_tentativas': 4, 'orcamento': 300},
+    'TST': {'max_tentativas': 3, 'orcamento': 240},
+    'SEFA-PR': {'max_tentativas': 3, 'orcamento': 120},
+    'Curitiba': {'max_tentativas': 2, 'orcamento': 600},
+}
+
+
+class FalhaPermanente(Exception):
+    """Falha que não melhora repetindo a consulta."""
+
+
+class FalhaTransitoria(Exception):
+    """Falha que pode ser repetida (PDF não baixou, alerta de erro do portal etc.)."""
+
+
+class CaptchaRecusado(FalhaTransitoria):
+    """O portal não aceitou a resposta do captcha; repete com um captcha novo, sem contar para o disjuntor."""
+
+
+class TentativasEsgotadas(Exception):
+    def __init__(self, tentativas, erro):
+        super().__init__(f"{tentativas} tentativa(s): {erro}")
+        self.tentativas = tentativas
+        self.erro = erro
+
+
+def classificar(desfecho):
+    """CONCLUIDO, PERMANENTE ou TRANSITORIO para um resultado (status ou ResultadoConsulta) ou exceção."""
+    if isinstance(desfecho, FalhaPermanente):
+        return PERMANENTE
+    if isinstance(desfecho, Exception):
+        return TRANSITORIO
+    status = desfecho.status if isinstance(desfecho, ResultadoConsulta) else desfecho
+    if not isinstance(status, str):
+        return CONCLUIDO
+    if status.startswith(STATUS_PERMANENTES):
+        return PERMANENTE
+    if status.startswith(PREFIXOS_TRANSITORIOS):
+        return TRANSITORIO
+    return CONCLUIDO
+
+
+class PoliticaRetentativa:
+    """Repete só as falhas transitórias, com espera exponencial e aleatória, dentro
+    de `max_tentativas` e de um `orcamento` de tempo por tarefa.
+
+    A espera antes da tentativa n+1 é sorteada entre metade e o total de
+    `base * fator ** (n - 1)`, limitada a `teto`, para que workers que falharam
+    juntos não voltem ao portal no mesmo instante.
+
+    Com `disjuntor`, cada tentativa espera o portal estar no ar e informa o
+    desfecho a ele; o tempo estacionado não conta no orçamento.
+    """
+
+    def __init__(self, max_tentativas=3, base=2.0, fator=2.0, teto=60.0, orcamento=300.0, disjuntor=None):
+        self.max_tentativas = max_tentativas
+        self.base = base
+        self.fator = fator
+        self.teto = teto
+        self.orcamento = orcamento
+        self.disjuntor = disjuntor
+
+    def proximo_atraso(self, tentativa, inicio, desfecho):
+        """Segundos até a próxima tentativa, ou None se `desfecho` não deve ser repetido."""
+        if classificar(desfecho) != TRANSITORIO or tentativa >= self.max_tentativas:
+            return None
+        atraso = min(self.teto, self.base * self.fator ** (tentativa - 1))
+        atraso = random.uniform(atraso / 2, atraso)
+        if time.monotonic() - inicio + atraso > self.orcamento:
+            return None
+        return atraso
+
+    def executar(self, tarefa, descricao="tarefa"):
+        """Chama `tarefa(tentativa)` até um desfecho que não seja transitório.
+
+        Retorna o resultado (o último, se as tentativas acabarem num status
+        transitório); exceções permanentes sobem na hora e as transitórias,
+        esgotadas as tentativas ou o orçamento, viram TentativasEsgotadas.
+        """
+        inicio = time.monotonic()
+        tentativa = 1
+        while True:
+            if self.disjuntor is not None:
+                inicio += self.disjuntor.aguardar_liberacao()
+            try:
+                desfecho = tarefa(tentativa)
+            except Exception as e:
+                desfecho = e
+            if self.disjuntor is not None:
+                self.disjuntor.registrar(desfecho)
+            atraso = self.proximo_atraso(tentativa, inicio, desfecho)
+            if atraso is None:
+                if not isinstance(desfecho, Exception):
+                    return desfecho
+                if classificar(desfecho) == PERMANENTE:
+                    raise desfecho
+                raise TentativasEsgotadas(tentativa, desfecho) from desfecho
+            logging.info(f"{descricao}: tentativa {tentativa} falhou ({desfecho}); "
+                         f"nova tentativa em {atraso:.1f}s")
+            time.sleep(atraso)
+            tentativa += 1
+
+
+def politica_portal(portal):
+    """Política do portal, ligada ao disjuntor dele."""
+    return PoliticaRetentativa(**POLITICAS_PORTAL.get(portal, {}), disjuntor=disjuntor_portal(portal))
@@ -0,0 +1,93 @@
+# pool_drivers.py
+
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# O undetected_chromedriver modifica o executável ao iniciar; um driver é iniciado por vez no processo.
+# Reentrante porque o PoolNavegadores o segura enquanto o worker obtém seu primeiro driver.
+lock_inicio_driver = threading.RLock()
+
+
+def _encerrar(driver):
+    try:
+        driver.quit()
+    except Exception as e:
+        logging.debug(f"Erro ao encerrar driver descartado: {e}")
+
+
+class PoolDrivers:
+    """Mantém `reserva` navegadores já iniciados e configurados, prontos para uso.
+
+    `obter` entrega um driver aquecido (espera o que estiver iniciando, ou inicia
+    um na hora se nenhum estiver) e completa a reserva em segundo plano. `substituir` troca um
+    driver quebrado por um da reserva imediatamente e encerra o quebrado em
+    segundo plano; o chamador deve passar a usar o driver retornado.
+    """
+
+    def __init__(self, criar_driver, reserva=1):
+        self.criar_driver = criar_driver
+        self.reserva = reserva
+        self._prontos = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pool-drivers")
+        self._encerrado = False
+        self._lock = threading.Lock()
+        self._iniciando = 0  # Lançamentos em segundo plano ainda não entregues à fila
+        self._repor()
+
+    def _iniciar(self):
+        with lock_inicio_driver:
+            return self.criar_driver()
+
+    def _lancar(self):
+        try:
+            driver = self._iniciar()
+            if self._encerrado:
+                _encerrar(driver)
+            else:
+                self._prontos.put(driver)
+        except Exception as e:
+            logging.error(f"Erro ao iniciar driver de reserva: {e}")
+        finally:
+            with self._lock:
+                self._iniciando -= 1
+
+    def _repor(self):
+        # Completa a reserva contando os prontos e os que já estão iniciando
+        with self._lock:
+            if self._encerrado:
+                return
+            faltam = self.reserva - self._prontos.qsize() - self._iniciando
+            self._iniciando += max(faltam, 0)
+        for _ in range(faltam):
+            self._executor.submit(self._lancar)
+
+    def obter(self):
+        driver = None
+        while driver is None:
+            try:
+                # Com um lançamento em andamento, esperar por ele sai mais barato que iniciar outro
+                driver = self._prontos.get(block=self._iniciando > 0, timeout=1)
+            except queue.Empty:
+                if not self._iniciando:
+                    logging.info("Nenhum driver de reserva pronto; iniciando um agora")
+                    driver = self._iniciar()
+        self._repor()
+        return driver
+
+    def substituir(self, driver_quebrado):
+        """Retorna um driver novo no lugar de `driver_quebrado`, que é reciclado em segundo plano."""
+        if driver_quebrado is not None:
+            self._executor.submit(_encerrar, driver_quebrado)
+        logging.info("Substituindo driver quebrado por um da reserva")
+        return self.obter()
+
+    def encerrar(self):
+        self._encerrado = True
+        self._executor.shutdown(wait=True)
+        while True:
+            try:
+                _encerrar(self._prontos.get_nowait())
+            except queue.Empty:
+                break
@@ -0,0 +1,109 @@
+# pool_navegadores.py
+
+import os
+import queue
+import logging
+import threading
+from collections import namedtuple
+from pool_drivers import lock_inicio_driver
+
+# Máximo de sessões simultâneas que cada portal tolera
+LIMITES_PORTAL = {
+    'CEF': 2,
+    'TST': 3,
+    'SEFA-PR': 2,
+    'Curitiba': 2,
+}
+DIRETORIO_WORKERS = 'workers'
+
+# Recursos exclusivos de cada worker: pasta de downloads (o captcha vai em memória ao ServicoCaptcha)
+Worker = namedtuple('Worker', ['portal', 'indice', 'diretorio'])
+
+
+def limite_portal(portal, solicitados=None):
+    limite = LIMITES_PORTAL.get(portal, 1)
+    if solicitados and solicitados > limite:
+        logging.warning(f"[{portal}] {solicitados} workers solicitados; limitado a {limite}")
+    return max(1, min(solicitados or limite, limite))
+
+
+class PoolNavegadores:
+    """Processa as tarefas de um portal em N sessões de navegador independentes.
+
+    Cada worker roda numa thread com sua própria pasta de downloads e
+    pega a próxima tarefa de uma fila comum assim que termina a anterior, de modo
+    que os CNPJs se distribuem entre os workers conforme o ritmo de cada um.
+
+    `iniciar_worker(worker)` cria o estado do worker (driver, navegador etc.),
+    `processar(estado, tarefa)` trata uma tarefa e `finalizar_worker(estado)`
+    encerra a sessão. Com `em_lote`, `processar(estado, tarefas)` é chamado uma
+    vez por worker com um iterador sobre a fila (ex.: várias abas por navegador).
+    O número de workers nunca passa do limite do portal.
+    """
+
+    def __init__(self, portal, iniciar_worker, processar, finalizar_worker=None, max_workers=None,
+                 diretorio=DIRETORIO_WORKERS, em_lote=False):
+        self.portal = portal
+        self.em_lote = em_lote
+        self.iniciar_worker = iniciar_worker
+        self.processar = processar
+        self.finalizar_worker = finalizar_worker
+        self.max_workers = limite_portal(portal, max_workers)
+        self.diretorio = diretorio
+
+    def _criar_worker(self, indice):
+        diretorio = os.path.abspath(os.path.join(self.diretorio, self.portal, f"worker_{indice}"))
+        os.makedirs(diretorio, exist_ok=True)
+        return Worker(self.portal, indice, diretorio)
+
+    def _executar_worker(self, indice, fila):
+        worker = self._criar_worker(indice)
+        try:
+            # O undetected_chromedriver modifica o executável ao iniciar; um driver por vez
+            with lock_inicio_driver:
+                estado = self.iniciar_worker(worker)
+        except Exception as e:
+            logging.error(f"[{self.portal}] Worker {indice} não iniciou: {e}")
+            return
+        try:
+            if self.em_lote:
+                try:
+                    self.processar(estado, self._consumir(fila))
+                except Exception as e:
+                    logging.error(f"[{self.portal}] Worker {indice}: erro no lote: {e}")
+                return
+            for tarefa in self._consumir(fila):
+                try:
+                    self.processar(estado, tarefa)
+                except Exception as e:
+                    logging.error(f"[{self.portal}] Worker {indice}: erro na tarefa {tarefa}: {e}")
+        finally:
+            if self.finalizar_worker:
+                try:
+                    self.finalizar_worker(estado)
+                except Exception as e:
+                    logging.error(f"[{self.portal}] Worker {indice}: erro ao finalizar: {e}")
+
+    @staticmethod
+    def _consumir(fila):
+        while True:
+            try:
+                yield fila.get_nowait()
+            except queue.Empty:
+                return
+
+    def executar(self, tarefas):
+        fila = queue.Queue()
+        for tarefa in tarefas:
+            fila.put(tarefa)
+        quantidade = min(self.max_workers, fila.qsize())
+        if not quantidade:
+            return
+        logging.info(f"[{self.portal}] {fila.qsize()} tarefa(s) em {quantidade} worker(s)")
+        threads = [threading.Thread(target=self._executar_worker, args=(indice, fila),
+                                    name=f"{self.portal}-worker-{indice}")
+                   for indice in range(quantidade)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
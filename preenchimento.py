@@ -0,0 +1,76 @@
+# preenchimento.py
+
+import re
+import logging
+from selenium.webdriver.common.keys import Keys
+
+POR_CARACTERE = 'por_caractere'  # Uma tecla por vez, com pausa (campos com máscara que perdem dígitos)
+UNICO = 'unico'  # Um único send_keys com o texto todo
+JAVASCRIPT = 'javascript'  # Atribui o valor via JS e dispara os eventos input/change
+
+# Estratégia padrão de cada portal; só digita devagar quem precisa
+ESTRATEGIAS_PORTAL = {
+    'CEF': UNICO,
+    'TST': UNICO,
+    'SEFA-PR': UNICO,
+    'Curitiba': POR_CARACTERE,
+}
+
+_ATRIBUIR_VALOR_JS = """
+const campo = arguments[0];
+const definir = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(campo), 'value').set;
+campo.focus();
+definir.call(campo, arguments[1]);
+campo.dispatchEvent(new Event('input', {bubbles: true}));
+campo.dispatchEvent(new Event('change', {bubbles: true}));
+campo.blur();
+"""
+
+
+def _por_caractere(driver, campo, texto, ritmo_tecla):
+    campo.clear()
+    campo.send_keys(Keys.HOME)  # Garante que o cursor esteja no início
+    for char in texto:
+        campo.send_keys(char)
+        if ritmo_tecla is not None:
+            ritmo_tecla.pausar()
+
+
+def _unico(driver, campo, texto, ritmo_tecla):
+    campo.clear()
+    campo.send_keys(Keys.HOME)
+    campo.send_keys(texto)
+
+
+def _javascript(driver, campo, texto, ritmo_tecla):
+    driver.execute_script(_ATRIBUIR_VALOR_JS, campo, texto)
+
+
+_ESTRATEGIAS = {
+    POR_CARACTERE: _por_caractere,
+    UNICO: _unico,
+    JAVASCRIPT: _javascript,
+}
+
+
+def _normalizar(texto):
+    # A máscara do campo (pontos, barra, hífen) não conta na conferência
+    return re.sub(r'\W', '', texto or '')
+
+
+def preencher_campo(driver, campo, texto, portal=None, estrategia=None, ritmo_tecla=None):
+    """Preenche `campo` com a estratégia do portal e confere o valor lido de volta.
+
+    Se a leitura não bater, repete digitando tecla por tecla; se ainda assim
+    não bater, levanta ValueError. Retorna a estratégia que funcionou.
+    """
+    estrategia = estrategia or ESTRATEGIAS_PORTAL.get(portal, UNICO)
+    tentativas = [estrategia] if estrategia == POR_CARACTERE else [estrategia, POR_CARACTERE]
+    lido = None
+    for modo in tentativas:
+        _ESTRATEGIAS[modo](driver, campo, texto, ritmo_tecla)
+        lido = campo.get_attribute("value")
+        if _normalizar(lido) == _normalizar(texto):
+            return modo
+        logging.warning(f"[{portal or 'campo'}] Preenchimento '{modo}' não conferiu: esperado {texto!r}, lido {lido!r}")
+    raise ValueError(f"Campo não aceitou o valor {texto!r} (lido {lido!r})")
@@ -0,0 +1,174 @@
+# servico_captcha.py
+
+import io
+import re
+import time
+import base64
+import hashlib
+import logging
+import threading
+from collections import Counter, defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from motor_ocr import obter_motor_ocr
+
+try:
+    from twocaptcha import TwoCaptcha
+except ImportError:  # Sem o pacote 2captcha-python, o backend de API fica indisponível
+    TwoCaptcha = None
+
+IMAGEM = 'imagem'
+RECAPTCHA = 'recaptcha'
+
+# Resposta de um captcha e quem a deu; `reportar` usa o backend para medir a precisão
+SolucaoCaptcha = namedtuple('SolucaoCaptcha', ['texto', 'backend', 'segundos'])
+
+
+class BackendAPI:
+    """Serviço externo (2Captcha): imagem e reCAPTCHA."""
+
+    nome = 'api'
+
+    def __init__(self, api_key):
+        if TwoCaptcha is None:
+            raise ImportError("Pacote 2captcha-python não instalado")
+        self.solver = TwoCaptcha(api_key)
+
+    def resolver(self, tipo, dados):
+        if tipo == IMAGEM:
+            return self.solver.normal(base64.b64encode(dados).decode(), regsense=1)['code']
+        site_key, url = dados
+        return self.solver.recaptcha(sitekey=site_key, url=url)['code']
+
+
+class BackendOCR:
+    """OCR local (motor_ocr) para captchas de imagem simples; não resolve reCAPTCHA."""
+
+    nome = 'ocr'
+
+    def __init__(self, lang='eng'):
+        self.lang = lang
+
+    def resolver(self, tipo, dados):
+        if tipo != IMAGEM:
+            return None
+        imagem = Image.open(io.BytesIO(dados)).convert('L')
+        return re.sub(r'[^0-9A-Za-z]', '', obter_motor_ocr(self.lang).reconhecer(imagem)) or None
+
+
+class BackendStub:
+    """Backend local e determinístico: a mesma entrada sempre dá a mesma resposta.
+
+    `respostas` mapeia o SHA-1 da imagem (ou de "site_key|url") para a resposta
+    esperada; o que não estiver mapeado recebe `padrao`. `latencia` simula o
+    tempo de um serviço real.
+    """
+
+    nome = 'stub'
+
+    def __init__(self, respostas=None, padrao="CAPTCHA_RESOLVED", latencia=0.0):
+        self.respostas = respostas or {}
+        self.padrao = padrao
+        self.latencia = latencia
+
+    @staticmethod
+    def chave(tipo, dados):
+        if tipo == RECAPTCHA:
+            dados = "|".join(dados).encode()
+        return hashlib.sha1(dados).hexdigest()
+
+    def resolver(self, tipo, dados):
+        if self.latencia:
+            time.sleep(self.latencia)
+        return self.respostas.get(self.chave(tipo, dados), self.padrao)
+
+
+class ServicoCaptcha:
+    """Resolve captchas em paralelo, fora da thread do navegador.
+
+    `enviar_imagem(bytes)` e `enviar_recaptcha(site_key, url)` retornam um
+    Future com a SolucaoCaptcha; o worker segue preenchendo o formulário e só
+    espera o resultado quando precisa dele. Os backends são tentados em ordem
+    até um responder. Depois de enviar a resposta ao portal, `reportar(solucao,
+    correta)` alimenta a precisão de cada backend, registrada junto com a
+    latência média em `resumo()`.
+    """
+
+    def __init__(self, backends, max_workers=4):
+        if not backends:
+            raise ValueError("Informe ao menos um backend de captcha")
+        self.backends = list(backends)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="captcha")
+        self._lock = threading.Lock()
+        self.estatisticas = defaultdict(Counter)  # backend -> pedidos, resolvidos, falhas, acertos, erros
+        self._latencias = defaultdict(float)
+
+    def _resolver(self, tipo, dados):
+        for backend in self.backends:
+            inicio = time.monotonic()
+            try:
+                texto = backend.resolver(tipo, dados)
+            except Exception as e:
+                logging.warning(f"Backend de captcha {backend.nome} falhou: {e}")
+                texto = None
+            segundos = time.monotonic() - inicio
+            with self._lock:
+                self.estatisticas[backend.nome]['pedidos'] += 1
+                if texto:
+                    self.estatisticas[backend.nome]['resolvidos'] += 1
+                    self._latencias[backend.nome] += segundos
+                else:
+                    self.estatisticas[backend.nome]['falhas'] += 1
+            if texto:
+                return SolucaoCaptcha(texto, backend.nome, segundos)
+        raise RuntimeError(f"Nenhum backend resolveu o captcha ({tipo})")
+
+    def enviar_imagem(self, imagem):
+        """Captcha de imagem (bytes PNG/JPEG, em memória) -> Future[SolucaoCaptcha]."""
+        return self._executor.submit(self._resolver, IMAGEM, imagem)
+
+    def enviar_recaptcha(self, site_key, url):
+        """reCAPTCHA v2 -> Future[SolucaoCaptcha] com o token em `texto`."""
+        return self._executor.submit(self._resolver, RECAPTCHA, (site_key, url))
+
+    def resolver_imagem(self, imagem, timeout=120):
+        return self.enviar_imagem(imagem).result(timeout)
+
+    def resolver_recaptcha(self, site_key, url, timeout=300):
+        return self.enviar_recaptcha(site_key, url).result(timeout)
+
+    def reportar(self, solucao, correta):
+        """Informa se o portal aceitou a resposta (precisão por backend)."""
+        if solucao is None:
+            return
+        with self._lock:
+            self.estatisticas[solucao.backend]['acertos' if correta else 'erros'] += 1
+
+    def resumo(self):
+        with self._lock:
+            for nome, contagem in self.estatisticas.items():
+                latencia = self._latencias[nome] / contagem['resolvidos'] if contagem['resolvidos'] else 0
+                avaliados = contagem['acertos'] + contagem['erros']
+                precisao = f"{100 * contagem['acertos'] / avaliados:.0f}%" if avaliados else "n/d"
+                logging.info(f"Captcha [{nome}]: {contagem['resolvidos']}/{contagem['pedidos']} resolvidos, "
+                             f"latência média {latencia:.2f} s, precisão {precisao}")
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+        self.resumo()
+
+
+def criar_servico_captcha(api_key=None, ocr=False, max_workers=4):
+    """API externa (com `api_key`) e/ou OCR local; sem nenhum deles, o stub determinístico."""
+    backends = []
+    if api_key:
+        try:
+            backends.append(BackendAPI(api_key))
+        except ImportError as e:
+            logging.warning(f"Backend de captcha por API indisponível: {e}")
+    if ocr:
+        backends.append(BackendOCR())
+    if not backends:
+        logging.warning("Nenhum backend de captcha configurado; usando o stub determinístico")
+        backends.append(BackendStub())
+    return ServicoCaptcha(backends, max_workers=max_workers)
@@ -0,0 +1,226 @@
+# servidor_stub_http.py
+
+import re
+import logging
+import secrets
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from selenium.webdriver.common.by import By
+from sessao_http import SessaoHTTP, analisar_html
+
+# Servidor local que imita os formulários da SEFA-PR e de Curitiba, para testar o modo
+# HTTP (url_base_http) sem acessar os portais: python servidor_stub_http.py
+
+CAMINHO_SEFA = '/sefa/emissao'
+CAMINHO_CURITIBA = '/Certidao/SolicitarCnpj'
+SITE_KEY = 'stub-site-key'
+MENSAGEM_SEM_CERTIDAO = "As informações disponíveis não permitem a emissão de Certidão Automática para o requerente."
+
+_PAGINA = "<html><head><meta charset='utf-8'><title>Stub</title></head><body>{}</body></html>"
+
+
+def pdf_stub(cnpj):
+    """PDF mínimo com o CNPJ no conteúdo, para conferir que cada consulta recebeu o seu."""
+    return f"%PDF-1.4\n% CERTIDAO NEGATIVA CNPJ {cnpj}\n%%EOF\n".encode()
+
+
+class _Portal(BaseHTTPRequestHandler):
+    # Estado do servidor (tokens por sessão, PDFs, CNPJs sem certidão) fica em self.server
+
+    def log_message(self, formato, *args):
+        logging.debug(f"[stub] {formato % args}")
+
+    def _responder(self, corpo, tipo='text/html; charset=utf-8', status=200, cookie=None):
+        dados = corpo if isinstance(corpo, bytes) else _PAGINA.format(corpo).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(dados)))
+        if cookie:
+            self.send_header('Set-Cookie', f"sessao={cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _sessao(self):
+        encontrado = re.search(r'sessao=(\w+)', self.headers.get('Cookie', ''))
+        return encontrado.group(1) if encontrado and encontrado.group(1) in self.server.tokens else None
+
+    def _campos(self):
+        tamanho = int(self.headers.get('Content-Length', 0))
+        return {nome: valores[0] for nome, valores in parse_qs(self.rfile.read(tamanho).decode()).items()}
+
+    def _novo_token(self, sessao, uso_unico):
+        # Token antifalsificação: na SEFA-PR só o último emitido vale; em Curitiba, qualquer um da sessão
+        token = secrets.token_hex(8)
+        validos = self.server.tokens.setdefault(sessao, set())
+        if uso_unico:
+            validos.clear()
+        validos.add(token)
+        return token
+
+    def _formulario_sefa(self, sessao, mensagem=''):
+        return (f"{mensagem}<form id='frmEmissao' action='{CAMINHO_SEFA}' method='post'>"
+                f"<input type='hidden' name='__RequestVerificationToken' value='{self._novo_token(sessao, True)}'>"
+                "<input type='text' id='EmissaoCnpj' name='EmissaoCnpj' value=''><br>"
+                "<input type='submit' id='btnEmitir' value='Emitir'></form>"
+                "<footer class='rodape'>Secretaria da Fazenda (stub)</footer>")
+
+    def _formulario_curitiba(self, sessao):
+        return (f"<form id='frmSolicitar' action='{CAMINHO_CURITIBA}' method='post'>"
+                f"<input type='hidden' name='__RequestVerificationToken' value='{self._novo_token(sessao, False)}'>"
+                "<input type='text' id='DocumentoCnpj' name='Documento.Cnpj' value=''>"
+                f"<div class='g-recaptcha' data-sitekey='{SITE_KEY}'></div>"
+                "<textarea id='g-recaptcha-response' name='g-recaptcha-response'></textarea>"
+                "<button id='btnSolicitar' type='submit'>Solicitar</button></form>")
+
+    def do_GET(self):
+        caminho = urlsplit(self.path).path
+        if caminho in (CAMINHO_SEFA, CAMINHO_CURITIBA):
+            sessao = self._sessao() or secrets.token_hex(8)
+            formulario = self._formulario_sefa if caminho == CAMINHO_SEFA else self._formulario_curitiba
+            return self._responder(formulario(sessao), cookie=sessao)
+        encontrado = re.fullmatch(r'/pdf/(\w+)/(\d+)', caminho)
+        if encontrado and self._sessao() and self.server.pdfs.get(encontrado.group(1)) == encontrado.group(2):
+            return self._responder(pdf_stub(encontrado.group(2)), 'application/pdf')
+        self._responder("Não encontrado", status=404)
+
+    def do_POST(self):
+        caminho = urlsplit(self.path).path
+        sessao = self._sessao()
+        campos = self._campos()
+        if sessao is None or campos.pop('__RequestVerificationToken', None) not in self.server.tokens[sessao]:
+            return self._responder("<div class='alert alert-danger'>Sessão expirada</div>", status=403)
+        if caminho == CAMINHO_SEFA:
+            return self._emitir_sefa(sessao, campos.get('EmissaoCnpj', ''))
+        if caminho == CAMINHO_CURITIBA:
+            return self._solicitar_curitiba(sessao, campos)
+        self._responder("Não encontrado", status=404)
+
+    def _link_pdf(self, cnpj, texto):
+        chave = secrets.token_hex(8)
+        self.server.pdfs[chave] = cnpj
+        return f"<a href='/pdf/{chave}/{cnpj}'>{texto}</a>"
+
+    def _emitir_sefa(self, sessao, cnpj):
+        cnpj = re.sub(r'\D', '', cnpj)
+        if cnpj in self.server.sem_certidao:
+            mensagem = f"<div class='alert alert-danger'>{MENSAGEM_SEM_CERTIDAO}<br>CNPJ {cnpj}</div>"
+        else:
+            mensagem = (f"<div class='alert alert-success'>Certidão emitida para o CNPJ {cnpj}.<br>"
+                        f"Para baixar, {self._link_pdf(cnpj, 'Clique aqui')}</div>")
+        self._responder(self._formulario_sefa(sessao, mensagem))
+
+    def _solicitar_curitiba(self, sessao, campos):
+        if 'cnpj' in campos:  # Segundo formulário: "Gerar nova certidão"
+            return self._responder(self._link_pdf(campos['cnpj'], 'Baixar certidão'))
+        if not campos.get('g-recaptcha-response'):
+            return self._responder("<div class='alert alert-danger'>reCAPTCHA inválido</div>"
+                                   + self._formulario_curitiba(sessao))
+        cnpj = re.sub(r'\D', '', campos.get('Documento.Cnpj', ''))
+        self._responder(f"<form action='{CAMINHO_CURITIBA}' method='post'>"
+                        f"<input type='hidden' name='__RequestVerificationToken' value='{self._novo_token(sessao, False)}'>"
+                        f"<input type='hidden' name='cnpj' value='{cnpj}'>"
+                        "<input type='submit' id='btnGerarNovaCertidao' name='btnGerarNovaCertidao' "
+                        "value='Gerar nova certidão'></form>")
+
+
+class ServidorStub:
+    """Sobe o portal falso numa thread; `url` serve de url_base_http. CNPJs em `sem_certidao` recebem S/CND."""
+
+    def __init__(self, porta=0, sem_certidao=()):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', porta), _Portal)
+        self.servidor.tokens = {}
+        self.servidor.pdfs = {}
+        self.servidor.sem_certidao = set(sem_certidao)
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}"
+        self._thread = threading.Thread(target=self.servidor.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+        return False
+
+
+class _ElementoStub:
+    def __init__(self, attrs):
+        self.attrs = attrs
+
+    def get_attribute(self, nome):
+        return self.attrs.get(nome)
+
+
+class NavegadorStub:
+    """O mínimo de um WebDriver que as classes ConsultaHTTP usam: abre a página do formulário
+    por HTTP e expõe elementos, formulário, cookies e user-agent como o navegador faria."""
+
+    def __init__(self, url):
+        self.current_url = url
+        self._sessao = SessaoHTTP()
+        resposta = self._sessao.sessao.get(url, timeout=10)
+        resposta.raise_for_status()
+        self._html = resposta.text
+        self._pagina = analisar_html(self._html)
+
+    def find_element(self, by, valor):
+        if by == By.ID:
+            padrao = rf"<\w+[^>]*\bid='{re.escape(valor)}'[^>]*>"
+        else:
+            padrao = rf"<\w+[^>]*\bclass='[^']*\b{re.escape(valor)}\b[^']*'[^>]*>"
+        tag = re.search(padrao, self._html)
+        if tag is None:
+            raise LookupError(f"Elemento {valor} não encontrado na página do stub")
+        return _ElementoStub(dict(re.findall(r"([\w-]+)='([^']*)'", tag.group(0))))
+
+    def execute_script(self, script, *args):
+        if 'navigator.userAgent' in script:
+            return self._sessao.sessao.headers['User-Agent']
+        # _LER_FORMULARIO_JS: o formulário que contém o campo arguments[0]
+        nome = self.find_element(By.ID, args[0]).get_attribute('name')
+        formulario = next(f for f in self._pagina.formularios if nome in f.campos)
+        return {'acao': formulario.acao, 'metodo': formulario.metodo, 'campos': dict(formulario.campos)}
+
+    def get_cookies(self):
+        return [{'name': c.name, 'value': c.value, 'domain': c.domain, 'path': c.path}
+                for c in self._sessao.sessao.cookies]
+
+
+def verificar():
+    """Roda as consultas HTTP da SEFA-PR e de Curitiba contra o stub e confere as respostas."""
+    from cndestadual import ConsultaHTTPSefa
+    from cndcuritiba import ConsultaHTTPCuritiba
+    from estado_tarefas import ResultadoConsulta
+    from servico_captcha import criar_servico_captcha
+
+    # <br> e <input> não têm fechamento: o texto depois do alerta não pode ser atribuído a ele
+    pagina = analisar_html("<div class='alert alert-danger'>Erro<br>linha<input name='x'></div>"
+                           "<footer class='rodape'>Rodapé</footer>")
+    assert pagina.textos_por_classe['alert-danger'] == "Errolinha", "Parser: pilha de classes deslocada"
+
+    with ServidorStub(sem_certidao={'22222222000122'}) as stub:
+        sessao = SessaoHTTP(stub.url)
+        consulta = ConsultaHTTPSefa(NavegadorStub(stub.url + CAMINHO_SEFA), sessao)
+        # O segundo CNPJ só passa se o token renovado na primeira resposta for reaproveitado
+        for cnpj in ('11111111000111', '33333333000133'):
+            pdf = consulta.consultar(cnpj)
+            assert pdf == pdf_stub(cnpj), f"SEFA-PR: PDF inesperado para {cnpj}: {pdf!r}"
+        assert consulta.consultar('22222222000122') == ResultadoConsulta("S/CND"), "SEFA-PR: S/CND não reconhecido"
+        sessao.fechar()
+
+        solucionador = criar_servico_captcha()
+        sessao = SessaoHTTP(stub.url)
+        consulta = ConsultaHTTPCuritiba(NavegadorStub(stub.url + CAMINHO_CURITIBA), sessao, solucionador)
+        for cnpj in ('11111111000111', '33333333000133'):
+            pdf = consulta.consultar(cnpj)
+            assert pdf == pdf_stub(cnpj), f"Curitiba: PDF inesperado para {cnpj}: {pdf!r}"
+        sessao.fechar()
+        solucionador.encerrar()
+    logging.info("Modo HTTP conferido contra o stub: SEFA-PR e Curitiba OK")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    verificar()
@@ -0,0 +1,165 @@
+# sessao_http.py
+
+import logging
+from collections import namedtuple
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit, urlunsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Formulário HTML pronto para reenvio: URL de destino, método, campos com valores e botões (id/nome -> texto)
+Formulario = namedtuple('Formulario', ['acao', 'metodo', 'campos', 'botoes'])
+
+_LER_FORMULARIO_JS = """
+var form = document.getElementById(arguments[0]).form;
+var campos = {};
+for (var i = 0; i < form.elements.length; i++) {
+    var el = form.elements[i];
+    if (!el.name || el.disabled) continue;
+    if ((el.type === 'checkbox' || el.type === 'radio') && !el.checked) continue;
+    if (el.type === 'submit' || el.type === 'button') continue;
+    campos[el.name] = el.value;
+}
+return {acao: form.action || document.location.href, metodo: (form.method || 'get').toLowerCase(), campos: campos};
+"""
+
+
+# Elementos sem tag de fechamento; não entram na pilha de classes
+_ELEMENTOS_VAZIOS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                               'param', 'source', 'track', 'wbr'))
+
+
+class _ParserHTML(HTMLParser):
+    """Coleta formulários (com campos e botões), links e o texto dos elementos com classe."""
+
+    def __init__(self):
+        super().__init__()
+        self.formularios = []
+        self.links = []
+        self.textos_por_classe = {}
+        self._form = None
+        self._link = None
+        self._botao = None
+        self._classes = []  # Pilha de (tag, classes) dos elementos abertos
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self._abrir(tag, attrs)
+        if tag not in _ELEMENTOS_VAZIOS:
+            self._classes.append((tag, attrs.get('class', '').split()))
+
+    def handle_startendtag(self, tag, attrs):
+        # <tag/>: abre e fecha sem conteúdo, sem passar pela pilha de classes
+        self._abrir(tag, dict(attrs))
+        self._fechar(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in _ELEMENTOS_VAZIOS:
+            # Fecha até o elemento correspondente; tags fechadas implicitamente (<p>, <li>) saem junto
+            for indice in range(len(self._classes) - 1, -1, -1):
+                if self._classes[indice][0] == tag:
+                    del self._classes[indice:]
+                    break
+        self._fechar(tag)
+
+    def _abrir(self, tag, attrs):
+        if tag == 'form':
+            self._form = Formulario(attrs.get('action', ''), attrs.get('method', 'get').lower(), {}, {})
+            self.formularios.append(self._form)
+        elif tag == 'input' and self._form is not None and attrs.get('name'):
+            if attrs.get('type', 'text').lower() in ('submit', 'button'):
+                self._form.botoes[attrs.get('id') or attrs['name']] = attrs.get('value', '')
+            else:
+                self._form.campos[attrs['name']] = attrs.get('value', '')
+        elif tag == 'button' and self._form is not None:
+            self._botao = attrs.get('id') or attrs.get('name') or ''
+            self._form.botoes[self._botao] = ''
+        elif tag == 'a' and attrs.get('href'):
+            self._link = [attrs['href'], '']
+            self.links.append(self._link)
+
+    def _fechar(self, tag):
+        if tag == 'form':
+            self._form = None
+        elif tag == 'a':
+            self._link = None
+        elif tag == 'button':
+            self._botao = None
+
+    def handle_data(self, data):
+        if self._link is not None:
+            self._link[1] += data
+        if self._botao is not None and self._form is not None:
+            self._form.botoes[self._botao] += data
+        for _, classes in self._classes:
+            for classe in classes:
+                self.textos_por_classe[classe] = self.textos_por_classe.get(classe, '') + data
+
+
+def analisar_html(html):
+    parser = _ParserHTML()
+    parser.feed(html)
+    return parser
+
+
+class SessaoHTTP:
+    """Sessão requests com pool de conexões keep-alive, reaproveitada por todos os CNPJs.
+
+    O navegador só estabelece a sessão (cookies, captcha); `importar_navegador`
+    copia cookies e user-agent para cá e os envios de formulário e downloads de
+    PDF seguem por HTTP. Com `base_url`, todas as URLs têm o esquema e o host
+    trocados por ela, o que permite apontar o fluxo para um servidor local que
+    imite o portal.
+    """
+
+    def __init__(self, base_url=None, tamanho_pool=4, timeout=30, tentativas=2):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.sessao = requests.Session()
+        retry = Retry(total=tentativas, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(['GET', 'HEAD']))
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=retry)
+        self.sessao.mount('https://', adaptador)
+        self.sessao.mount('http://', adaptador)
+
+    def url(self, endereco, referencia=None):
+        endereco = urljoin(referencia or self.base_url or '', endereco)
+        if not self.base_url:
+            return endereco
+        base, partes = urlsplit(self.base_url), urlsplit(endereco)
+        return urlunsplit((base.scheme, base.netloc, partes.path, partes.query, ''))
+
+    def importar_navegador(self, driver):
+        """Copia cookies e user-agent da sessão do navegador."""
+        self.sessao.headers['User-Agent'] = driver.execute_script("return navigator.userAgent")
+        for cookie in driver.get_cookies():
+            self.sessao.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'),
+                                    path=cookie.get('path', '/'))
+
+    def ler_formulario(self, driver, id_campo):
+        """Lê do DOM o formulário que contém o campo `id_campo`, com os valores atuais (tokens ocultos incluídos)."""
+        dados = driver.execute_script(_LER_FORMULARIO_JS, id_campo)
+        return Formulario(dados['acao'], dados['metodo'], dados['campos'], {})
+
+    def enviar_formulario(self, formulario, valores=None, referencia=None):
+        campos = dict(formulario.campos, **(valores or {}))
+        url = self.url(formulario.acao, referencia)
+        if formulario.metodo == 'post':
+            resposta = self.sessao.post(url, data=campos, timeout=self.timeout)
+        else:
+            resposta = self.sessao.get(url, params=campos, timeout=self.timeout)
+        resposta.raise_for_status()
+        return resposta
+
+    def obter_pdf(self, endereco, referencia=None):
+        """Baixa o PDF para a memória; retorna None se a resposta não for um PDF."""
+        resposta = self.sessao.get(self.url(endereco, referencia), timeout=self.timeout)
+        resposta.raise_for_status()
+        if not resposta.content.startswith(b'%PDF'):
+            logging.warning(f"Resposta de {resposta.url} não é um PDF ({resposta.headers.get('Content-Type')})")
+            return None
+        return resposta.content
+
+    def fechar(self):
+        self.sessao.close()
@@ -1,12 +1,8 @@
 # trabalhista.py
 
 import os
-import time
 import base64
-import fitz  # PyMuPDF
 import pytesseract
-from PIL import Image
-# from twocaptcha import TwoCaptcha  # Comentado: Integre uma solução de CAPTCHA conforme necessário
 import logging
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -16,8 +12,23 @@ from selenium.common.exceptions import (
     NoSuchElementException, TimeoutException, InvalidSessionIdException,
     UnexpectedAlertPresentException, WebDriverException, NoSuchWindowException
 )
-from openpyxl import load_workbook
-import shutil
+from escritor_planilha import EscritorPlanilha
+from leitor_planilha import com_status, ler_cabecalho, ler_registros
+from estado_tarefas import ArmazemTarefas, ResultadoConsulta
+from extracao_pdf import CacheExtracao
+from pipeline_ocr import PipelineProcessamento
+from motor_ocr import configurar_motor_ocr
+from gerenciador_downloads import GerenciadorDownloads
+from captura_pdf import CapturaPDF, gravar_pdf, habilitar_log_rede
+from pool_navegadores import PoolNavegadores
+from pool_drivers import PoolDrivers
+from esperas import Ritmo, aguardar, atributo_contem
+from limitador_taxa import limitador_portal
+from preenchimento import preencher_campo
+from politica_retentativa import TentativasEsgotadas, politica_portal
+from disjuntor import STATUS_INDISPONIVEL, PortalIndisponivel, falha_de_infraestrutura
+from perfil_navegador import COMPLETO, bloquear_recursos, configurar_perfil, metricas
+from servico_captcha import criar_servico_captcha
 
 # Configuração de logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -26,91 +37,196 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 input_file = r'path/to/excel_file.xlsx'
 negativa_dir = r'path/to/trabalhista_negativa'
 positiva_dir = r'path/to/trabalhista_positiva'
-downloads_dir = r'path/to/downloads'
-api_key = 'your_captcha_api_key'
+downloads_dir = r'path/to/downloads'  # Cada CNPJ baixa numa subpasta própria
+api_key = None  # Chave do 2Captcha; sem ela (e sem OCR), o captcha vai para o stub determinístico
+captcha_por_ocr = False  # Tenta o OCR local antes da API (ou no lugar dela)
+dias_antecedencia_validade = 7  # Reconsulta CNDTs que vencem dentro deste prazo (None desativa)
+cache_extracao_db = 'cache_extracao.db'  # Cache em disco das análises de PDF (None mantém só em memória)
+processos_ocr = None  # Processos que classificam os PDFs em paralelo ao navegador (None: cota dos núcleos - 1)
+captura_pdf_em_memoria = True  # Lê o PDF da resposta via CDP; se vier como anexo, espera o download
+workers_navegador = 1  # Sessões de navegador em paralelo (limitadas por LIMITES_PORTAL['TST'])
+perfil_chrome = COMPLETO  # ENXUTO: headless, sem fontes/analytics/banners (captcha e PDF continuam liberados)
+ritmo = Ritmo(0.5, 1.5)  # Pausa mínima entre ações, além das esperas por condição (Ritmo(0) desativa)
+reserva_drivers = 1  # Navegadores pré-iniciados por worker, para substituir na hora um que quebrar
 
 pytesseract.pytesseract.tesseract_cmd = r'path/to/tesseract.exe' # Tesseract para OCR
 os.environ['TESSDATA_PREFIX'] = r'path/to/tessdata'  # Tessdata
+# Instâncias do Tesseract mantidas carregadas por processo (tesserocr); sem ele, volta ao pytesseract
+configurar_motor_ocr(tamanho_pool=1)
 
-def encontrar_arquivo_pdf(diretorio, nome_parcial, timeout=60):
-    end_time = time.time() + timeout
-    while time.time() < end_time:
-        for arquivo in os.listdir(diretorio):
-            if arquivo.endswith(".pdf") and nome_parcial in arquivo:
-                return os.path.join(diretorio, arquivo)
-        time.sleep(5)  # Espera de 5 segundos
-    return None
-
-class SolucionadorCaptchaImg:
-    def __init__(self, api_key):
-        # self.solver = TwoCaptcha(api_key)
-        pass
-
-    def resolver_captcha(self, image_path, max_retries=3):
-        logging.info("Resolvendo captcha")
-        # Implementar resolução de CAPTCHA aqui, por exemplo, usando uma API de terceiros
-        # Exemplo:
-        # attempts = 0
-        # while attempts < max_retries:
-        #     try:
-        #         result = self.solver.normal(image_path)
-        #         return result['code']
-        #     except Exception as e:
-        #         logging.error(f"Erro ao resolver captcha: {e}")
-        #         attempts += 1
-        #         time.sleep(5)  # Aguarde antes de tentar novamente
-        # raise Exception("Falha ao resolver captcha após várias tentativas.")
-        return "CAPTCHA_RESOLVED"
+captura = CapturaPDF(timeout=60) if captura_pdf_em_memoria else None
+politica = politica_portal("TST")  # Repete só falhas transitórias, com espera crescente e orçamento por CNPJ
+limitador = limitador_portal("TST")  # Taxa de consultas comum a todos os workers, ajustada pelas respostas
 
 class ProcessadorPDF:
+    cache = None  # CacheExtracao do processo, aberto por iniciar_processo_pdf
+
     @staticmethod
-    def pixmap_para_pil(pix):
-        mode = "RGBA" if pix.alpha else "RGB"
-        size = (pix.width, pix.height)
-        return Image.frombytes(mode, size, pix.samples)
+    def analisar(caminho_pdf):
+        return ProcessadorPDF.cache.analisar(caminho_pdf)
 
     @staticmethod
     def extrair_texto_de_pdf(caminho_pdf):
-        texto = ""
-        with fitz.open(caminho_pdf) as doc:
-            for page in doc:
-                pix = page.get_pixmap()
-                img = ProcessadorPDF.pixmap_para_pil(pix)
-                texto += pytesseract.image_to_string(img, lang='por')
-        return texto.upper()
+        return ProcessadorPDF.analisar(caminho_pdf).texto.upper()
+
+    @staticmethod
+    def status_do_texto(texto):
+        texto = texto.upper()
+        if "NEGATIVA" in texto:
+            return "Negativa"
+        if "POSITIVA" in texto:
+            return "Positiva"
+        return None
+
+def iniciar_processo_pdf(caminho_cache=None):
+    # Inicializador dos processos do pipeline: cada processo abre a própria conexão com o cache
+    ProcessadorPDF.cache = CacheExtracao('TST', ProcessadorPDF.status_do_texto, caminho_disco=caminho_cache)
 
 class Planilha:
-    def __init__(self, caminho):
+    def __init__(self, caminho, escritor=None):
         self.caminho = caminho
-        self.wb = load_workbook(caminho)
-        self.sheet = self.wb.active
+        self.escritor = escritor or EscritorPlanilha(caminho)
         self._obter_indices_colunas()
 
     def _obter_indices_colunas(self):
-        headers = next(self.sheet.iter_rows(min_row=1, max_row=1, values_only=True))
-        self.cnpj_index = headers.index("CNPJ") + 1
-        self.tjus_index = headers.index("TJUS") + 1
-
-    def obter_cnpjs(self, processar_todos=True):
-        cnpjs = []
-        for row_index, row in enumerate(self.sheet.iter_rows(min_row=2, values_only=True), start=2):
-            cnpj = row[self.cnpj_index - 1]
-            tjus_status = row[self.tjus_index - 1]
+        headers = ler_cabecalho(self.caminho)
+        self.cnpj_index = headers["CNPJ"]
+        self.tjus_index = headers["TJUS"]
+
+    def obter_cnpjs(self, processar_todos=True, registros=None):
+        if registros is None:
+            registros = ler_registros(self.caminho, coluna_status="TJUS")
+        else:
+            registros = com_status(registros, "TJUS")
+        for registro in registros:
+            tjus_status = str(registro.status or "")
             # Se for para processar todos ou se o TJUS estiver vazio
-            if processar_todos or not tjus_status or not tjus_status.startswith("OK"):
-                cnpjs.append((cnpj, row_index))
-        return cnpjs
+            if processar_todos or not tjus_status.startswith("OK"):
+                yield registro.cnpj, registro.linha
 
     def atualizar_status(self, row_index, status):
-        self.sheet.cell(row=row_index, column=self.tjus_index, value=status)
-        self.salvar_planilha()
+        self.escritor.atualizar(row_index, self.tjus_index, status)
 
     def salvar_planilha(self):
-        self.wb.save(self.caminho)
+        self.escritor.descarregar()
+
+def classificar_pdf_baixado(cnpj, pdf):
+    """Extrai, classifica e grava o PDF (caminho baixado ou bytes capturados). Roda nos processos do pipeline."""
+    analise = ProcessadorPDF.analisar(pdf)
+    if analise.status == "Negativa":
+        destino_pdf = os.path.join(negativa_dir, f"{cnpj}.pdf")
+        result = "OK, Negativa"
+    elif analise.status == "Positiva":
+        destino_pdf = os.path.join(positiva_dir, f"{cnpj}.pdf")
+        result = "OK, Positiva"
+    else:
+        destino_pdf = os.path.join(negativa_dir, f"{cnpj}_NA.pdf")
+        result = "Falhou: texto desconhecido no PDF"
+    gravar_pdf(pdf, destino_pdf)
+    return ResultadoConsulta(result, destino_pdf, analise.validade)
+
+def reiniciar_driver(driver, drivers=None):
+    """Troca um driver quebrado: pela reserva de `drivers` ou, sem pool, encerrando e iniciando outro."""
+    if drivers is not None:
+        return drivers.substituir(driver)
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass
+    return iniciar_driver()
 
-def process_cnpj(cnpj, driver, captcha_solver):
-    pdf_found = False
-    result = "Falhou"  # Resultado padrão caso todas as tentativas falhem
+def _emitir_certidao(cnpj, driver, captcha_solver, pipeline, gerenciador_downloads):
+    limitador.adquirir()
+    driver.get('https://www.tst.jus.br/certidao1')
+    metricas.registrar_pagina("TST", driver)
+
+    # Aceitar cookies se ainda não foram aceitos
+    try:
+        WebDriverWait(driver, 10).until(
+            EC.element_to_be_clickable((By.CSS_SELECTOR, "a.ce-accept.post-accept"))
+        ).click()
+        driver.refresh()
+    except (NoSuchElementException, TimeoutException):
+        pass
+
+    # Rolagem para visualizar o iframe e entrar no iframe
+    driver.execute_script("window.scrollTo(0, 500);")
+    iframe = WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[src*='cndt-certidao']"))
+    )
+    driver.switch_to.frame(iframe)
+
+    # Clicar no botão "Emitir Certidão" e preencher o CNPJ
+    WebDriverWait(driver, 20).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, "input[type='submit'][value='Emitir Certidão']"))
+    ).click()
+    cnpj_input = WebDriverWait(driver, 20).until(
+        EC.presence_of_element_located((By.CSS_SELECTOR, "input[id*='cpfCnpj']"))
+    )
+    preencher_campo(driver, cnpj_input, cnpj, "TST")
+
+    try:
+        # Aguardar a imagem do captcha carregar (src em base64); sem ela, é reCAPTCHA
+        captcha_image_element = aguardar(driver, atributo_contem(
+            (By.CSS_SELECTOR, "img[alt*='Captcha'], img[id='idImgBase64']"), "src", "base64"), timeout=15)
+        ritmo.pausar()
+        captcha_image_src = captcha_image_element.get_attribute("src")
+        if 'base64' in captcha_image_src:
+            # A imagem vai em memória para o serviço, que resolve enquanto o campo de resposta carrega
+            futuro = captcha_solver.enviar_imagem(base64.b64decode(captcha_image_src.split(",")[1]))
+            captcha_input = WebDriverWait(driver, 20).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, "input[id='idCampoResposta']"))
+            )
+            try:
+                solucao = futuro.result(120)
+            except Exception as e:
+                logging.error(f"Captcha do CNPJ {cnpj} não resolvido: {e}")
+                return ResultadoConsulta("Falhou: captcha não resolvido")
+            preencher_campo(driver, captcha_input, solucao.texto, "TST")
+        else:
+            raise NoSuchElementException("Imagem do captcha não encontrada ou atributo 'src' vazio.")
+    except (NoSuchElementException, TimeoutException):
+        limitador.estrangulado("reCAPTCHA no lugar do captcha")
+        driver.delete_all_cookies()  # Limpar cookies e tentar novamente
+        return ResultadoConsulta("Falhou: reCAPTCHA detectado")
+
+    # Clicar no botão "Emitir Certidão" novamente, com o download indo para a pasta deste CNPJ
+    gerenciador_downloads.preparar(driver, cnpj)
+    if captura is not None:
+        captura.preparar(driver)
+    WebDriverWait(driver, 20).until(
+        EC.element_to_be_clickable((By.CSS_SELECTOR, "input[id='gerarCertidaoForm:btnEmitirCertidao']"))
+    ).click()
+
+    # Esperar o PDF: capturado em memória ou, se o portal o entregar como anexo, baixado
+    pdf = captura.aguardar(driver) if captura is not None else None
+    if not pdf:
+        pdf = gerenciador_downloads.aguardar(cnpj)
+    captcha_solver.reportar(solucao, bool(pdf))  # Sem PDF, o portal recusou a resposta do captcha
+    if not pdf:
+        return ResultadoConsulta("Falhou: PDF não encontrado")
+    limitador.sucesso()
+    if pipeline is None:
+        return classificar_pdf_baixado(cnpj, pdf)
+    pipeline.enviar(cnpj, classificar_pdf_baixado, cnpj, pdf)
+    return None
+
+
+def process_cnpj(cnpj, driver, captcha_solver, pipeline=None, gerenciador_downloads=None, drivers=None):
+    """Retorna (ResultadoConsulta, driver) com status, PDF classificado e validade da certidão.
+
+    Com `pipeline`, o PDF baixado é entregue ao pipeline para classificação e o
+    resultado retornado é None; ele chega depois, pelo callback do pipeline.
+    Cada worker do pool informa sua própria pasta de downloads; `captcha_solver`
+    é o ServicoCaptcha compartilhado por todos eles.
+    Se o navegador precisar ser reiniciado, o driver retornado é o substituto
+    (vindo da reserva `drivers`, se informada) e deve ser usado daqui em diante.
+    """
+    # Sem o gerenciador do worker, usa a pasta padrão (criada só agora, não na importação)
+    gerenciador_downloads = gerenciador_downloads or GerenciadorDownloads(downloads_dir, timeout=60)
+    resultado = ResultadoConsulta("Falhou")  # Resultado padrão caso todas as tentativas falhem
+    reiniciado = False
+    main_window = None
 
     try:
         # Salvar a guia principal para referência
@@ -119,80 +235,9 @@ def process_cnpj(cnpj, driver, captcha_solver):
         # Abrir uma nova guia
         driver.execute_script("window.open('');")
         driver.switch_to.window(driver.window_handles[-1])
+        bloquear_recursos(driver, perfil_chrome)  # O bloqueio vale por aba
 
-        driver.get('https://www.tst.jus.br/certidao1')
-
-        # Aceitar cookies se ainda não foram aceitos
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.element_to_be_clickable((By.CSS_SELECTOR, "a.ce-accept.post-accept"))
-            ).click()
-            driver.refresh()
-        except (NoSuchElementException, TimeoutException):
-            pass
-
-        # Rolagem para visualizar o iframe e entrar no iframe
-        driver.execute_script("window.scrollTo(0, 500);")
-        iframe = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "iframe[src*='cndt-certidao']"))
-        )
-        driver.switch_to.frame(iframe)
-
-        # Clicar no botão "Emitir Certidão" e preencher o CNPJ
-        WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[type='submit'][value='Emitir Certidão']"))
-        ).click()
-        cnpj_input = WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "input[id*='cpfCnpj']"))
-        )
-        cnpj_input.clear()
-        cnpj_input.send_keys(cnpj)
-
-        time.sleep(5)  # Aguardar carregamento do captcha
-
-        try:
-            # Verificar se a imagem do captcha está presente
-            captcha_image_element = driver.find_element(By.CSS_SELECTOR, "img[alt*='Captcha'], img[id='idImgBase64']")
-            captcha_image_src = captcha_image_element.get_attribute("src")
-            if 'base64' in captcha_image_src:
-                captcha_image_data = captcha_image_src.split(",")[1]
-                with open("captcha.png", "wb") as f:
-                    f.write(base64.b64decode(captcha_image_data))
-                captcha_code = captcha_solver.resolver_captcha("captcha.png")
-                captcha_input = WebDriverWait(driver, 20).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, "input[id='idCampoResposta']"))
-                )
-                captcha_input.clear()
-                captcha_input.send_keys(captcha_code)
-            else:
-                raise NoSuchElementException("Imagem do captcha não encontrada ou atributo 'src' vazio.")
-        except (NoSuchElementException, TimeoutException):
-            result = "Falhou: reCAPTCHA detectado"
-            driver.delete_all_cookies()  # Limpar cookies e tentar novamente
-            return result
-
-        # Clicar no botão "Emitir Certidão" novamente
-        WebDriverWait(driver, 20).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, "input[id='gerarCertidaoForm:btnEmitirCertidao']"))
-        ).click()
-
-        # Esperar o PDF ser gerado e baixado
-        pdf_path = encontrar_arquivo_pdf(downloads_dir, cnpj, timeout=60)
-        if pdf_path:
-            pdf_found = True
-            texto_pdf = ProcessadorPDF.extrair_texto_de_pdf(pdf_path)
-            if "NEGATIVA" in texto_pdf:
-                destino_pdf = os.path.join(negativa_dir, f"{cnpj}.pdf")
-                resultado = "OK, Negativa"
-            elif "POSITIVA" in texto_pdf:
-                destino_pdf = os.path.join(positiva_dir, f"{cnpj}.pdf")
-                resultado = "OK, Positiva"
-            else:
-                destino_pdf = os.path.join(negativa_dir, f"{cnpj}_NA.pdf")
-                resultado = "Falhou: texto desconhecido no PDF"
-            shutil.move(pdf_path, destino_pdf)
-        else:
-            result = "Falhou: PDF não encontrado"
+        resultado = _emitir_certidao(cnpj, driver, captcha_solver, pipeline, gerenciador_downloads)
 
     except UnexpectedAlertPresentException as e:
         try:
@@ -200,57 +245,129 @@ def process_cnpj(cnpj, driver, captcha_solver):
             alert_text = alert.text
             logging.warning(f"Alerta inesperado detectado: {alert_text}")
             alert.accept()
-            result = "Falhou: alerta inesperado"
+            resultado = ResultadoConsulta("Falhou: alerta inesperado")
         except Exception as inner_exception:
             logging.error(f"Erro ao lidar com o alerta: {inner_exception}")
-    except (NoSuchWindowException, WebDriverException) as e:
-        logging.error(f"Erro ao processar o CNPJ {cnpj} - Janela ou Sessão perdida: {e}")
-        # Reiniciar o driver de maneira controlada
-        driver.quit()
-        driver = iniciar_driver()  # Reiniciar o driver
-        result = "Falhou: janela ou sessão perdida, navegador reiniciado"
     except (NoSuchElementException, TimeoutException, InvalidSessionIdException) as e:
+        # Antes de WebDriverException, da qual as três são subclasses
         logging.error(f"Erro ao processar o CNPJ {cnpj}: {e}")
-        driver.quit()
-        driver = iniciar_driver()  # Reiniciar o driver em caso de erro
-        result = "Falhou: erro de sessão"
+        driver = reiniciar_driver(driver, drivers)
+        reiniciado = True
+        if falha_de_infraestrutura(e):
+            resultado = ResultadoConsulta(STATUS_INDISPONIVEL)  # Página que não carregou conta para o disjuntor
+        else:
+            resultado = ResultadoConsulta("Falhou: erro de sessão")
+    except (NoSuchWindowException, WebDriverException) as e:
+        logging.error(f"Erro ao processar o CNPJ {cnpj} - Janela ou Sessão perdida: {e}")
+        driver = reiniciar_driver(driver, drivers)
+        reiniciado = True
+        if falha_de_infraestrutura(e):
+            resultado = ResultadoConsulta(STATUS_INDISPONIVEL)  # Conta para o disjuntor do portal
+        else:
+            resultado = ResultadoConsulta("Falhou: janela ou sessão perdida, navegador reiniciado")
     finally:
-        # Fechar a guia que foi aberta para o processamento
-        if len(driver.window_handles) > 1:
-            driver.close()
-        # Voltar para a guia principal, se existir
-        try:
-            driver.switch_to.window(main_window)
-        except NoSuchWindowException:
-            logging.error(f"A janela principal não está mais disponível para o CNPJ {cnpj}")
-            driver = iniciar_driver()  # Reiniciar o driver
-
-    return result
-
-def iniciar_driver():
+        # Fechar a guia aberta para o processamento e voltar para a principal, mesmo se outra exceção
+        # subir (ValueError do preenchimento, OSError ao gravar o PDF); um driver substituto não tem a guia
+        if not reiniciado and main_window is not None:
+            try:
+                if len(driver.window_handles) > 1:
+                    driver.close()
+                driver.switch_to.window(main_window)
+            except (NoSuchWindowException, WebDriverException):
+                logging.error(f"A janela principal não está mais disponível para o CNPJ {cnpj}")
+                driver = reiniciar_driver(driver, drivers)
+
+    return resultado, driver
+
+def iniciar_driver(diretorio_downloads=None):
     options = webdriver.ChromeOptions()
+    if diretorio_downloads:
+        options.add_experimental_option("prefs", {"download.default_directory": diretorio_downloads})
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-notifications')  # Desabilitar notificações
+    if captura is not None:
+        habilitar_log_rede(options)
+    configurar_perfil(options, perfil_chrome)
     driver = webdriver.Chrome(options=options)
     driver.set_window_size(1920, 1080)
     return driver
 
-if __name__ == "__main__":
-    # Perguntar ao usuário se quer processar todos ou apenas com a coluna TJUS vazia
-    processar_todos = input("Deseja processar todos os CNPJs? (s/n): ").lower() == 's'
-
-    driver = iniciar_driver()
-    captcha_solver = SolucionadorCaptchaImg(api_key=None)
-    planilha = Planilha(input_file)
+def executar(processar_todos=False, caminho_planilha=None, escritor=None, registros=None):
+    """Consulta os CNPJs pendentes; `escritor` e `registros` permitem compartilhar a planilha já carregada."""
+    iniciar_processo_pdf(cache_extracao_db)  # Cache do processo principal, aberto só ao executar
+    captcha_solver = criar_servico_captcha(api_key, ocr=captcha_por_ocr, max_workers=workers_navegador)
+    planilha = Planilha(caminho_planilha or input_file, escritor)
+
+    # Registra os CNPJs e retoma do último ponto salvo; "processar todos" inicia uma nova rodada
+    armazem = ArmazemTarefas("TST")
+    armazem.registrar(planilha.obter_cnpjs(processar_todos=processar_todos, registros=registros))
+    if processar_todos:
+        armazem.reiniciar()
+    cnpjs = armazem.pendentes(dias_antecedencia=dias_antecedencia_validade, rodada_completa=processar_todos)
+    logging.info(f"{len(cnpjs)} CNPJ(s) a processar")
+    linhas = dict(cnpjs)
+
+    def registrar_resultado(cnpj, resultado, erro):
+        if erro:
+            logging.error(f"Erro ao classificar o PDF do CNPJ {cnpj}: {erro}")
+            resultado = ResultadoConsulta(f"Falhou: erro ao classificar PDF ({erro})")
+        armazem.concluir(cnpj, *resultado)
+        planilha.atualizar_status(linhas[cnpj], resultado.status)
+
+    def iniciar_worker(worker):
+        # Cada worker tem seu navegador e sua pasta de downloads; o captcha fica em memória
+        drivers = PoolDrivers(lambda: iniciar_driver(worker.diretorio), reserva=reserva_drivers)
+        return {
+            'drivers': drivers,
+            'driver': drivers.obter(),
+            'downloads': GerenciadorDownloads(worker.diretorio, timeout=60),
+        }
+
+    def processar(estado, tarefa):
+        cnpj, row_index = tarefa
+        logging.info(f"Processando CNPJ: {cnpj}")
+        armazem.iniciar(cnpj)
 
-    cnpjs = planilha.obter_cnpjs(processar_todos=processar_todos)
+        def tentativa(numero):
+            resultado, estado['driver'] = process_cnpj(cnpj, estado['driver'], captcha_solver, pipeline,
+                                                       estado['downloads'], estado['drivers'])
+            return resultado
 
-    for cnpj, row_index in cnpjs:
-        logging.info(f"Processando CNPJ: {cnpj}")
-        status = process_cnpj(cnpj, driver, captcha_solver)
-        planilha.atualizar_status(row_index, status)
+        try:
+            resultado = politica.executar(tentativa, f"CNPJ {cnpj}")
+        except TentativasEsgotadas as e:
+            resultado = ResultadoConsulta(f"Falhou: {e}")
+        except PortalIndisponivel as e:
+            logging.error(f"CNPJ {cnpj} não consultado: {e}")
+            resultado = ResultadoConsulta(STATUS_INDISPONIVEL)  # Volta à fila na próxima execução
+        if resultado is not None:
+            pipeline.registrar(cnpj, resultado)
+
+    def finalizar_worker(estado):
+        estado['driver'].quit()
+        estado['drivers'].encerrar()
+        estado['downloads'].limpar()
+
+    pipeline = PipelineProcessamento(registrar_resultado, max_processos=processos_ocr,
+                                     inicializador=iniciar_processo_pdf, args_inicializador=(cache_extracao_db,))
+    pool = PoolNavegadores("TST", iniciar_worker, processar, finalizar_worker, max_workers=workers_navegador)
+    try:
+        pool.executar(cnpjs)
+    finally:
+        # Aguardar os PDFs em processamento e exportar o estado das tarefas
+        pipeline.encerrar()
+        armazem.exportar(planilha.escritor, planilha.tjus_index)
+        planilha.salvar_planilha()
+        armazem.fechar()
+        metricas.resumo("TST", perfil_chrome)
+        politica.disjuntor.resumo()
+        captcha_solver.encerrar()
+
+def main():
+    # Perguntar ao usuário se quer processar todos ou apenas com a coluna TJUS vazia
+    processar_todos = input("Deseja processar todos os CNPJs? (s/n): ").lower() == 's'
+    executar(processar_todos)
 
-    # Fechar o navegador no final
-    if driver:
-        driver.quit()
+if __name__ == "__main__":
+    main()
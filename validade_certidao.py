@@ -0,0 +1,42 @@
+# validade_certidao.py
+
+import re
+import unicodedata
+from datetime import date, timedelta
+
+_DATA = r'(\d{2})\s*[/.-]\s*(\d{2})\s*[/.-]\s*(\d{4})'
+
+# Ordem importa: o intervalo "Validade: dd/mm/aaaa a dd/mm/aaaa" (CRF da CEF) usa a data final
+PADROES_VALIDADE = [
+    re.compile(r'VALIDADE\s*:?\s*' + _DATA + r'\s*(?:A|ATE)\s*' + _DATA),
+    re.compile(r'VALID[AO]\s*ATE\s*:?\s*(?:O\s*DIA\s*)?' + _DATA),
+    re.compile(r'VALIDADE\s*:?\s*' + _DATA),
+]
+
+
+def _sem_acentos(texto):
+    return ''.join(c for c in unicodedata.normalize('NFKD', texto) if not unicodedata.combining(c))
+
+
+def extrair_validade(texto):
+    """Procura a data de validade da certidão no texto extraído do PDF ou da página.
+
+    Retorna um `datetime.date` ou None se nenhuma data de validade for encontrada.
+    """
+    if not texto:
+        return None
+    texto = _sem_acentos(texto).upper()
+    for padrao in PADROES_VALIDADE:
+        match = padrao.search(texto)
+        if match:
+            dia, mes, ano = (int(grupo) for grupo in match.groups()[-3:])
+            try:
+                return date(ano, mes, dia)
+            except ValueError:
+                continue
+    return None
+
+
+def limite_validade(dias_antecedencia, hoje=None):
+    """Data até a qual uma certidão é considerada vencida ou prestes a vencer."""
+    return (hoje or date.today()) + timedelta(days=dias_antecedencia)